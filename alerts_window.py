@@ -0,0 +1,119 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit, QComboBox, QCheckBox
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QDoubleValidator
+from datetime import datetime
+from settings import GUI_FONT, GUI_FONT_SIZE, ALERTS_REFRESH_MS
+from helpers import get_full_symbol
+from core.alerts import ALERT_METRICS, ALERT_ACTIONS
+
+METRIC_UNITS = {'price': '', 'premium': '%', 'spread': '', 'volume': ' USD'}
+
+
+class AlertsWindow(QWidget):
+    """Arms price, premium, spread and 1m volume alerts and lists them with their state."""
+    alert_requested = pyqtSignal(str, str, str, float, object, bool)
+    alert_removed = pyqtSignal(int)
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle('Alerts')
+        self.alerts = None
+        self.dirty = True
+        font = QFont(GUI_FONT, max(GUI_FONT_SIZE - 4, 8))
+        layout = QVBoxLayout(self)
+
+        form_layout = QHBoxLayout()
+        self.symbol_input = QLineEdit()
+        self.symbol_input.setPlaceholderText('Symbol, e.g. XBT')
+        form_layout.addWidget(self.symbol_input)
+        self.metric_input = QComboBox()
+        self.metric_input.addItems(ALERT_METRICS)
+        form_layout.addWidget(self.metric_input)
+        self.condition_input = QComboBox()
+        self.condition_input.addItems(['above', 'below'])
+        form_layout.addWidget(self.condition_input)
+        self.level_input = QLineEdit()
+        self.level_input.setValidator(QDoubleValidator())
+        self.level_input.setPlaceholderText('Level')
+        form_layout.addWidget(self.level_input)
+        self.action_input = QComboBox()
+        self.action_input.addItems(['notify only'] + list(ALERT_ACTIONS))
+        form_layout.addWidget(self.action_input)
+        self.repeat_checkbox = QCheckBox('Repeat')
+        form_layout.addWidget(self.repeat_checkbox)
+        add_button = QPushButton('Add', font=font)
+        add_button.clicked.connect(self.request_alert)
+        form_layout.addWidget(add_button)
+        layout.addLayout(form_layout)
+
+        self.status_label = QLabel('Premium is in %, spread in price, volume in USD over 1m')
+        self.status_label.setFont(font)
+        layout.addWidget(self.status_label)
+        self.rows_layout = QVBoxLayout()
+        self.rows_layout.setSpacing(2)
+        layout.addLayout(self.rows_layout)
+        layout.addStretch()
+        self.resize(750, 250)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(int(ALERTS_REFRESH_MS))
+
+    def set_symbol(self, symbol):
+        if not self.symbol_input.text():
+            self.symbol_input.setText(symbol)
+
+    def request_alert(self):
+        symbol = get_full_symbol(self.symbol_input.text())
+        level = self.level_input.text().strip()
+        if not symbol or not level:
+            self.show_status('Enter a symbol and a level')
+            return
+        action = self.action_input.currentText()
+        self.alert_requested.emit(symbol, self.metric_input.currentText(), self.condition_input.currentText(),
+                                  float(level), None if action == 'notify only' else action,
+                                  self.repeat_checkbox.isChecked())
+
+    def show_status(self, text):
+        self.status_label.setText(text)
+
+    def set_alerts(self, alerts):
+        self.alerts = alerts
+        self.dirty = True
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def refresh(self):
+        if not self.isVisible() or not self.alerts or not self.dirty:
+            return
+        self.dirty = False
+        for i in reversed(range(self.rows_layout.count())):
+            self.rows_layout.itemAt(i).widget().setParent(None)
+
+        for alert in self.alerts.describe():
+            row = QWidget()
+            row_layout = QHBoxLayout(row)
+            row_layout.setContentsMargins(0, 0, 0, 0)
+            unit = METRIC_UNITS[alert['metric']]
+            text = f"#{alert['id']} {alert['symbol']} {alert['metric']} {alert['condition']} {alert['level']:g}{unit}"
+            if alert['action']:
+                text += f" → {alert['action']}"
+            if alert['repeat']:
+                text += ' (repeat)'
+            if alert['state'] == 'fired':
+                fired_at = datetime.fromtimestamp(alert['fired_at']).strftime('%H:%M:%S')
+                text += f" | <font color='orange'>fired {fired_at} at {alert['value']:g}{unit}</font>"
+            else:
+                text += f" | {alert['state']}"
+            label = QLabel(text)
+            label.setFont(QFont(GUI_FONT, max(GUI_FONT_SIZE - 6, 8)))
+            label.setTextFormat(Qt.RichText)
+            row_layout.addWidget(label)
+            remove_button = QPushButton('❌')
+            remove_button.setFixedSize(30, 30)
+            remove_button.setStyleSheet("color: red;")
+            remove_button.clicked.connect(lambda checked=False, alert_id=alert['id']: self.alert_removed.emit(alert_id))
+            row_layout.addWidget(remove_button)
+            row_layout.addStretch()
+            self.rows_layout.addWidget(row)
@@ -0,0 +1,125 @@
+"""Bytes per update and reconstruction speed of the L2 journal on a synthetic Kraken book feed.
+
+    python benchmarks/bench_book_journal.py [--updates 200000] [--snapshot-every 10000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from book_journal import BookJournalWriter, BookJournalReader  # noqa: E402
+from core.market_data import MarketDataEngine  # noqa: E402
+from instrument import Instrument  # noqa: E402
+
+
+def synthetic_feed(symbol, updates, levels=200, seed=1):
+    """A book_snapshot followed by book deltas clustered around a random-walking mid, as raw JSON.
+
+    Levels the mid walks through are removed from the side it moved into, so the book
+    never crosses and a live engine applies every delta without a resync.
+    """
+    rng = random.Random(seed)
+    mid = 120000
+    start_ms = 1700000000000
+    snapshot = {
+        'feed': 'book_snapshot', 'product_id': symbol, 'timestamp': start_ms, 'seq': 0,
+        'bids': [{'price': (mid - i) * 0.5, 'qty': round(rng.uniform(0.01, 5), 4)} for i in range(1, levels)],
+        'asks': [{'price': (mid + i) * 0.5, 'qty': round(rng.uniform(0.01, 5), 4)} for i in range(1, levels)]
+    }
+    live = {'buy': {mid - i for i in range(1, levels)}, 'sell': {mid + i for i in range(1, levels)}}
+    messages = [json.dumps(snapshot)]
+    time_ms = start_ms
+    seq = 0
+
+    def delta(side, ticks, qty):
+        nonlocal seq
+        seq += 1
+        if qty:
+            live[side].add(ticks)
+        else:
+            live[side].discard(ticks)
+        messages.append(json.dumps({'feed': 'book', 'product_id': symbol, 'side': side, 'seq': seq,
+                                    'price': ticks * 0.5, 'qty': qty, 'timestamp': time_ms}))
+
+    while seq < updates:
+        if rng.random() < 0.01:
+            mid += rng.choice((-1, 1))
+            for ticks in sorted(ticks for ticks in live['buy'] if ticks >= mid):
+                delta('buy', ticks, 0)
+            for ticks in sorted(ticks for ticks in live['sell'] if ticks <= mid):
+                delta('sell', ticks, 0)
+        time_ms += rng.choice((0, 0, 1, 1, 2, 5))
+        side = rng.choice(('buy', 'sell'))
+        distance = int(rng.expovariate(0.15)) + 1
+        ticks = mid - distance if side == 'buy' else mid + distance
+        delta(side, ticks, 0 if rng.random() < 0.3 else round(rng.uniform(0.01, 5), 4))
+    return messages, start_ms, time_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=200000)
+    parser.add_argument('--snapshot-every', type=int, default=10000)
+    parser.add_argument('--seeks', type=int, default=200)
+    args = parser.parse_args()
+
+    symbol = 'PF_XBTUSD'
+    instrument = Instrument(symbol, 0.5, 0.0001)
+    messages, start_ms, end_ms = synthetic_feed(symbol, args.updates)
+    # A mid move can clear several levels at once, so the feed may run a few deltas over
+    updates = len(messages) - 1
+    json_bytes = sum(len(message) for message in messages[1:])
+
+    directory = tempfile.mkdtemp()
+    engine = MarketDataEngine(symbol, instrument)
+    writer = BookJournalWriter(symbol, instrument, directory, args.snapshot_every)
+    writer.attach(engine)
+    began = time.perf_counter()
+    for message in messages:
+        engine.handle_message(message)
+    feed_seconds = time.perf_counter() - began
+    writer.close()
+    assert engine.book_stats.resyncs == 0, "synthetic feed crossed the book"
+    journal_bytes = os.path.getsize(writer.path)
+
+    engine.book_snapshot_listeners.clear()
+    engine.book_delta_listeners.clear()
+    began = time.perf_counter()
+    for message in messages:
+        engine.handle_message(message)
+    baseline_seconds = time.perf_counter() - began
+    assert engine.book_stats.resyncs == 0, "synthetic feed crossed the book"
+
+    reader = BookJournalReader(writer.path)
+    began = time.perf_counter()
+    records = sum(1 for _ in reader.records())
+    replay_seconds = time.perf_counter() - began
+
+    rng = random.Random(2)
+    targets = [rng.randint(start_ms, end_ms) for _ in range(args.seeks)]
+    began = time.perf_counter()
+    for target in targets:
+        reader.book_at(target)
+    seek_seconds = time.perf_counter() - began
+
+    final = reader.book_at(end_ms)
+    assert final.bids == engine.orderbook.bids and final.asks == engine.orderbook.asks, "replay diverged from live book"
+    reader.close()
+
+    print(f"updates                {updates}")
+    print(f"json bytes/update      {json_bytes / updates:.1f}")
+    print(f"journal bytes/update   {journal_bytes / updates:.2f} (snapshots included, "
+          f"{json_bytes / journal_bytes:.0f}x smaller)")
+    print(f"recording overhead     {(feed_seconds - baseline_seconds) / updates * 1e6:.2f} us/update")
+    print(f"replay                 {records / replay_seconds / 1e6:.2f} M records/s")
+    print(f"book_at                {seek_seconds / args.seeks * 1e3:.2f} ms per seek "
+          f"(snapshot every {args.snapshot_every} deltas)")
+
+
+if __name__ == '__main__':
+    main()
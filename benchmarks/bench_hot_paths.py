@@ -0,0 +1,348 @@
+"""Microbenchmarks of the feed and pricing hot paths, saved as JSON for comparing commits.
+
+Each case is timed with the best and median of --repeat runs and reported in ns per
+operation. Results go to benchmarks/results/<commit>.json unless --output is given.
+--compare takes an earlier result file, prints the change per case and exits non-zero
+when any case is slower than --threshold (default 10%). The update_recent_trades cases
+need PyQt5, since the method lives on the GUI, and are skipped without it.
+
+Data is synthetic unless --recording names a file of raw feed messages, one JSON per
+line, which adds an on_message/recorded case replaying them in order.
+
+    python benchmarks/bench_hot_paths.py [--filter book] [--repeat 7] [--recording feed.jsonl] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.alerts import AlertEngine  # noqa: E402
+from core.events import Trade  # noqa: E402
+from core.market_data import MarketDataEngine  # noqa: E402
+from core.microstructure import Microstructure  # noqa: E402
+from core.triggers import TriggerEngine  # noqa: E402
+from helpers import calculate_adjusted_mid, round_to_tick  # noqa: E402
+from instrument import Instrument  # noqa: E402
+from orderbook import OrderBook  # noqa: E402
+from bench_book_journal import synthetic_feed  # noqa: E402
+
+SYMBOL = 'PF_XBTUSD'
+INSTRUMENT = Instrument(SYMBOL, 0.5, 0.0001)
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def feed_engine():
+    engine = MarketDataEngine(SYMBOL, INSTRUMENT)
+    engine.book_throttle = 0
+    return engine
+
+
+def book_with_depth(levels, seed=1):
+    rng = random.Random(seed)
+    book = OrderBook(INSTRUMENT)
+    mid = 120000
+    book.load_ticks({mid - i: rng.randint(1, 50000) for i in range(1, levels + 1)},
+                    {mid + i: rng.randint(1, 50000) for i in range(1, levels + 1)})
+    return book
+
+
+def synthetic_trades(count, seed=1):
+    rng = random.Random(seed)
+    return [Trade(1700000000000 + i, rng.choice(('buy', 'sell')), 60000 + rng.randint(-50, 50) / 2,
+                  rng.randint(1, 500) / 1e4) for i in range(count)]
+
+
+def message_cases():
+    """One case per feed type, each replaying a fixed list of raw messages through handle_message."""
+    rng = random.Random(3)
+    book_messages, _, _ = synthetic_feed(SYMBOL, 2000)
+    messages = {
+        'book': book_messages[1:],
+        'book_snapshot': [book_messages[0]] * 20,
+        'trade': [json.dumps({'feed': 'trade', 'product_id': SYMBOL, 'side': rng.choice(('buy', 'sell')),
+                              'time': 1700000000000 + i, 'price': 60000 + rng.randint(-50, 50) / 2,
+                              'qty': rng.randint(1, 500) / 1e4, 'seq': i}) for i in range(2000)],
+        'ticker': [json.dumps({'feed': 'ticker', 'product_id': SYMBOL, 'bid': 59999.5, 'ask': 60000.0,
+                               'markPrice': 60000 + i % 7, 'index': 60000.5}) for i in range(2000)],
+        'open_orders': [json.dumps({'feed': 'open_orders', 'is_cancel': False, 'reason': 'new_placed_order_by_user',
+                                    'order': {'order_id': str(i % 20), 'instrument': SYMBOL, 'qty': 1.0,
+                                              'filled': 0.0, 'limit_price': 59000.0 + i % 20, 'direction': i % 2,
+                                              'type': 'limit', 'reduce_only': False, 'last_update_time': i}})
+                        for i in range(2000)],
+    }
+    cases = []
+    for feed, raw in messages.items():
+        engine = feed_engine()
+        engine.handle_message(book_messages[0])
+
+        def run(engine=engine, raw=raw):
+            handle = engine.handle_message
+            for message in raw:
+                handle(message)
+        cases.append((f"on_message/{feed}", run, len(raw)))
+    return cases
+
+
+def book_cases():
+    messages, _, _ = synthetic_feed(SYMBOL, 5000)
+    deltas = [json.loads(message) for message in messages[1:]]
+    deltas = [(d['side'], d['price'], d['qty']) for d in deltas]
+    snapshot = json.loads(messages[0])
+    book = OrderBook(INSTRUMENT)
+    book.load_snapshot(snapshot['bids'], snapshot['asks'])
+
+    def apply_deltas():
+        apply = book.apply_delta
+        for side, price, qty in deltas:
+            apply(side, price, qty)
+
+    engine = feed_engine()
+    engine.handle_message(messages[0])
+
+    def emit():
+        update = engine.emit_book_update
+        for _ in range(1000):
+            update()
+    return [('book/apply_delta', apply_deltas, len(deltas)), ('book/emit_book_update', emit, 1000)]
+
+
+def impact_cases():
+    cases = []
+    for levels in (10, 100, 1000):
+        book = book_with_depth(levels)
+        # Deep enough to walk roughly half the side
+        size = INSTRUMENT.units_to_size(sum(book.asks.values()) // 2)
+
+        def run(book=book, size=size):
+            impact = book.impact_price
+            for _ in range(100):
+                impact(size, 'buy')
+                impact(size, 'sell')
+        cases.append((f"calculate_impact_price/depth_{levels}", run, 200))
+    return cases
+
+
+def recent_trades_cases():
+    try:
+        from gui import KrakenTerminal
+    except ImportError:
+        return []
+
+    class Sink:
+        def setText(self, text):
+            pass
+
+        def update_trades(self, text):
+            pass
+
+    cases = []
+    # Trades per GUI batch: quiet market, busy market, liquidation burst
+    for batch_size in (1, 10, 100):
+        batches = [synthetic_trades(batch_size, seed) for seed in range(50)]
+        terminal = type('TerminalState', (), {})()
+        terminal.recent_trades = deque(maxlen=1000)
+        terminal.volume_label = Sink()
+        terminal.trades_window = Sink()
+        for batch in batches:
+            KrakenTerminal.update_recent_trades(terminal, batch)
+
+        def run(terminal=terminal, batches=batches):
+            for batch in batches:
+                KrakenTerminal.update_recent_trades(terminal, batch)
+        cases.append((f"update_recent_trades/batch_{batch_size}", run, len(batches)))
+    return cases
+
+
+def trigger_cases():
+    """Trigger checks per trade with brackets armed away from the market, so nothing fires."""
+    trades = synthetic_trades(1000)
+    cases = []
+    for armed in (1, 100, 1000):
+        engine = feed_engine()
+        triggers = TriggerEngine(None)
+        triggers.attach(engine)
+        for i in range(armed):
+            triggers.add_bracket(SYMBOL, 'long' if i % 2 else 'short', 0.01,
+                                 stop=50000 - i if i % 2 else 70000 + i, take_profit=70000 + i if i % 2 else 50000 - i)
+
+        def run(triggers=triggers):
+            on_trade = triggers.on_trade
+            for trade in trades:
+                on_trade(trade)
+        cases.append((f"triggers/on_trade_armed_{armed}", run, len(trades)))
+    return cases
+
+
+def alert_cases():
+    """Alert checks per trade with price and volume alerts armed away from the market, so nothing fires."""
+    trades = synthetic_trades(1000)
+    cases = []
+    for armed in (1, 100, 1000):
+        alerts = AlertEngine()
+        for i in range(armed):
+            if i % 2:
+                alerts.add(SYMBOL, 'price', 'below' if i % 4 == 1 else 'above', 50000 - i if i % 4 == 1 else 70000 + i)
+            else:
+                alerts.add(SYMBOL, 'volume', 'above', 1e12 + i)
+
+        def run(alerts=alerts):
+            on_trade = alerts.on_trade
+            for trade in trades:
+                on_trade(SYMBOL, trade.price, trade.amount, trade.time / 1000)
+        cases.append((f"alerts/on_trade_armed_{armed}", run, len(trades)))
+    return cases
+
+
+def microstructure_cases():
+    """Signal upkeep per book delta (on top of book/apply_delta) and per trade, and reading the signals."""
+    messages, _, _ = synthetic_feed(SYMBOL, 5000)
+    deltas = [json.loads(message) for message in messages[1:]]
+    deltas = [(d['side'], d['price'], d['qty']) for d in deltas]
+    snapshot = json.loads(messages[0])
+    book = OrderBook(INSTRUMENT)
+    book.load_snapshot(snapshot['bids'], snapshot['asks'])
+    microstructure = Microstructure()
+    microstructure.on_snapshot(book, None)
+    trades = synthetic_trades(1000)
+
+    def apply_deltas():
+        apply = book.apply_delta
+        on_delta = microstructure.on_delta
+        for side, price, qty in deltas:
+            on_delta(book, side, apply(side, price, qty), None)
+
+    def on_trades():
+        on_trade = microstructure.on_trade
+        for trade in trades:
+            on_trade(trade)
+
+    def read():
+        signals = microstructure.snapshot
+        for _ in range(1000):
+            signals()
+    return [('microstructure/apply_delta', apply_deltas, len(deltas)),
+            ('microstructure/on_trade', on_trades, len(trades)), ('microstructure/snapshot', read, 1000)]
+
+
+def helper_cases():
+    rng = random.Random(4)
+    prices = [60000 + rng.random() * 100 for _ in range(1000)]
+    quotes = [(p, p + 0.5 * rng.randint(1, 6)) for p in prices]
+
+    def adjusted_mid():
+        for bid, ask in quotes:
+            calculate_adjusted_mid(bid, ask, 0.5, 'buy')
+
+    def rounding():
+        for price in prices:
+            round_to_tick(price, 0.5)
+    return [('helpers/calculate_adjusted_mid', adjusted_mid, len(quotes)), ('helpers/round_to_tick', rounding, len(prices))]
+
+
+def recorded_cases(path):
+    with open(path) as file:
+        raw = [line.strip() for line in file if line.strip()]
+    engine = feed_engine()
+
+    def run():
+        # Each pass replays from a fresh book so deltas land on the state they were recorded against
+        engine.orderbook.clear()
+        handle = engine.handle_message
+        for message in raw:
+            handle(message)
+    return [('on_message/recorded', run, len(raw))]
+
+
+def all_cases(recording=None):
+    cases = (message_cases() + book_cases() + impact_cases() + recent_trades_cases() + trigger_cases() + alert_cases()
+             + microstructure_cases() + helper_cases())
+    return cases + recorded_cases(recording) if recording else cases
+
+
+def measure(run, ops, repeat, total_time=0.5):
+    """Best and median ns per op over repeat timings, calibrated to take about total_time overall."""
+    loops = 1
+    while True:
+        began = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - began
+        if elapsed >= 0.02:
+            break
+        loops *= 2
+    loops = max(1, int(total_time / repeat / (elapsed / loops)))
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter_ns()
+        for _ in range(loops):
+            run()
+        timings.append((time.perf_counter_ns() - began) / (loops * ops))
+    return {'best_ns': round(min(timings), 1), 'median_ns': round(statistics.median(timings), 1),
+            'ops': ops * loops, 'repeat': repeat}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as file:
+        baseline = json.load(file)['results']
+    regressions = []
+    print(f"\n{'case':<42}{'before':>12}{'after':>12}{'change':>10}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = result['best_ns'] / before['best_ns'] - 1
+        flag = ' <-- slower' if change > threshold else ''
+        if flag:
+            regressions.append(name)
+        print(f"{name:<42}{before['best_ns']:>12.1f}{result['best_ns']:>12.1f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--recording', help='raw feed messages, one JSON object per line')
+    parser.add_argument('--output', help='result file (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {}
+    print(f"{'case':<42}{'best ns/op':>12}{'median':>12}")
+    for name, run, ops in all_cases(args.recording):
+        if args.filter not in name:
+            continue
+        results[name] = measure(run, ops, args.repeat)
+        print(f"{name:<42}{results[name]['best_ns']:>12.1f}{results[name]['median_ns']:>12.1f}")
+
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                   'machine': platform.machine(), 'results': results}, file, indent=1)
+    print(f"\nresults written to {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
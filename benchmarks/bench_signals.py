@@ -0,0 +1,123 @@
+"""Allocations and throughput per 100k feed messages for the WebSocketThread payloads.
+
+Compares the old per-message dict payloads (one queued event per trade plus one per
+last price, list copies of order dicts) with the tuple payloads and burst batching in
+core.events. Events are held in a queue the way Qt holds queued signals while the GUI
+thread is busy; the consumer drains every --drain-every messages and, for the dict
+payloads, copies each one as the QVariantMap round trip of a pyqtSignal(dict) does.
+"held KB" is the memory queued payloads pin when the GUI thread stalls for the whole run.
+
+    python benchmarks/bench_signals.py [--messages 100000] [--drain-every 50]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.events import Batch, Latest, Order, Quote, Trade  # noqa: E402
+
+ORDER_EVERY = 200
+OPEN_ORDERS = 20
+
+
+def synthetic_messages(count, seed=1):
+    """Parsed feed messages: mostly trades and book updates with occasional order events."""
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        if i % ORDER_EVERY == 0:
+            messages.append({'feed': 'open_orders'})
+        elif rng.random() < 0.5:
+            messages.append({'feed': 'trade', 'time': 1700000000000 + i, 'side': rng.choice(('buy', 'sell')),
+                             'price': str(60000 + rng.randint(-50, 50) / 2), 'qty': str(rng.randint(1, 500) / 1e4)})
+        else:
+            bid = 120000 + rng.randint(-20, 20)
+            messages.append({'feed': 'book', 'bid_ticks': bid, 'ask_ticks': bid + 1})
+    return messages
+
+
+def dict_payloads(messages, drain_every):
+    events = deque()
+    open_orders = {str(i): {'id': str(i), 'side': 'buy', 'qty': 1.0, 'limitPrice': 59000.0 + i, 'filled': 0.0,
+                            'type': 'lmt', 'reduceOnly': False, 'last_update': None} for i in range(OPEN_ORDERS)}
+    delivered = 0
+    for i, data in enumerate(messages):
+        feed = data['feed']
+        if feed == 'trade':
+            trade = {'time': data['time'], 'side': data['side'], 'price': float(data['price']),
+                     'amount': float(data['qty'])}
+            events.append(('trade', trade))
+            events.append(('last_price', trade['price']))
+        elif feed == 'book':
+            events.append(('book', {'bid': data['bid_ticks'] * 0.5, 'ask': data['ask_ticks'] * 0.5,
+                                    'bid_ticks': data['bid_ticks'], 'ask_ticks': data['ask_ticks']}))
+        else:
+            events.append(('orders', [dict(order) for order in open_orders.values()]))
+        if (i + 1) % drain_every == 0:
+            while events:
+                kind, payload = events.popleft()
+                if kind != 'last_price':
+                    payload = payload.copy()
+                delivered += 1
+    return delivered + len(events)
+
+
+def tuple_payloads(messages, drain_every):
+    events = deque()
+    trades = Batch(lambda: events.append('trades'))
+    quotes = Latest(lambda: events.append('book'))
+    open_orders = {str(i): Order(str(i), 'buy', 1.0, 59000.0 + i, 0.0, 'lmt', False, None)
+                   for i in range(OPEN_ORDERS)}
+    delivered = 0
+    for i, data in enumerate(messages):
+        feed = data['feed']
+        if feed == 'trade':
+            trades.add(Trade(data['time'], data['side'], float(data['price']), float(data['qty'])))
+        elif feed == 'book':
+            quotes.set(Quote(data['bid_ticks'] * 0.5, data['ask_ticks'] * 0.5, data['bid_ticks'], data['ask_ticks']))
+        else:
+            events.append(('orders', tuple(open_orders.values())))
+        if (i + 1) % drain_every == 0:
+            while events:
+                event = events.popleft()
+                if event == 'trades':
+                    trades.take()
+                elif event == 'book':
+                    quotes.take()
+                delivered += 1
+    return delivered + len(events)
+
+
+def measure(run, messages, drain_every):
+    tracemalloc.start()
+    run(messages, len(messages) + 1)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    began = time.perf_counter()
+    events = run(messages, drain_every)
+    elapsed = time.perf_counter() - began
+    return events, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--drain-every', type=int, default=50)
+    args = parser.parse_args()
+
+    messages = synthetic_messages(args.messages)
+    scale = 100000 / args.messages
+    print(f"{'payloads':<10}{'events/100k':>14}{'held KB':>10}{'ms/100k':>10}{'msgs/s':>12}")
+    for name, run in (('dict', dict_payloads), ('tuple', tuple_payloads)):
+        events, peak, elapsed = measure(run, messages, args.drain_every)
+        print(f"{name:<10}{events * scale:>14.0f}{peak / 1024:>10.0f}{elapsed * scale * 1000:>10.1f}"
+              f"{args.messages / elapsed:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Compact binary journal of one instrument's L2 book: periodic snapshots plus varint deltas.
+
+A journal is <root>/<symbol>/<YYYYMMDD-HHMMSS>.l2 with a fixed-width index next to it
+(<name>.l2.idx, one (time ms i64, offset i64) entry per snapshot), so the book at any
+time is rebuilt by seeking to the nearest earlier snapshot and replaying deltas.
+
+Layout (little endian, "v" is an unsigned LEB128 varint, "z" a zigzag varint):
+    header    magic 8s | layout version u32 | tick size f64 | size step f64
+    snapshot  0x01 | time ms i64 | v bid count | v ask count
+              | bids best first: z ticks, v units, then (v ticks gap from previous, v units) ...
+              | asks best first, same encoding with gaps increasing
+    delta     0x02 (bid) or 0x03 (ask) | z ms since previous record
+              | z ticks change from the previous delta on that side | v units (0 removes the level)
+
+After a snapshot the previous-delta reference for each side is that side's best level
+(0 when empty). A record cut short by a crash ends the journal.
+"""
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_right
+from instrument import Instrument
+from orderbook import OrderBook
+
+MAGIC = b'KFL2J001'
+LAYOUT_VERSION = 1
+HEADER = struct.Struct('<8sIdd')
+TIME = struct.Struct('<q')
+INDEX_ENTRY = struct.Struct('<qq')
+SNAPSHOT = 0x01
+BID_DELTA = 0x02
+ASK_DELTA = 0x03
+FLUSH_BYTES = 1 << 16
+
+
+def default_directory():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'journal')
+
+
+def list_journals(symbol, directory=None):
+    """Journal paths for symbol, oldest first."""
+    if not symbol.startswith('PF_'):
+        symbol = f"PF_{symbol}USD"
+    root = os.path.join(directory or default_directory(), symbol)
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, name) for name in sorted(os.listdir(root)) if name.endswith('.l2')]
+
+
+def write_varint(buffer, value):
+    while value > 0x7f:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value):
+    return -((value + 1) >> 1) if value & 1 else value >> 1
+
+
+class BookJournalWriter:
+    """Appends every book_snapshot and book delta an engine applies to a new journal file.
+
+    A fresh snapshot of the live book is written every snapshot_every deltas to bound
+    seek cost.
+    """
+
+    def __init__(self, symbol, instrument, directory=None, snapshot_every=10000):
+        self.symbol = symbol
+        self.instrument = instrument
+        self.snapshot_every = snapshot_every
+        root = os.path.join(directory or default_directory(), symbol)
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, f"{time.strftime('%Y%m%d-%H%M%S')}.l2")
+        self.file = open(self.path, 'wb')
+        self.index_file = open(f"{self.path}.idx", 'wb')
+        self.buffer = bytearray(HEADER.pack(MAGIC, LAYOUT_VERSION, instrument.tick_size, instrument.size_step))
+        self.written = 0
+        self.started = False
+        self.deltas = 0
+        self.last_time = 0
+        self.last_bid = 0
+        self.last_ask = 0
+
+    def attach(self, engine):
+        engine.book_snapshot_listeners.append(self.record_snapshot)
+        engine.book_delta_listeners.append(self.record_delta)
+
+    def detach(self, engine):
+        for listeners, listener in ((engine.book_snapshot_listeners, self.record_snapshot),
+                                    (engine.book_delta_listeners, self.record_delta)):
+            if listener in listeners:
+                listeners.remove(listener)
+
+    def record_snapshot(self, orderbook, time_ms):
+        buffer = self.buffer
+        self.index_file.write(INDEX_ENTRY.pack(time_ms, self.written + len(buffer)))
+        bids = sorted(orderbook.bids.items(), reverse=True)
+        asks = sorted(orderbook.asks.items())
+        buffer.append(SNAPSHOT)
+        buffer += TIME.pack(time_ms)
+        write_varint(buffer, len(bids))
+        write_varint(buffer, len(asks))
+        for levels in (bids, asks):
+            previous = None
+            for ticks, units in levels:
+                if previous is None:
+                    write_varint(buffer, zigzag(ticks))
+                else:
+                    write_varint(buffer, abs(ticks - previous))
+                write_varint(buffer, units)
+                previous = ticks
+        self.last_bid = bids[0][0] if bids else 0
+        self.last_ask = asks[0][0] if asks else 0
+        self.last_time = time_ms
+        self.deltas = 0
+        self.started = True
+        self.flush()
+
+    def record_delta(self, orderbook, side, ticks, time_ms):
+        if not self.started:
+            return
+        buffer = self.buffer
+        if side in ('bids', 'buy'):
+            buffer.append(BID_DELTA)
+            change = ticks - self.last_bid
+            self.last_bid = ticks
+            units = orderbook.bids.get(ticks, 0)
+        else:
+            buffer.append(ASK_DELTA)
+            change = ticks - self.last_ask
+            self.last_ask = ticks
+            units = orderbook.asks.get(ticks, 0)
+        write_varint(buffer, zigzag(time_ms - self.last_time))
+        write_varint(buffer, zigzag(change))
+        write_varint(buffer, units)
+        self.last_time = time_ms
+        self.deltas += 1
+        if self.deltas >= self.snapshot_every:
+            self.record_snapshot(orderbook, time_ms)
+        elif len(buffer) >= FLUSH_BYTES:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.written += len(self.buffer)
+            self.buffer = bytearray()
+        self.file.flush()
+        self.index_file.flush()
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.index_file.close()
+            self.file = None
+
+
+class BookJournalReader:
+    """Random access over one journal: book_at(time_ms) rebuilds an OrderBook from the nearest snapshot."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, tick_size, size_step = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            raise ValueError(f"{path} is not an L2 journal")
+        symbol = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        self.instrument = Instrument(symbol, tick_size, size_step)
+        self.snapshot_times = []
+        self.snapshot_offsets = []
+        index_path = f"{path}.idx"
+        if os.path.exists(index_path):
+            with open(index_path, 'rb') as file:
+                for time_ms, offset in INDEX_ENTRY.iter_unpack(file.read()):
+                    if offset < len(self.data):
+                        self.snapshot_times.append(time_ms)
+                        self.snapshot_offsets.append(offset)
+
+    def records(self, offset=HEADER.size):
+        """Yield (time_ms, bids, asks) for snapshots and (time_ms, is_bid, ticks, units) for deltas."""
+        data = self.data
+        end = len(data)
+        pos = offset
+        last_time = last_bid = last_ask = 0
+        try:
+            while pos < end:
+                kind = data[pos]
+                if kind == SNAPSHOT:
+                    last_time = TIME.unpack_from(data, pos + 1)[0]
+                    bid_count, pos = read_varint(data, pos + 9)
+                    ask_count, pos = read_varint(data, pos)
+                    sides = []
+                    for count, step in ((bid_count, -1), (ask_count, 1)):
+                        levels = {}
+                        ticks = None
+                        for _ in range(count):
+                            value, pos = read_varint(data, pos)
+                            ticks = unzigzag(value) if ticks is None else ticks + step * value
+                            levels[ticks], pos = read_varint(data, pos)
+                        sides.append(levels)
+                    bids, asks = sides
+                    last_bid = max(bids) if bids else 0
+                    last_ask = min(asks) if asks else 0
+                    yield last_time, bids, asks
+                elif kind in (BID_DELTA, ASK_DELTA):
+                    value, pos = read_varint(data, pos + 1)
+                    last_time += unzigzag(value)
+                    value, pos = read_varint(data, pos)
+                    units, pos = read_varint(data, pos)
+                    if kind == BID_DELTA:
+                        last_bid += unzigzag(value)
+                        yield last_time, True, last_bid, units
+                    else:
+                        last_ask += unzigzag(value)
+                        yield last_time, False, last_ask, units
+                else:
+                    raise ValueError(f"Corrupt record at byte {pos} of {self.path}")
+        except (IndexError, struct.error):
+            return
+
+    def book_at(self, time_ms):
+        """The book as of time_ms, or None if time_ms is before the first snapshot."""
+        i = bisect_right(self.snapshot_times, time_ms) - 1
+        if i < 0:
+            return None
+        bids = asks = None
+        for record in self.records(self.snapshot_offsets[i]):
+            if record[0] > time_ms:
+                break
+            if len(record) == 3:
+                bids, asks = record[1], record[2]
+            else:
+                _, is_bid, ticks, units = record
+                levels = bids if is_bid else asks
+                if units:
+                    levels[ticks] = units
+                else:
+                    levels.pop(ticks, None)
+        orderbook = OrderBook(self.instrument)
+        orderbook.load_ticks(bids, asks)
+        return orderbook
+
+    def close(self):
+        self.data.close()
+        self.file.close()
@@ -0,0 +1,321 @@
+from array import array
+from math import ceil
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton
+from PyQt5.QtCore import QThread, pyqtSignal, Qt, QRect, QRectF, QPointF
+from PyQt5.QtGui import QPainter, QColor, QFont
+from settings import GUI_FONT, GUI_FONT_SIZE
+from helpers import format_price
+from log import get_logger
+
+log = get_logger('chart')
+RESOLUTIONS = {'1s': 1, '5s': 5, '1m': 60}
+MAX_BARS = 5000
+TRIM_CHUNK = 500
+MIN_CANDLE_PX = 3
+AXIS_WIDTH = 90
+VOLUME_FRACTION = 0.2
+
+
+class BarSeries:
+    """OHLCV bars aggregated incrementally from trades, stored in flat typed arrays."""
+
+    def __init__(self, resolution, max_bars=MAX_BARS):
+        self.resolution_ms = int(resolution * 1000)
+        self.max_bars = max_bars
+        self.clear()
+
+    def clear(self):
+        self.times = array('q')
+        self.opens = array('d')
+        self.highs = array('d')
+        self.lows = array('d')
+        self.closes = array('d')
+        self.volumes = array('d')
+
+    def __len__(self):
+        return len(self.times)
+
+    def add_trade(self, time_ms, price, amount):
+        """Fold a trade into the forming bar. Returns True when it opened a new bar."""
+        start = int(time_ms) - int(time_ms) % self.resolution_ms
+        if self.times and start <= self.times[-1]:
+            # Same bar, or a late print which we fold into the forming bar
+            if price > self.highs[-1]:
+                self.highs[-1] = price
+            if price < self.lows[-1]:
+                self.lows[-1] = price
+            self.closes[-1] = price
+            self.volumes[-1] += amount
+            return False
+
+        self.times.append(start)
+        self.opens.append(price)
+        self.highs.append(price)
+        self.lows.append(price)
+        self.closes.append(price)
+        self.volumes.append(amount)
+        if len(self.times) > self.max_bars + TRIM_CHUNK:
+            for column in (self.times, self.opens, self.highs, self.lows, self.closes, self.volumes):
+                del column[:TRIM_CHUNK]
+        return True
+
+    def seed(self, ohlcv):
+        """Prepend historical [time, open, high, low, close, volume] rows older than the first live bar."""
+        first_live = self.times[0] if self.times else None
+        rows = [row for row in ohlcv if first_live is None or row[0] < first_live]
+        rows = rows[-max(self.max_bars - len(self.times), 0):] if rows else rows
+        if not rows:
+            return
+        times = array('q', (int(row[0]) for row in rows))
+        columns = [array('d', (float(row[i] or 0) for row in rows)) for i in range(1, 6)]
+        self.times = times + self.times
+        self.opens = columns[0] + self.opens
+        self.highs = columns[1] + self.highs
+        self.lows = columns[2] + self.lows
+        self.closes = columns[3] + self.closes
+        self.volumes = columns[4] + self.volumes
+
+    def aggregate(self, start, end):
+        return (self.opens[start], max(self.highs[start:end]), min(self.lows[start:end]),
+                self.closes[end - 1], sum(self.volumes[start:end]))
+
+    def downsample(self, start, end, group):
+        """Merge every group consecutive bars in [start, end) into one OHLCV tuple."""
+        if group <= 1:
+            return list(zip(self.opens[start:end], self.highs[start:end], self.lows[start:end],
+                            self.closes[start:end], self.volumes[start:end]))
+        return [self.aggregate(i, min(i + group, end)) for i in range(start, end, group)]
+
+
+class CandleChart(QWidget):
+    """Candlestick view of a BarSeries.
+
+    The visible window is laid out once per full repaint; a trade that only changes the
+    forming candle invalidates that candle's column, unless it breaks the price range.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.series = None
+        self.visible_bars = 120
+        self.candles = []
+        self.group = 1
+        self.first_index = 0
+        self.price_low = 0
+        self.price_high = 0
+        self.volume_high = 0
+        self.view_dirty = True
+        self.font = QFont(GUI_FONT, max(GUI_FONT_SIZE - 10, 8))
+        self.set_dark_mode(False)
+        self.setMinimumSize(400, 250)
+
+    def set_dark_mode(self, is_dark_mode):
+        if is_dark_mode:
+            self.colors = {'background': QColor('#1e1e1e'), 'text': QColor('#e0e0e0'),
+                           'grid': QColor('#333333'), 'up': QColor(0, 179, 0), 'down': QColor(220, 40, 40)}
+        else:
+            self.colors = {'background': QColor('white'), 'text': QColor('black'),
+                           'grid': QColor('#dddddd'), 'up': QColor(0, 150, 0), 'down': QColor(200, 0, 0)}
+        self.invalidate()
+
+    def set_series(self, series):
+        self.series = series
+        self.invalidate()
+
+    def invalidate(self):
+        self.view_dirty = True
+        self.update()
+
+    def on_trade(self, new_bar):
+        if not self.series:
+            return
+        if not self.isVisible():
+            self.view_dirty = True
+            return
+        if new_bar or self.view_dirty or not self.candles:
+            self.invalidate()
+            return
+
+        n = len(self.series)
+        last_start = self.first_index + (len(self.candles) - 1) * self.group
+        forming = self.series.aggregate(last_start, n)
+        self.candles[-1] = forming
+        if forming[1] > self.price_high or forming[2] < self.price_low or forming[4] > self.volume_high:
+            self.invalidate()
+            return
+        self.update(self.column_rect(len(self.candles) - 1))
+
+    def plot_width(self):
+        return max(self.width() - AXIS_WIDTH, 1)
+
+    def candle_width(self):
+        return self.plot_width() / max(len(self.candles), 1)
+
+    def column_rect(self, index):
+        width = self.candle_width()
+        return QRect(int(index * width) - 1, 0, int(width) + 3, self.height())
+
+    def compute_view(self):
+        self.view_dirty = False
+        self.candles = []
+        if not self.series or not len(self.series):
+            return
+        n = len(self.series)
+        count = min(self.visible_bars, n)
+        self.group = max(1, ceil(count / (self.plot_width() / MIN_CANDLE_PX)))
+        # Align groups to the end so the forming bar always closes the last group
+        count = ceil(count / self.group) * self.group
+        self.first_index = max(n - count, 0)
+        if (n - self.first_index) % self.group:
+            self.first_index += (n - self.first_index) % self.group
+        self.candles = self.series.downsample(self.first_index, n, self.group)
+        if not self.candles:
+            return
+
+        low = min(c[2] for c in self.candles)
+        high = max(c[1] for c in self.candles)
+        padding = (high - low) * 0.1 or high * 0.001 or 1
+        self.price_low = low - padding
+        self.price_high = high + padding
+        self.volume_high = max(c[4] for c in self.candles) * 1.25 or 1
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        self.visible_bars = int(min(max(self.visible_bars * (0.8 ** steps), 20), MAX_BARS))
+        self.invalidate()
+
+    def resizeEvent(self, event):
+        self.view_dirty = True
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        if self.view_dirty:
+            self.compute_view()
+        painter = QPainter(self)
+        painter.setFont(self.font)
+        dirty = event.rect()
+        painter.fillRect(dirty, self.colors['background'])
+        if not self.candles:
+            return
+
+        height = self.height()
+        price_height = height * (1 - VOLUME_FRACTION)
+        price_span = (self.price_high - self.price_low) or 1
+        candle_width = self.candle_width()
+        body_width = max(candle_width * 0.7, 1)
+
+        def price_y(price):
+            return (self.price_high - price) / price_span * price_height
+
+        first = max(int(dirty.left() / candle_width) - 1, 0)
+        last = min(int(dirty.right() / candle_width) + 1, len(self.candles) - 1)
+        for i in range(first, last + 1):
+            open_, high, low, close, volume = self.candles[i]
+            color = self.colors['up'] if close >= open_ else self.colors['down']
+            center = i * candle_width + candle_width / 2
+            painter.setPen(color)
+            painter.drawLine(QPointF(center, price_y(high)), QPointF(center, price_y(low)))
+            top = price_y(max(open_, close))
+            body_height = max(price_y(min(open_, close)) - top, 1)
+            painter.fillRect(QRectF(center - body_width / 2, top, body_width, body_height), color)
+            volume_height = volume / self.volume_high * height * VOLUME_FRACTION
+            volume_color = QColor(color)
+            volume_color.setAlpha(120)
+            painter.fillRect(QRectF(center - body_width / 2, height - volume_height, body_width, volume_height),
+                             volume_color)
+
+        if dirty.right() >= self.plot_width():
+            painter.setPen(self.colors['grid'])
+            painter.drawLine(self.plot_width(), 0, self.plot_width(), height)
+            painter.setPen(self.colors['text'])
+            for step in range(5):
+                price = self.price_low + price_span * (step + 0.5) / 5
+                y = price_y(price)
+                painter.drawText(QRectF(self.plot_width() + 4, y - 10, AXIS_WIDTH - 4, 20),
+                                 Qt.AlignLeft | Qt.AlignVCenter, format_price(round(price, 8)))
+
+
+class HistoryFetchThread(QThread):
+    history_signal = pyqtSignal(str, list)
+
+    def __init__(self, exchange, symbol, timeframe='1m', limit=MAX_BARS):
+        super().__init__()
+        self.exchange = exchange
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.limit = limit
+
+    def run(self):
+        try:
+            ohlcv = self.exchange.fetch_ohlcv(self.symbol, self.timeframe, limit=self.limit)
+            self.history_signal.emit(self.symbol, ohlcv)
+        except Exception as e:
+            log.error("Error fetching chart history: %s", e)
+
+
+class ChartWindow(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle('Chart')
+        self.symbol = None
+        self.series = {name: BarSeries(seconds) for name, seconds in RESOLUTIONS.items()}
+        self.resolution = '1m'
+        self.history_thread = None
+        # Fetches still running, referenced until they finish so a quick symbol switch cannot destroy one
+        self.history_threads = set()
+
+        layout = QVBoxLayout(self)
+        button_layout = QHBoxLayout()
+        self.resolution_buttons = {}
+        for name in RESOLUTIONS:
+            button = QPushButton(name, font=QFont(GUI_FONT, max(GUI_FONT_SIZE - 10, 8)))
+            button.setFixedSize(50, 30)
+            button.clicked.connect(lambda checked, x=name: self.set_resolution(x))
+            self.resolution_buttons[name] = button
+            button_layout.addWidget(button)
+        button_layout.addStretch()
+        layout.addLayout(button_layout)
+
+        self.chart = CandleChart()
+        layout.addWidget(self.chart)
+        self.set_resolution(self.resolution)
+        self.resize(900, 500)
+
+    def set_resolution(self, name):
+        self.resolution = name
+        for button_name, button in self.resolution_buttons.items():
+            button.setStyleSheet('background-color: blue' if button_name == name else '')
+        self.chart.set_series(self.series[name])
+
+    def set_dark_mode(self, is_dark_mode):
+        self.chart.set_dark_mode(is_dark_mode)
+
+    def add_trades(self, trades):
+        new_bar = False
+        for trade in trades:
+            if trade.amount <= 0 or trade.price <= 0:
+                continue
+            for name, series in self.series.items():
+                opened = series.add_trade(trade.time, trade.price, trade.amount)
+                if opened and name == self.resolution:
+                    new_bar = True
+        self.chart.on_trade(new_bar)
+
+    def load_history(self, exchange, symbol):
+        self.symbol = symbol
+        for series in self.series.values():
+            series.clear()
+        self.chart.invalidate()
+        thread = HistoryFetchThread(exchange, symbol)
+        thread.history_signal.connect(self.apply_history)
+        thread.finished.connect(lambda: self.history_threads.discard(thread))
+        self.history_threads.add(thread)
+        self.history_thread = thread
+        thread.start()
+
+    def apply_history(self, symbol, ohlcv):
+        # Only the latest fetch seeds the chart; an earlier one for this symbol would be older data
+        if symbol != self.symbol or self.sender() is not self.history_thread:
+            return
+        self.series['1m'].seed(ohlcv)
+        self.chart.invalidate()
@@ -0,0 +1,371 @@
+"""Local-only control API for scripted order entry.
+
+Requests and responses are single-line JSON objects over a Unix domain socket (or a
+loopback TCP port where Unix sockets are unavailable), e.g.
+
+    {"id": 1, "cmd": "place", "side": "buy", "size": 0.01, "price": "best"}
+    {"id": 1, "ok": true, "result": {...}, "timings": {"parse_us": 12, "exchange_us": 84000, "total_us": 84100}}
+
+Commands: place (price is a number, "best", "mid", "micro", "depth" or omitted for market),
+cancel, cancel_all, flatten, bracket (stop and/or take_profit on the open position, optional
+backup), cancel_bracket, execute (a TWAP over duration_s or an iceberg showing display, optional
+limit_price), cancel_execution, scale (count post-only orders from start to end with flat, linear
+or geometric sizes, sent as one batch), alert (metric above or below level on a symbol, optional
+action and repeat), remove_alert and state. Orders go through the terminal's OrderManager, so
+they share its exchange client and rate-limit budget.
+"""
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from core.orders import ladder_rungs
+from instrument import Instrument
+from log import get_logger
+
+ORDER_COMMANDS = ('place', 'cancel', 'cancel_all', 'flatten', 'bracket', 'cancel_bracket', 'execute',
+                  'cancel_execution', 'scale')
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+log = get_logger('control')
+
+
+def default_address():
+    if hasattr(socket, 'AF_UNIX'):
+        return os.path.join(tempfile.gettempdir(), 'krakenfutures-control.sock')
+    return '127.0.0.1:8765'
+
+
+def parse_address(address):
+    """Return ('unix', path) or ('tcp', (host, port)); TCP is restricted to loopback."""
+    address = address or default_address()
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and os.sep not in host:
+        if host not in LOOPBACK_HOSTS:
+            raise ValueError(f"Control API only listens on loopback, not {host}")
+        return 'tcp', (host, int(port))
+    return 'unix', address
+
+
+def elapsed_us(start_ns):
+    return (time.perf_counter_ns() - start_ns) // 1000
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            received_ns = time.perf_counter_ns()
+            if not line.strip():
+                continue
+            response = self.server.control.execute(line, received_ns)
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ControlServer:
+    """Serves control requests against the active engine through the shared OrderManager.
+
+    get_engine returns the current MarketDataEngine (or None); is_allowed gates order
+    commands, e.g. on the terminal's ARM state. Bracket commands need a TriggerEngine,
+    execution commands an ExecutionScheduler, alert commands an AlertEngine, and "micro"
+    and "depth" prices a Microstructure attached to the active engine.
+    """
+
+    def __init__(self, order_manager, get_engine, is_allowed=lambda: True, address=None, triggers=None,
+                 executions=None, alerts=None, microstructure=None):
+        self.order_manager = order_manager
+        self.triggers = triggers
+        self.executions = executions
+        self.alerts = alerts
+        self.microstructure = microstructure
+        self.get_engine = get_engine
+        self.is_allowed = is_allowed
+        self.kind, self.address = parse_address(address)
+        self.server = None
+        self.thread = None
+        self.commands = {
+            'place': self.place,
+            'cancel': self.cancel,
+            'cancel_all': self.cancel_all,
+            'flatten': self.flatten,
+            'bracket': self.bracket,
+            'cancel_bracket': self.cancel_bracket,
+            'scale': self.scale,
+            'alert': self.alert,
+            'remove_alert': self.remove_alert,
+            'execute': self.execute_parent,
+            'cancel_execution': self.cancel_execution,
+            'state': self.state
+        }
+
+    def start(self):
+        if self.kind == 'unix':
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            self.server = _UnixServer(self.address, _RequestHandler)
+            os.chmod(self.address, 0o600)
+        else:
+            self.server = _TCPServer(self.address, _RequestHandler)
+        self.server.control = self
+        self.thread = threading.Thread(target=self.server.serve_forever, name='control-api', daemon=True)
+        self.thread.start()
+        log.info("Control API listening on %s", self.address)
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            if self.kind == 'unix' and os.path.exists(self.address):
+                os.unlink(self.address)
+
+    def execute(self, line, received_ns):
+        timings = {}
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            timings['parse_us'] = elapsed_us(received_ns)
+            cmd = request.get('cmd')
+            handler = self.commands.get(cmd)
+            if handler is None:
+                raise ValueError(f"Unknown command: {cmd}")
+            if cmd in ORDER_COMMANDS and not self.is_allowed():
+                raise PermissionError("Terminal is not armed")
+            result = handler(request, timings)
+            response = {'id': request_id, 'ok': True, 'result': result}
+        except Exception as e:
+            response = {'id': request_id, 'ok': False, 'error': str(e)}
+        timings['total_us'] = elapsed_us(received_ns)
+        response['timings'] = timings
+        return response
+
+    def active_engine(self):
+        engine = self.get_engine()
+        if engine is None:
+            raise RuntimeError("No active symbol")
+        return engine
+
+    def send(self, timings, action, *args):
+        start_ns = time.perf_counter_ns()
+        try:
+            return action(*args)
+        finally:
+            timings['exchange_us'] = elapsed_us(start_ns)
+
+    def resolve_price(self, engine, side, price):
+        if price is None or price == 'market':
+            return None
+        instrument = engine.instrument
+        if price in ('best', 'mid', 'micro', 'depth'):
+            with engine.lock:
+                bid_ticks = engine.orderbook.best_bid()
+                ask_ticks = engine.orderbook.best_ask()
+                signals = self.signals(engine) if price in ('micro', 'depth') else None
+            if bid_ticks is None or ask_ticks is None:
+                raise RuntimeError("Book is empty")
+            if price == 'best':
+                ticks = bid_ticks if side == 'buy' else ask_ticks
+            elif price == 'mid':
+                ticks = Instrument.adjusted_mid(bid_ticks, ask_ticks, side)
+            else:
+                if signals is None:
+                    raise RuntimeError("Microstructure signals are not available")
+                fair_ticks = signals.micro_ticks if price == 'micro' else signals.depth_ticks
+                ticks = Instrument.passive_ticks(fair_ticks, bid_ticks, ask_ticks, side)
+            return instrument.ticks_to_price(ticks)
+        return instrument.round_price(float(price))
+
+    def place(self, request, timings):
+        start_ns = time.perf_counter_ns()
+        engine = self.active_engine()
+        side = request.get('side')
+        if side not in ('buy', 'sell'):
+            raise ValueError("side must be 'buy' or 'sell'")
+        units = engine.instrument.size_to_units(request.get('size', 0))
+        if units <= 0:
+            raise ValueError("size must be at least one contract step")
+        amount = engine.instrument.units_to_size(units)
+        price = self.resolve_price(engine, side, request.get('price'))
+        timings['prepare_us'] = elapsed_us(start_ns)
+        order = self.send(timings, self.order_manager.place_order, engine.symbol, side, amount, price)
+        return {'symbol': engine.symbol, 'side': side, 'size': amount, 'price': price,
+                'order_id': (order or {}).get('id')}
+
+    def scale(self, request, timings):
+        start_ns = time.perf_counter_ns()
+        engine = self.active_engine()
+        side = request.get('side')
+        if side not in ('buy', 'sell'):
+            raise ValueError("side must be 'buy' or 'sell'")
+        instrument = engine.instrument
+        rungs = ladder_rungs(instrument.size_to_units(request.get('size', 0)),
+                             instrument.price_to_ticks(float(request['start'])),
+                             instrument.price_to_ticks(float(request['end'])), int(request.get('count', 5)),
+                             request.get('distribution', 'flat'))
+        orders = [(side, instrument.units_to_size(units), instrument.ticks_to_price(ticks)) for ticks, units in rungs]
+        timings['prepare_us'] = elapsed_us(start_ns)
+        statuses, latency_ns = self.send(timings, self.order_manager.place_batch, engine.symbol, orders)
+        return {'symbol': engine.symbol, 'side': side, 'latency_us': latency_ns // 1000,
+                'orders': [{'size': amount, 'price': price, **status}
+                           for (_, amount, price), status in zip(orders, statuses)]}
+
+    def cancel(self, request, timings):
+        engine = self.active_engine()
+        order_id = request.get('order_id')
+        if not order_id:
+            raise ValueError("order_id is required")
+        self.send(timings, self.order_manager.cancel_order, order_id, engine.symbol)
+        return {'order_id': order_id}
+
+    def cancel_all(self, request, timings):
+        engine = self.active_engine()
+        with engine.lock:
+            order_ids = list(engine.open_orders)
+        cancelled = self.send(timings, self.order_manager.cancel_orders, order_ids, engine.symbol)
+        return {'cancelled': cancelled}
+
+    def flatten(self, request, timings):
+        engine = self.active_engine()
+        result = self.send(timings, self.order_manager.flatten, engine.symbol)
+        if not result:
+            return {'flat': True}
+        side, amount, order = result
+        return {'side': side, 'size': amount, 'order_id': (order or {}).get('id')}
+
+    def bracket(self, request, timings):
+        engine = self.active_engine()
+        if self.triggers is None:
+            raise RuntimeError("Brackets are not available")
+        position = engine.account.position
+        if not position:
+            raise RuntimeError(f"No {engine.symbol} position to bracket")
+        stop, take_profit = request.get('stop'), request.get('take_profit')
+        bracket = self.triggers.add_bracket(engine.symbol, position['info']['side'], abs(float(position['contracts'])),
+                                            None if stop is None else float(stop),
+                                            None if take_profit is None else float(take_profit),
+                                            request.get('source', 'trade'), bool(request.get('backup')))
+        return bracket.describe()
+
+    def cancel_bracket(self, request, timings):
+        if self.triggers is None:
+            raise RuntimeError("Brackets are not available")
+        bracket = self.triggers.cancel_bracket(request.get('bracket_id'))
+        if bracket is None:
+            raise ValueError(f"No armed bracket {request.get('bracket_id')}")
+        return bracket.describe()
+
+    def execute_parent(self, request, timings):
+        engine = self.active_engine()
+        if self.executions is None:
+            raise RuntimeError("Execution scheduling is not available")
+        limit_price = request.get('limit_price')
+        parent = self.executions.start(request.get('symbol') or engine.symbol, request.get('side'),
+                                       float(request.get('size', 0)), request.get('style', 'twap'),
+                                       request.get('duration_s'), request.get('display'),
+                                       None if limit_price is None else float(limit_price))
+        return parent.describe()
+
+    def cancel_execution(self, request, timings):
+        if self.executions is None:
+            raise RuntimeError("Execution scheduling is not available")
+        parent = self.executions.cancel(request.get('parent_id'))
+        if parent is None:
+            raise ValueError(f"No working parent {request.get('parent_id')}")
+        return parent.describe()
+
+    def alert(self, request, timings):
+        if self.alerts is None:
+            raise RuntimeError("Alerts are not available")
+        symbol = request.get('symbol') or self.active_engine().symbol
+        alert = self.alerts.add(symbol, request.get('metric', 'price'), request.get('condition'),
+                                float(request['level']), request.get('action'), bool(request.get('repeat')))
+        return alert.describe()
+
+    def remove_alert(self, request, timings):
+        if self.alerts is None:
+            raise RuntimeError("Alerts are not available")
+        alert = self.alerts.remove(request.get('alert_id'))
+        if alert is None:
+            raise ValueError(f"No alert {request.get('alert_id')}")
+        return alert.describe()
+
+    def signals(self, engine):
+        microstructure = self.microstructure
+        if microstructure is None or microstructure.engine is not engine:
+            return None
+        return microstructure.snapshot()
+
+    def state(self, request, timings):
+        engine = self.active_engine()
+        portfolio = engine.portfolio
+        # The feed thread changes the book, orders and portfolio under the engine lock
+        with engine.lock:
+            signals = self.signals(engine)
+            bid_ticks = engine.orderbook.best_bid()
+            ask_ticks = engine.orderbook.best_ask()
+            position = engine.account.position
+            open_orders = [order._asdict() for order in engine.open_orders.values()]
+            totals = {
+                'upnl': portfolio.total_upnl,
+                'notional': portfolio.total_notional,
+                'margin': portfolio.total_margin
+            }
+        return {
+            'symbol': engine.symbol,
+            'bid': engine.instrument.ticks_to_price(bid_ticks) if bid_ticks is not None else None,
+            'ask': engine.instrument.ticks_to_price(ask_ticks) if ask_ticks is not None else None,
+            'position': position,
+            'open_orders': open_orders,
+            'brackets': [bracket.describe() for bracket in self.triggers.brackets_for(engine.symbol)]
+            if self.triggers else [],
+            'executions': self.executions.describe() if self.executions else [],
+            'alerts': self.alerts.describe() if self.alerts else [],
+            'signals': {
+                'microprice': engine.instrument.ticks_to_price(signals.micro_ticks),
+                'depth_price': engine.instrument.ticks_to_price(signals.depth_ticks),
+                'imbalance': signals.imbalance,
+                'cvd': signals.cvd,
+                'flow': signals.flow
+            } if signals else None,
+            'portfolio': totals
+        }
+
+
+class ControlClient:
+    """Blocking client for signal scripts: ControlClient().request('place', side='buy', size=1, price='best')."""
+
+    def __init__(self, address=None):
+        kind, target = parse_address(address)
+        if kind == 'unix':
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.sock = socket.socket(socket.AF_INET6 if ':' in target[0] else socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.connect(target)
+        self.reader = self.sock.makefile('rb')
+        self.next_id = 0
+
+    def request(self, cmd, **params):
+        self.next_id += 1
+        params.update({'id': self.next_id, 'cmd': cmd})
+        start_ns = time.perf_counter_ns()
+        self.sock.sendall(json.dumps(params).encode() + b'\n')
+        response = json.loads(self.reader.readline())
+        response['round_trip_us'] = elapsed_us(start_ns)
+        return response
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
@@ -0,0 +1,11 @@
+from core.events import Batch, FeedHealth, Latest, Order, Quote, Signals, Trade
+from core.alerts import Alert, AlertEngine
+from core.audit import OrderJournal, latency_report
+from core.account import AccountState, Portfolio, PortfolioPosition, fetch_balance_summary
+from core.market_data import MarketDataEngine, load_instrument
+from core.microstructure import Microstructure
+from core.orders import LADDER_DISTRIBUTIONS, OrderManager, OrderTicket, RateBudget, StagedOrder, create_exchange, \
+    ladder_rungs
+from core.execution import ExecutionScheduler, ParentOrder
+from core.paper import PaperExchange
+from core.triggers import Bracket, TriggerEngine
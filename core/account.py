@@ -0,0 +1,148 @@
+from core.events import Order
+from log import get_logger
+
+log = get_logger('account')
+
+
+def parse_order(order):
+    return Order(
+        order.get('order_id'),
+        'buy' if order.get('direction') == 0 else 'sell',
+        float(order.get('qty', 0)),
+        float(order.get('limit_price', 0)),
+        float(order.get('filled', 0)),
+        order.get('type'),
+        order.get('reduce_only', False),
+        order.get('last_update_time')
+    )
+
+
+def fetch_balance_summary(exchange):
+    balance = exchange.fetch_balance()
+    flex_account = balance['info']['accounts']['flex']
+    return {
+        'available_margin': float(flex_account['availableMargin']),
+        'total_balance': float(flex_account['balanceValue'])
+    }
+
+
+class PortfolioPosition:
+    __slots__ = ('symbol', 'balance', 'entry_price', 'mark_price', 'margin_rate', 'upnl', 'notional', 'margin')
+
+    def __init__(self, symbol, balance, entry_price, mark_price, margin_rate):
+        self.symbol = symbol
+        self.balance = balance
+        self.entry_price = entry_price
+        self.margin_rate = margin_rate
+        self.set_mark(mark_price)
+
+    def set_mark(self, mark_price):
+        self.mark_price = mark_price
+        self.upnl = (mark_price - self.entry_price) * self.balance
+        self.notional = abs(self.balance) * mark_price
+        self.margin = self.notional * self.margin_rate
+
+
+class Portfolio:
+    """All open positions from the private feed, marked against live ticker prices.
+
+    Totals are adjusted by the delta of the one position that moved, so a mark update
+    costs O(1) regardless of how many positions are held.
+    """
+
+    def __init__(self):
+        self.positions = {}
+        self.total_upnl = 0.0
+        self.total_notional = 0.0
+        self.total_margin = 0.0
+        self.version = 0
+
+    def load_positions(self, positions):
+        """Replace state from an open_positions message. Returns the held symbols."""
+        loaded = {}
+        for pos in positions:
+            balance = float(pos.get('balance') or 0)
+            if not balance:
+                continue
+            symbol = pos.get('instrument')
+            entry_price = float(pos.get('entry_price') or 0)
+            previous = self.positions.get(symbol)
+            mark_price = float(pos.get('mark_price') or (previous.mark_price if previous else entry_price))
+            notional = abs(balance) * mark_price
+            initial_margin = float(pos.get('initial_margin') or 0)
+            if initial_margin and notional:
+                margin_rate = initial_margin / notional
+            else:
+                margin_rate = previous.margin_rate if previous else 0.0
+            loaded[symbol] = PortfolioPosition(symbol, balance, entry_price, mark_price, margin_rate)
+
+        self.positions = loaded
+        self.total_upnl = sum(p.upnl for p in loaded.values())
+        self.total_notional = sum(p.notional for p in loaded.values())
+        self.total_margin = sum(p.margin for p in loaded.values())
+        self.version += 1
+        return list(loaded)
+
+    def update_mark(self, symbol, mark_price):
+        position = self.positions.get(symbol)
+        if position is None or mark_price == position.mark_price:
+            return
+        upnl, notional, margin = position.upnl, position.notional, position.margin
+        position.set_mark(mark_price)
+        self.total_upnl += position.upnl - upnl
+        self.total_notional += position.notional - notional
+        self.total_margin += position.margin - margin
+        self.version += 1
+
+
+class AccountState:
+    """Open orders and positions maintained from the private open_orders/open_positions feeds."""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.open_orders = {}
+        self.portfolio = Portfolio()
+        self.position = {}
+
+    def handle_order_update(self, data):
+        if data.get('feed') == 'open_orders_snapshot':
+            self.open_orders = {}
+            for order in data.get('orders', []):
+                if float(order.get('filled', 0)) < float(order.get('qty', 0)):
+                    self.open_orders[order.get('order_id')] = parse_order(order)
+        else:
+            is_cancel = data.get('is_cancel', False)
+            reason = data.get('reason')
+            order = data.get('order', {})
+
+            order_id = order.get('order_id') if order else data.get('order_id')
+
+            if is_cancel or (order and float(order.get('filled', 0)) >= float(order.get('qty', 0))):
+                if order_id in self.open_orders:
+                    del self.open_orders[order_id]
+                    log.info("Order removed", extra={'fields': {'order_id': order_id, 'reason': reason}})
+
+            elif order:
+                parsed = parse_order(order)
+                if parsed.filled < parsed.qty:
+                    self.open_orders[order_id] = parsed
+
+    def handle_positions(self, positions):
+        """Load every position into the portfolio and return the held instruments."""
+        held = self.portfolio.load_positions(positions)
+        current_symbol_position = next(
+            (pos for pos in positions if pos.get('instrument') == self.symbol),
+            None
+        )
+        if current_symbol_position:
+            self.position = {
+                'entryPrice': current_symbol_position['entry_price'],
+                'contracts': current_symbol_position['balance'],
+                'symbol': self.symbol,
+                'info': {
+                    'side': 'LONG' if float(current_symbol_position['balance']) > 0 else 'SHORT'
+                }
+            }
+        else:
+            self.position = {}
+        return held
@@ -0,0 +1,267 @@
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from core.triggers import TriggerIndex
+from log import get_logger
+
+log = get_logger('alerts')
+
+ALERT_METRICS = ('price', 'premium', 'spread', 'volume')
+ALERT_ACTIONS = ('cancel_all', 'flatten')
+
+
+def _ignore(*args):
+    pass
+
+
+class Alert:
+    __slots__ = ('id', 'symbol', 'metric', 'condition', 'level', 'action', 'repeat', 'state', 'value', 'fired_at')
+
+    def __init__(self, alert_id, symbol, metric, condition, level, action, repeat):
+        self.id = alert_id
+        self.symbol = symbol
+        self.metric = metric
+        self.condition = condition
+        self.level = level
+        self.action = action
+        self.repeat = repeat
+        self.state = 'armed'
+        self.value = None
+        self.fired_at = None
+
+    def describe(self):
+        return {'id': self.id, 'symbol': self.symbol, 'metric': self.metric, 'condition': self.condition,
+                'level': self.level, 'action': self.action, 'repeat': self.repeat, 'state': self.state,
+                'value': self.value, 'fired_at': self.fired_at}
+
+    def text(self):
+        return f"{self.symbol} {self.metric} {self.value:g} {self.condition} {self.level:g}"
+
+
+class AlertQuote:
+    """The metrics alerts watch for one symbol, updated from whichever feed carries it."""
+    __slots__ = ('bid', 'ask', 'mark', 'trades', 'volume_usd')
+
+    def __init__(self):
+        self.bid = None
+        self.ask = None
+        self.mark = None
+        self.trades = deque()
+        self.volume_usd = 0.0
+
+    def premium(self):
+        # As update_index_price shows it: mid against the mark, in percent
+        if self.bid is None or self.ask is None or not self.mark:
+            return None
+        return ((self.bid + self.ask) / 2 - self.mark) / self.mark * 100
+
+    def add_volume(self, now, notional, window_s):
+        self.trades.append((now, notional))
+        self.volume_usd += notional
+        cutoff = now - window_s
+        trades = self.trades
+        while trades[0][0] <= cutoff:
+            self.volume_usd -= trades.popleft()[1]
+        return self.volume_usd
+
+
+class AlertEngine:
+    """Price, premium (%), spread and 1m USD volume alerts across every symbol the feeds carry.
+
+    Each (symbol, metric) keeps an 'above' and a 'below' TriggerIndex, so a new value
+    costs a dict lookup and two comparisons however many alerts are armed; bisection
+    only happens when something fires. Values arrive on feed threads through
+    on_trade, on_quote and on_mark; the watchlist feeds every watched symbol, and
+    an attached MarketDataEngine feeds the active one when the watchlist does not.
+
+    A fired alert is passed to on_fire on the alert thread and, if it has an
+    action ('cancel_all' or 'flatten' its symbol) and is_allowed() says so, the
+    action is sent through the OrderManager. Repeating alerts re-arm after
+    repeat_cooldown_s.
+    """
+
+    def __init__(self, order_manager=None, is_allowed=lambda: True, repeat_cooldown_s=60, volume_window_s=60):
+        self.order_manager = order_manager
+        self.is_allowed = is_allowed
+        self.repeat_cooldown_s = repeat_cooldown_s
+        self.volume_window_s = volume_window_s
+        self.lock = threading.Lock()
+        self.alerts = {}
+        # (symbol, metric): (below TriggerIndex, above TriggerIndex)
+        self.indexes = {}
+        self.quotes = {}
+        # Symbols the watchlist feeds; attached engines leave these alone to avoid counting trades twice
+        self.watched = set()
+        self.engine = None
+        self.ids = itertools.count(1)
+        self.armed = 0
+        self.evaluations = 0
+        self.work = queue.SimpleQueue()
+        self.on_fire = _ignore
+        self.on_change = _ignore
+        threading.Thread(target=self.run, name='alerts', daemon=True).start()
+
+    def attach(self, engine):
+        engine.trade_listeners.append(self.on_engine_trade)
+        engine.book_listeners.append(self.on_engine_book)
+        engine.mark_listeners.append(self.on_engine_mark)
+        self.engine = engine
+
+    def detach(self, engine):
+        for listeners, listener in ((engine.trade_listeners, self.on_engine_trade),
+                                    (engine.book_listeners, self.on_engine_book),
+                                    (engine.mark_listeners, self.on_engine_mark)):
+            if listener in listeners:
+                listeners.remove(listener)
+        if self.engine is engine:
+            self.engine = None
+
+    # Arming, from the GUI or control thread
+
+    def add(self, symbol, metric, condition, level, action=None, repeat=False):
+        if metric not in ALERT_METRICS:
+            raise ValueError(f"metric must be one of {', '.join(ALERT_METRICS)}")
+        if condition not in ('above', 'below'):
+            raise ValueError("condition must be 'above' or 'below'")
+        if action is not None and action not in ALERT_ACTIONS:
+            raise ValueError(f"action must be one of {', '.join(ALERT_ACTIONS)}")
+        alert = Alert(next(self.ids), symbol, metric, condition, float(level), action, bool(repeat))
+        with self.lock:
+            self.alerts[alert.id] = alert
+            self.arm(alert)
+        log.info("Alert armed", extra={'fields': alert.describe()})
+        self.on_change()
+        return alert
+
+    def remove(self, alert_id):
+        with self.lock:
+            alert = self.alerts.pop(alert_id, None)
+            if alert is None:
+                return None
+            if alert.state == 'armed':
+                self.disarm(alert)
+            alert.state = 'removed'
+        self.on_change()
+        return alert
+
+    def arm(self, alert):
+        key = (alert.symbol, alert.metric)
+        pair = self.indexes.get(key)
+        if pair is None:
+            pair = self.indexes[key] = (TriggerIndex(True), TriggerIndex(False))
+        pair[alert.condition == 'above'].add(alert.level, alert)
+        alert.state = 'armed'
+        self.armed += 1
+
+    def disarm(self, alert):
+        pair = self.indexes.get((alert.symbol, alert.metric))
+        if pair and pair[alert.condition == 'above'].remove(alert.level, alert):
+            self.armed -= 1
+
+    def describe(self):
+        return [alert.describe() for alert in self.alerts.values()]
+
+    # Values, on feed threads
+
+    def on_trade(self, symbol, price, amount, now=None):
+        quote = self.quotes.get(symbol)
+        if quote is None:
+            quote = self.quotes[symbol] = AlertQuote()
+        volume = quote.add_volume(now or time.time(), price * amount, self.volume_window_s)
+        if self.armed:
+            self.check(symbol, 'price', price)
+            self.check(symbol, 'volume', volume)
+
+    def on_quote(self, symbol, bid, ask):
+        quote = self.quotes.get(symbol)
+        if quote is None:
+            quote = self.quotes[symbol] = AlertQuote()
+        quote.bid, quote.ask = bid, ask
+        if self.armed:
+            self.check(symbol, 'spread', ask - bid)
+            premium = quote.premium()
+            if premium is not None:
+                self.check(symbol, 'premium', premium)
+
+    def on_mark(self, symbol, mark):
+        quote = self.quotes.get(symbol)
+        if quote is None:
+            quote = self.quotes[symbol] = AlertQuote()
+        quote.mark = mark
+        if self.armed:
+            premium = quote.premium()
+            if premium is not None:
+                self.check(symbol, 'premium', premium)
+
+    def on_engine_trade(self, trade):
+        engine = self.engine
+        if engine is not None and engine.symbol not in self.watched:
+            self.on_trade(engine.symbol, trade.price, trade.amount)
+
+    def on_engine_book(self, orderbook):
+        engine = self.engine
+        if engine is None or engine.symbol in self.watched:
+            return
+        symbol = engine.symbol
+        bid, ask = orderbook.best_bid(), orderbook.best_ask()
+        if bid is not None and ask is not None:
+            instrument = orderbook.instrument
+            self.on_quote(symbol, instrument.ticks_to_price(bid), instrument.ticks_to_price(ask))
+
+    def on_engine_mark(self, symbol, mark):
+        if symbol not in self.watched:
+            self.on_mark(symbol, mark)
+
+    def check(self, symbol, metric, value):
+        pair = self.indexes.get((symbol, metric))
+        if pair is None:
+            return
+        self.evaluations += 1
+        below, above = pair
+        with self.lock:
+            for alert in (*below.due(value), *above.due(value)):
+                self.armed -= 1
+                alert.state = 'fired'
+                alert.value = value
+                alert.fired_at = time.time()
+                self.work.put(alert)
+
+    # Notifications and actions, on the alert thread
+
+    def run(self):
+        while True:
+            alert = self.work.get()
+            log.info("Alert fired", extra={'fields': alert.describe()})
+            try:
+                self.on_fire(alert)
+                if alert.action:
+                    self.act(alert)
+            except Exception as e:
+                log.error("Alert %s action failed: %s", alert.id, e, extra={'fields': {'id': alert.id}})
+            if alert.repeat:
+                threading.Timer(self.repeat_cooldown_s, self.rearm, (alert,)).start()
+            self.on_change()
+
+    def act(self, alert):
+        manager = self.order_manager
+        if manager is None or not self.is_allowed():
+            log.warning("Alert action skipped", extra={'fields': {'id': alert.id, 'action': alert.action}})
+            return
+        if alert.action == 'flatten':
+            manager.flatten(alert.symbol)
+        else:
+            order_ids = [order['id'] for order in manager.exchange.fetch_open_orders(alert.symbol)]
+            if order_ids:
+                manager.cancel_orders(order_ids, alert.symbol)
+
+    def rearm(self, alert):
+        with self.lock:
+            if alert.state != 'fired' or alert.id not in self.alerts:
+                return
+            self.arm(alert)
+        self.on_change()
+
+    def stats(self):
+        return {'alerts': len(self.alerts), 'armed': self.armed, 'evaluations': self.evaluations}
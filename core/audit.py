@@ -0,0 +1,146 @@
+"""Audit journal of every order action the terminal sends.
+
+Each action is two JSON lines sharing a client id: a "sent" record with the request
+payload and wall-clock send time, queued just before the request leaves, and a "done"
+record with the ack time, latency, exchange order id and outcome. A "sent" without a
+"done" is an action that was in flight when the terminal stopped.
+
+The order path only appends records to a deque; a writer thread drains everything
+queued since its last pass, writes it and fsyncs once (group commit), so durability
+costs one fsync per burst rather than one per order and never blocks the sender.
+The price is that records reach disk after their request has gone out: a crash can
+lose the last burst, including "sent" records of orders the exchange already has.
+
+    python -m core.audit [path]    prints latency percentiles per action
+"""
+import json
+import os
+import sys
+import threading
+import uuid
+from collections import deque
+from log import get_logger
+
+PERCENTILES = (50, 90, 99)
+log = get_logger('audit')
+
+
+def default_path():
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'orders.jsonl')
+
+
+class OrderJournal:
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.session = uuid.uuid4().hex[:8]
+        self.sequence = 0
+        self.pending = deque()
+        self.running = True
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='order-journal', daemon=True)
+        self.thread.start()
+
+    def next_client_id(self):
+        self.sequence += 1
+        return f"kt-{self.session}-{self.sequence}"
+
+    def sent(self, client_id, action, request, sent_ns):
+        self.pending.append({'stage': 'sent', 'client_id': client_id, 'action': action,
+                             'sent_ns': sent_ns, 'request': request})
+        self.wakeup.set()
+
+    def done(self, client_id, action, sent_ns, ack_ns, latency_ns, order_id, outcome):
+        self.pending.append({'stage': 'done', 'client_id': client_id, 'action': action, 'sent_ns': sent_ns,
+                             'ack_ns': ack_ns, 'latency_us': latency_ns // 1000, 'order_id': order_id,
+                             'outcome': outcome})
+        self.wakeup.set()
+
+    def run(self):
+        while self.running or self.pending:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            self.commit()
+
+    def commit(self):
+        pending = self.pending
+        count = len(pending)
+        if not count:
+            return
+        lines = [json.dumps(pending.popleft(), default=str) for _ in range(count)]
+        try:
+            self.file.write('\n'.join(lines) + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except (OSError, ValueError) as e:
+            log.error("Error writing order journal: %s", e)
+
+    def close(self):
+        if self.running:
+            self.running = False
+            self.wakeup.set()
+            self.thread.join(5)
+            self.file.close()
+
+
+def read_journal(path=None):
+    """Yield journal records in order, skipping a line cut short by a crash."""
+    with open(path or default_path(), encoding='utf-8') as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(0, min(len(sorted_values) - 1, -(-pct * len(sorted_values) // 100) - 1))
+    return sorted_values[rank]
+
+
+def latency_report(path=None):
+    """Per action: count, errors, in-flight (sent without done) and latency percentiles in ms."""
+    open_actions = {}
+    latencies = {}
+    errors = {}
+    for record in read_journal(path):
+        action = record.get('action')
+        if record.get('stage') == 'sent':
+            open_actions[record.get('client_id')] = action
+        elif record.get('stage') == 'done':
+            open_actions.pop(record.get('client_id'), None)
+            latencies.setdefault(action, []).append(record.get('latency_us', 0) / 1000)
+            if record.get('outcome') != 'ok':
+                errors[action] = errors.get(action, 0) + 1
+    in_flight = {}
+    for action in open_actions.values():
+        in_flight[action] = in_flight.get(action, 0) + 1
+
+    report = {}
+    for action in sorted(set(latencies) | set(in_flight)):
+        values = sorted(latencies.get(action, []))
+        stats = {'count': len(values), 'errors': errors.get(action, 0), 'in_flight': in_flight.get(action, 0)}
+        if values:
+            for pct in PERCENTILES:
+                stats[f"p{pct}_ms"] = percentile(values, pct)
+            stats['max_ms'] = values[-1]
+        report[action] = stats
+    return report
+
+
+def main():
+    report = latency_report(sys.argv[1] if len(sys.argv) > 1 else None)
+    columns = ['count', 'errors', 'in_flight'] + [f"p{pct}_ms" for pct in PERCENTILES] + ['max_ms']
+    print(f"{'action':<12}" + ''.join(f"{column:>11}" for column in columns))
+    for action, stats in report.items():
+        cells = []
+        for column in columns:
+            value = stats.get(column)
+            cells.append(f"{value:>11.1f}" if isinstance(value, float) else f"{'-' if value is None else value:>11}")
+        print(f"{action:<12}" + ''.join(cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+from collections import deque, namedtuple
+
+# Immutable payloads handed from the feed thread to consumers: one tuple allocation
+# each, no per-message dicts, and safe to read from any thread.
+Trade = namedtuple('Trade', 'time side price amount')
+Quote = namedtuple('Quote', 'bid ask bid_ticks ask_ticks')
+# Fair prices in fractional ticks, imbalance and flow in -1..+1, cvd in contracts
+Signals = namedtuple('Signals', 'micro_ticks depth_ticks imbalance cvd flow')
+Order = namedtuple('Order', 'id side qty limit_price filled type reduce_only last_update')
+# Feed freshness: state is 'live', 'stale' (socket open, feeds silent) or 'down'
+FeedHealth = namedtuple('FeedHealth', 'state age_ms failovers')
+
+
+class Batch:
+    """Collects items from a producer thread and notifies once per undrained batch.
+
+    notify (e.g. a queued Qt signal) fires only when the consumer has taken everything
+    since the last notification, so a burst of trades costs one cross-thread event.
+    """
+    __slots__ = ('pending', 'posted', 'notify')
+
+    def __init__(self, notify):
+        self.pending = deque()
+        self.posted = False
+        self.notify = notify
+
+    def add(self, item):
+        self.pending.append(item)
+        if not self.posted:
+            self.posted = True
+            self.notify()
+
+    def take(self):
+        # Clear the flag before draining so an item added meanwhile re-notifies
+        self.posted = False
+        pending = self.pending
+        return [pending.popleft() for _ in range(len(pending))]
+
+
+class Latest:
+    """Keeps only the newest value from a producer thread, notifying once until it is taken."""
+    __slots__ = ('value', 'posted', 'notify')
+
+    def __init__(self, notify):
+        self.value = None
+        self.posted = False
+        self.notify = notify
+
+    def set(self, value):
+        self.value = value
+        if not self.posted:
+            self.posted = True
+            self.notify()
+
+    def take(self):
+        self.posted = False
+        return self.value
@@ -0,0 +1,459 @@
+import itertools
+import random
+import threading
+import time
+from collections import deque
+import ccxt
+from core.market_data import MarketDataEngine, load_instrument
+from core.orders import REQUEST_COSTS
+from log import get_logger
+
+log = get_logger('execution')
+
+FINISHED = ('done', 'expired', 'cancelled', 'failed')
+
+
+def _ignore(*args):
+    pass
+
+
+class VolumeWindow:
+    """Traded size over the last window_s, the 1M VOL figure, kept as a running sum."""
+    __slots__ = ('window_s', 'trades', 'total')
+
+    def __init__(self, window_s=60):
+        self.window_s = window_s
+        self.trades = deque()
+        self.total = 0.0
+
+    def add(self, trade):
+        if trade.amount > 0:
+            self.trades.append((time.time(), trade.amount))
+            self.total += trade.amount
+
+    def volume(self, now=None):
+        cutoff = (now or time.time()) - self.window_s
+        trades = self.trades
+        while trades and trades[0][0] <= cutoff:
+            self.total -= trades.popleft()[1]
+        if not trades:
+            self.total = 0.0
+        return self.total
+
+
+class ExecutionFeed:
+    """The scheduler's own public feed for one symbol, independent of the symbol on screen."""
+    __slots__ = ('engine', 'volume', 'thread')
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.volume = VolumeWindow()
+        engine.trade_listeners.append(self.volume.add)
+        self.thread = threading.Thread(target=engine.run, name=f"execution-feed-{engine.symbol}", daemon=True)
+        self.thread.start()
+
+
+class ChildOrder:
+    __slots__ = ('order_id', 'parent', 'units', 'ticks', 'filled_units', 'done', 'placed_at', 'expires', 'cancel_sent')
+
+    def __init__(self, order_id, parent, units, ticks, placed_at, expires):
+        self.order_id = order_id
+        self.parent = parent
+        self.units = units
+        self.ticks = ticks
+        self.filled_units = 0
+        self.done = False
+        self.placed_at = placed_at
+        self.expires = expires
+        self.cancel_sent = None
+
+
+class ParentOrder:
+    """A large order worked as post-only children, one resting at a time.
+
+    'twap' spreads amount evenly over duration_s; 'iceberg' shows about display
+    at a time until amount is filled. limit_price, if set, is the worst price a
+    child may rest at.
+    """
+    __slots__ = ('id', 'symbol', 'side', 'style', 'amount', 'duration_s', 'display', 'limit_price', 'instrument',
+                 'units', 'display_units', 'limit_ticks', 'filled_units', 'cost_ticks', 'children', 'child', 'state',
+                 'error', 'started', 'finished', 'throttled', 'failures')
+
+    def __init__(self, parent_id, symbol, side, style, amount, duration_s, display, limit_price):
+        self.id = parent_id
+        self.symbol = symbol
+        self.side = side
+        self.style = style
+        self.amount = amount
+        self.duration_s = duration_s
+        self.display = display
+        self.limit_price = limit_price
+        # Resolved on the worker thread once the symbol's instrument is loaded
+        self.instrument = None
+        self.units = 0
+        self.display_units = 0
+        self.limit_ticks = None
+        self.filled_units = 0
+        self.cost_ticks = 0
+        self.children = 0
+        self.child = None
+        self.state = 'starting'
+        self.error = None
+        self.started = time.monotonic()
+        self.finished = None
+        self.throttled = 0
+        self.failures = 0
+
+    def describe(self):
+        instrument = self.instrument
+        filled = instrument.units_to_size(self.filled_units) if instrument else 0.0
+        child = self.child
+        return {'id': self.id, 'symbol': self.symbol, 'side': self.side, 'style': self.style, 'amount': self.amount,
+                'filled': filled, 'progress': self.filled_units / self.units if self.units else 0.0,
+                'average_price': instrument.ticks_to_price(self.cost_ticks / self.filled_units)
+                if self.filled_units else None,
+                'working': instrument.units_to_size(child.units - child.filled_units) if child else 0.0,
+                'working_price': instrument.ticks_to_price(child.ticks) if child else None,
+                'children': self.children, 'state': self.state, 'error': self.error, 'throttled': self.throttled,
+                'elapsed_s': round((self.finished or time.monotonic()) - self.started, 1),
+                'duration_s': self.duration_s, 'display': self.display, 'limit_price': self.limit_price}
+
+
+class ExecutionScheduler:
+    """Works TWAP and iceberg parent orders as post-only child orders on a worker thread.
+
+    Each child joins the best price on its side. Its size is the schedule's
+    (TWAP: the amount due by the end of the next slice, less what is filled;
+    iceberg: the display size) capped at depth_fraction of what rests in the top
+    depth_levels on that side and at participation of the size expected to trade
+    in one slice at the last minute's volume. A child is cancelled and replaced
+    when its slice ends or the market moves reprice_ticks away from it.
+
+    Every symbol with parents gets its own MarketDataEngine, so parents keep
+    working while the terminal shows something else. Fills are read from the
+    open_orders feed of those engines and of any engine passed to attach();
+    in paper trading, where only the attached engine sees paper fills, own feeds
+    are public only.
+
+    Orders go through the shared OrderManager and are held back while they would
+    leave less than rate_reserve of its REST budget for everything else.
+    """
+
+    def __init__(self, order_manager, slice_s=10, participation=0.1, depth_fraction=0.25, depth_levels=5,
+                 reprice_ticks=2, rate_reserve=0.5, paper=False, tick_s=0.25, variance=0.2):
+        self.order_manager = order_manager
+        self.slice_s = slice_s
+        self.participation = participation
+        self.depth_fraction = depth_fraction
+        self.depth_levels = depth_levels
+        self.reprice_ticks = reprice_ticks
+        self.rate_reserve = rate_reserve
+        self.paper = paper
+        self.tick_s = tick_s
+        # Iceberg clips vary by up to this fraction so the refills are harder to spot
+        self.variance = variance
+        # A child rests at least this long before it is repriced
+        self.min_rest_s = 1.0
+        self.cancel_timeout_s = 5.0
+        self.lock = threading.RLock()
+        self.parents = {}
+        self.feeds = {}
+        self.children = {}
+        # Updates for orders whose create_order call has not returned yet
+        self.early_updates = {}
+        self.ids = itertools.count(1)
+        self.wake = threading.Event()
+        self.on_change = _ignore
+        threading.Thread(target=self.run, name='execution', daemon=True).start()
+
+    def attach(self, engine):
+        engine.order_listeners.append(self.on_order_update)
+
+    def detach(self, engine):
+        if self.on_order_update in engine.order_listeners:
+            engine.order_listeners.remove(self.on_order_update)
+
+    # Parents, from the GUI or control thread
+
+    def start(self, symbol, side, amount, style='twap', duration_s=None, display=None, limit_price=None):
+        if side not in ('buy', 'sell'):
+            raise ValueError("side must be 'buy' or 'sell'")
+        if amount is None or amount <= 0:
+            raise ValueError("amount must be positive")
+        if style == 'twap':
+            if not duration_s or duration_s <= 0:
+                raise ValueError("A TWAP needs a positive duration")
+        elif style == 'iceberg':
+            if not display or display <= 0:
+                raise ValueError("An iceberg needs a positive display size")
+        else:
+            raise ValueError("style must be 'twap' or 'iceberg'")
+        with self.lock:
+            parent = ParentOrder(next(self.ids), symbol, side, style, float(amount), duration_s,
+                                 None if display is None else float(display),
+                                 None if limit_price is None else float(limit_price))
+            self.parents[parent.id] = parent
+        log.info("Parent order started", extra={'fields': parent.describe()})
+        self.wake.set()
+        self.on_change()
+        return parent
+
+    def cancel(self, parent_id):
+        """Stop working a parent; its resting child is cancelled by the worker."""
+        with self.lock:
+            parent = self.parents.get(parent_id)
+            if parent is None or parent.state in FINISHED:
+                return None
+            parent.state = 'cancelling'
+        self.wake.set()
+        self.on_change()
+        return parent
+
+    def active(self):
+        return [parent for parent in self.parents.values() if parent.state not in FINISHED]
+
+    def describe(self):
+        return [parent.describe() for parent in self.parents.values()]
+
+    def clear_finished(self):
+        with self.lock:
+            for parent_id in [p.id for p in self.parents.values() if p.state in FINISHED]:
+                del self.parents[parent_id]
+        self.on_change()
+
+    def stop(self):
+        """Cancel every working parent and its resting child now, e.g. on shutdown."""
+        for parent in self.active():
+            child = parent.child
+            if child is not None and not child.done:
+                try:
+                    self.order_manager.cancel_order(child.order_id, parent.symbol)
+                except Exception as e:
+                    log.error("Could not cancel child %s: %s", child.order_id, e,
+                              extra={'fields': {'parent': parent.id}})
+            self.finish(parent, 'cancelled')
+        self.release_feeds()
+
+    # Fills, on feed threads
+
+    def on_order_update(self, data):
+        with self.lock:
+            if data.get('feed') == 'open_orders_snapshot':
+                rows = {row.get('order_id'): row for row in data.get('orders', [])}
+                now = time.monotonic()
+                for order_id, child in list(self.children.items()):
+                    row = rows.get(order_id)
+                    if row is not None:
+                        self.update_child(child, float(row.get('filled', 0)), False)
+                    elif now - child.placed_at > 1.0:
+                        # Gone while this feed was down, or dropped by the paper exchange on a symbol change
+                        self.update_child(child, None, True)
+                return
+            order = data.get('order')
+            order_id = order.get('order_id') if order else data.get('order_id')
+            if order:
+                filled = float(order.get('filled', 0))
+                done = data.get('is_cancel', False) or filled >= float(order.get('qty', 0))
+            else:
+                filled = None
+                done = data.get('is_cancel', False)
+            if data.get('reason') == 'full_fill':
+                filled, done = float('inf'), True
+            child = self.children.get(order_id)
+            if child is None:
+                if order_id is not None:
+                    self.early_updates[order_id] = (filled, done)
+                    if len(self.early_updates) > 256:
+                        self.early_updates.pop(next(iter(self.early_updates)))
+                return
+            self.update_child(child, filled, done)
+
+    def update_child(self, child, filled, done):
+        parent = child.parent
+        if filled is not None:
+            units = min(child.units, parent.instrument.size_to_units(filled)) if filled != float('inf') \
+                else child.units
+            if units > child.filled_units:
+                added = units - child.filled_units
+                child.filled_units = units
+                parent.filled_units += added
+                parent.cost_ticks += added * child.ticks
+                log.info("Child filled", extra={'fields': {'parent': parent.id, 'order_id': child.order_id,
+                                                           'filled': parent.instrument.units_to_size(units)}})
+        if done and not child.done:
+            child.done = True
+            self.children.pop(child.order_id, None)
+        self.wake.set()
+        self.on_change()
+
+    # Scheduling, on the worker thread
+
+    def run(self):
+        while True:
+            self.wake.wait(self.tick_s)
+            self.wake.clear()
+            for parent in list(self.parents.values()):
+                if parent.state in FINISHED:
+                    continue
+                try:
+                    self.step(parent, time.monotonic())
+                    parent.failures = 0
+                except Exception as e:
+                    parent.failures += 1
+                    log.error("Parent %s step failed: %s", parent.id, e, extra={'fields': {'parent': parent.id}})
+                    if parent.failures >= 3 or parent.instrument is None:
+                        self.finish(parent, 'failed', str(e))
+            self.release_feeds()
+
+    def step(self, parent, now):
+        if parent.instrument is None:
+            self.prepare(parent)
+        feed = self.feeds[parent.symbol]
+        child = parent.child
+        if child is not None:
+            if not child.done:
+                self.manage(parent, child, feed, now)
+                return
+            parent.child = None
+        if parent.state == 'cancelling':
+            self.finish(parent, 'cancelled')
+            return
+        remaining = parent.units - parent.filled_units
+        if remaining <= 0:
+            self.finish(parent, 'done')
+            return
+        if parent.style == 'twap':
+            if now >= parent.started + parent.duration_s:
+                self.finish(parent, 'expired')
+                return
+            # Catch-up schedule: everything due by the end of the next slice, less what already filled
+            due = min(1.0, (now - parent.started + self.slice_s) / parent.duration_s)
+            wanted = int(parent.units * due) - parent.filled_units
+            expires = min(now + self.slice_s, parent.started + parent.duration_s)
+        else:
+            wanted = round(parent.display_units * random.uniform(1 - self.variance, 1 + self.variance))
+            expires = None
+        if wanted <= 0:
+            return
+        instrument = parent.instrument
+        engine = feed.engine
+        with engine.lock:
+            book = engine.orderbook
+            ticks = book.best_bid() if parent.side == 'buy' else book.best_ask()
+            if ticks is None:
+                return
+            depth = book.depth(parent.side, self.depth_levels)
+            volume = feed.volume.volume()
+        if parent.limit_ticks is not None:
+            ticks = min(ticks, parent.limit_ticks) if parent.side == 'buy' else max(ticks, parent.limit_ticks)
+        units = min(wanted, remaining, max(1, int(depth * self.depth_fraction)))
+        if volume:
+            units = min(units, max(1, int(instrument.size_to_units(volume) * self.participation * self.slice_s / 60)))
+        if not self.budget_allows(parent, REQUEST_COSTS['place'] + REQUEST_COSTS['cancel']):
+            return
+        try:
+            order = self.order_manager.place_order(parent.symbol, parent.side, instrument.units_to_size(units),
+                                                   instrument.ticks_to_price(ticks))
+        except ccxt.OrderImmediatelyFillable:
+            # The market moved through the price while the order was in flight; try again next tick
+            return
+        order_id = (order or {}).get('id')
+        if order_id is None:
+            raise RuntimeError("Exchange returned no order id")
+        with self.lock:
+            child = ChildOrder(order_id, parent, units, ticks, now, expires)
+            parent.child = child
+            parent.children += 1
+            self.children[order_id] = child
+            early = self.early_updates.pop(order_id, None)
+            if early is not None:
+                self.update_child(child, *early)
+        log.info("Child placed", extra={'fields': {'parent': parent.id, 'order_id': order_id, 'side': parent.side,
+                                                   'size': instrument.units_to_size(units),
+                                                   'price': instrument.ticks_to_price(ticks)}})
+        self.on_change()
+
+    def manage(self, parent, child, feed, now):
+        if child.cancel_sent is not None:
+            if now - child.cancel_sent > self.cancel_timeout_s:
+                log.warning("No cancel confirmation for child", extra={'fields': {'parent': parent.id,
+                                                                                  'order_id': child.order_id}})
+                with self.lock:
+                    self.update_child(child, None, True)
+            return
+        reason = None
+        if parent.state == 'cancelling':
+            reason = 'parent cancelled'
+        elif child.expires is not None and now >= child.expires:
+            reason = 'slice ended'
+        elif now - child.placed_at >= self.min_rest_s:
+            with feed.engine.lock:
+                book = feed.engine.orderbook
+                best = book.best_bid() if parent.side == 'buy' else book.best_ask()
+            if best is not None:
+                if parent.limit_ticks is not None:
+                    best = min(best, parent.limit_ticks) if parent.side == 'buy' else max(best, parent.limit_ticks)
+                away = best - child.ticks if parent.side == 'buy' else child.ticks - best
+                if away >= self.reprice_ticks:
+                    reason = 'reprice'
+        if reason is None:
+            return
+        if reason != 'parent cancelled' and not self.budget_allows(parent, REQUEST_COSTS['cancel']):
+            return
+        child.cancel_sent = now
+        try:
+            self.order_manager.cancel_order(child.order_id, parent.symbol)
+        except ccxt.OrderNotFound:
+            # Filled or cancelled before the request arrived; its last update says which
+            with self.lock:
+                self.update_child(child, None, True)
+        log.info("Child cancelled", extra={'fields': {'parent': parent.id, 'order_id': child.order_id,
+                                                      'reason': reason}})
+
+    def budget_allows(self, parent, cost):
+        budget = self.order_manager.budget
+        if budget.allows(cost, budget.capacity * self.rate_reserve):
+            return True
+        parent.throttled += 1
+        return False
+
+    def prepare(self, parent):
+        instrument = self.open_feed(parent.symbol).engine.instrument
+        parent.instrument = instrument
+        parent.units = instrument.size_to_units(parent.amount)
+        if parent.units <= 0:
+            raise ValueError(f"Size {parent.amount} is below the contract precision")
+        if parent.display is not None:
+            parent.display_units = max(1, instrument.size_to_units(parent.display))
+        if parent.limit_price is not None:
+            parent.limit_ticks = instrument.price_to_ticks(parent.limit_price)
+        parent.started = time.monotonic()
+        if parent.state == 'starting':
+            parent.state = 'working'
+
+    def finish(self, parent, state, error=None):
+        with self.lock:
+            parent.state = state
+            parent.error = error
+            parent.finished = time.monotonic()
+        log.info("Parent order finished", extra={'fields': parent.describe()})
+        self.on_change()
+
+    # Feeds
+
+    def open_feed(self, symbol):
+        feed = self.feeds.get(symbol)
+        if feed is None:
+            instrument, _ = load_instrument(self.order_manager.exchange, symbol)
+            engine = MarketDataEngine(symbol, instrument)
+            engine.private_feeds = not self.paper
+            self.attach(engine)
+            feed = self.feeds[symbol] = ExecutionFeed(engine)
+        return feed
+
+    def release_feeds(self):
+        working = {parent.symbol for parent in self.parents.values() if parent.state not in FINISHED}
+        for symbol in [symbol for symbol in self.feeds if symbol not in working]:
+            feed = self.feeds.pop(symbol)
+            self.detach(feed.engine)
+            feed.engine.stop()
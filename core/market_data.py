@@ -0,0 +1,504 @@
+import websocket
+import json
+import time
+import hashlib
+import base64
+import hmac
+import threading
+from collections import deque
+from settings import (KRAKEN_API_KEY, KRAKEN_API_SECRET, KRAKEN_WS_URL, BOOK_UPDATE_THROTTLE, FEED_STANDBY_ENABLED,
+                      FEED_STALE_MS, FEED_WATCHDOG_MS, BOOK_STALE_MS, BOOK_RESYNC_TIMEOUT_MS)
+from instrument import Instrument
+from orderbook import OrderBook
+from core.account import AccountState
+from core.events import FeedHealth, Trade, Quote
+from log import get_logger
+
+ACCOUNT_FEEDS = ('open_orders_snapshot', 'open_orders', 'open_positions', 'open_positions_snapshot')
+log = get_logger('feed')
+
+
+def _ignore(*args):
+    pass
+
+
+def sign_challenge(challenge, api_secret):
+    challenge_hash = hashlib.sha256(challenge.encode()).digest()
+    secret_decoded = base64.b64decode(api_secret)
+    signature = hmac.new(secret_decoded, challenge_hash, hashlib.sha512)
+    return base64.b64encode(signature.digest()).decode()
+
+
+def load_instrument(exchange, symbol):
+    """Return (Instrument, initial margin requirement) for symbol from the exchange markets."""
+    exchange.load_markets()
+    market = exchange.market(symbol)
+    instrument = Instrument(symbol, market['precision']['price'], market['precision']['amount'])
+    return instrument, float(market['info']['marginLevels'][0]['initialMargin'])
+
+
+class BookSyncStats:
+    """Book integrity problems found, by kind, and how long each resync took to restore the book."""
+    __slots__ = ('gaps', 'crossed', 'stale', 'resyncs', 'held', 'durations_ms')
+
+    def __init__(self):
+        self.gaps = 0
+        self.crossed = 0
+        self.stale = 0
+        self.resyncs = 0
+        # Deltas dropped while waiting for a resync snapshot
+        self.held = 0
+        self.durations_ms = deque(maxlen=256)
+
+    def summary(self):
+        durations = sorted(self.durations_ms)
+        return {'gaps': self.gaps, 'crossed': self.crossed, 'stale': self.stale, 'resyncs': self.resyncs,
+                'held': self.held, 'resync_ms_p50': durations[len(durations) // 2] if durations else None,
+                'resync_ms_max': durations[-1] if durations else None}
+
+
+class FeedConnection:
+    """One WebSocket to the feed, reconnecting until the engine stops.
+
+    role is 'primary' (public and private feeds, and the one the engine sends through)
+    or 'standby' (public feeds only). seen records when each feed last arrived on this
+    socket, before deduplication, so a connection's freshness is its own.
+    """
+
+    def __init__(self, engine, role):
+        self.engine = engine
+        self.role = role
+        self.ws = None
+        self.connected = False
+        self.opened_at = time.monotonic()
+        self.seen = {}
+
+    def send(self, message):
+        if self.ws and self.connected:
+            self.ws.send(json.dumps(message))
+
+    def fresh(self, now, stale_ms):
+        if not self.connected:
+            return False
+        for feed, limit_ms in stale_ms.items():
+            if (now - self.seen.get(feed, self.opened_at)) * 1000 > limit_ms:
+                return False
+        return True
+
+    def age_ms(self, now):
+        return int((now - max(self.seen.values(), default=self.opened_at)) * 1000)
+
+    def restart(self):
+        """Drop the socket; run() reconnects and resubscribes, which also reloads the book."""
+        self.opened_at = time.monotonic()
+        self.connected = False
+        if self.ws:
+            self.ws.close()
+
+    def run(self):
+        engine = self.engine
+
+        def on_message(ws, message):
+            with engine.lock:
+                profile = engine.profile
+                if profile is None:
+                    engine.handle_message(message, self)
+                else:
+                    profile.enable()
+                    engine.handle_message(message, self)
+                    profile.disable()
+
+        def on_error(ws, error):
+            log.error("WebSocket error: %s", error, extra={'fields': {'role': self.role}})
+            if self.role == 'primary':
+                engine.on_error()
+
+        def on_close(ws, close_status_code, close_msg):
+            log.info("WebSocket connection closed", extra={'fields': {'role': self.role}})
+            self.connected = False
+            if engine.running:
+                engine.connection_lost(self)
+
+        def on_open(ws):
+            log.info("WebSocket connection opened", extra={'fields': {'symbol': engine.symbol, 'role': self.role}})
+            with engine.lock:
+                self.connected = True
+                self.opened_at = time.monotonic()
+                self.seen = {}
+                engine.subscribe_public(self)
+
+        while engine.running:
+            try:
+                self.ws = websocket.WebSocketApp(
+                    engine.url,
+                    on_message=on_message,
+                    on_error=on_error,
+                    on_close=on_close)
+                self.ws.on_open = on_open
+                self.ws.run_forever(ping_interval=engine.ping_interval, ping_timeout=engine.ping_timeout)
+                if not engine.running:
+                    break
+            except Exception as e:
+                log.error("WebSocket connection error: %s", e, extra={'fields': {'role': self.role}})
+                time.sleep(1)
+
+
+class MarketDataEngine:
+    """Kraken Futures feed client for one instrument, independent of any GUI toolkit.
+
+    Consumers attach plain callables to the on_* attributes; they are invoked on the
+    thread that calls run(), or the standby connection's thread while it is the one
+    delivering (never both at once), and on_health on the watchdog thread.
+
+    With standby set, a second connection subscribes to the same public feeds and the
+    first copy of each message wins. A watchdog checks every feed in stale_ms for
+    silence; a stale or closed primary fails over to a fresh standby, which
+    resubscribes the book for a new snapshot, or else is reconnected.
+
+    Book deltas must arrive in seq order. A gap, a delta that crosses the book, or a
+    book that stays silent while trades print puts the book on hold: the last good
+    state is kept, further deltas are dropped, and just the book is resubscribed
+    for a fresh snapshot. book_stats counts each kind and the time to recover.
+    """
+
+    def __init__(self, symbol, instrument, api_key=KRAKEN_API_KEY, api_secret=KRAKEN_API_SECRET, url=KRAKEN_WS_URL,
+                 standby=FEED_STANDBY_ENABLED):
+        self.symbol = symbol
+        self.instrument = instrument
+        self.url = url
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.running = True
+        self.stopped = threading.Event()
+        self.lock = threading.RLock()
+        self.primary = FeedConnection(self, 'primary')
+        self.connections = [self.primary, FeedConnection(self, 'standby')] if standby else [self.primary]
+        # Last seq (or time, for tickers) accepted per (feed, product) when two connections deliver the same feeds
+        self.last_seq = {}
+        self.stale_ms = dict(FEED_STALE_MS)
+        self.watchdog_ms = int(FEED_WATCHDOG_MS)
+        self.health = None
+        self.failovers = 0
+        self.book_seq = None
+        self.book_stats = BookSyncStats()
+        self.book_stale_ms = int(BOOK_STALE_MS)
+        self.resync_timeout_ms = int(BOOK_RESYNC_TIMEOUT_MS)
+        # monotonic time the current resync began and its request was last sent, None while the book is good
+        self.resync_started = None
+        self.resync_sent = None
+        self.resync_reason = None
+        self.last_book_time = time.monotonic()
+        self.trades_since_book = False
+        self.orderbook = OrderBook(instrument)
+        self.account = AccountState(symbol)
+        self.last_book_update = 0
+        self.book_throttle = BOOK_UPDATE_THROTTLE
+        self.ping_interval = 30
+        self.ping_timeout = 10
+        self.ticker_subscriptions = {symbol}
+        # Cleared in paper trading, where the simulator is the only source of orders and positions
+        self.private_feeds = True
+        self.message_counts = {}
+        self.thread_ident = None
+        # Set by Diagnostics to a cProfile.Profile enabled around each message on the feed thread
+        self.profile = None
+
+        # Unthrottled taps for in-process consumers, called on the feed thread
+        self.book_listeners = []
+        self.trade_listeners = []
+        self.mark_listeners = []
+        # Raw book changes for recorders: (orderbook, time_ms) and (orderbook, side, ticks, time_ms)
+        self.book_snapshot_listeners = []
+        self.book_delta_listeners = []
+        # Parsed open_orders/open_orders_snapshot messages, for anything tracking its own orders
+        self.order_listeners = []
+
+        self.on_trade = _ignore
+        self.on_last_price = _ignore
+        self.on_book = _ignore
+        self.on_index = _ignore
+        self.on_orders = _ignore
+        self.on_position = _ignore
+        self.on_error = _ignore
+        self.on_health = _ignore
+
+    @property
+    def open_orders(self):
+        return self.account.open_orders
+
+    @property
+    def portfolio(self):
+        return self.account.portfolio
+
+    def send(self, message):
+        self.primary.send(message)
+
+    def handle_message(self, message, connection=None):
+        try:
+            data = json.loads(message)
+            feed = data.get('feed')
+            kind = feed or data.get('event')
+            self.message_counts[kind] = self.message_counts.get(kind, 0) + 1
+            if connection is not None:
+                connection.seen[kind] = time.monotonic()
+                if len(self.connections) > 1 and not self.first_arrival(data, feed, connection):
+                    return
+
+            if data.get('event') == 'challenge':
+                self.subscribe_private(data['message'], connection or self.primary)
+
+            elif feed == 'trade' and data.get('price') and data.get('qty'):
+                trade = Trade(data.get('time', int(time.time() * 1000)), data.get('side', 'unknown'),
+                              float(data['price']), float(data['qty']))
+                self.trades_since_book = True
+                for listener in self.trade_listeners:
+                    listener(trade)
+                self.on_trade(trade)
+                self.on_last_price(trade.price)
+
+            elif feed == 'book_snapshot':
+                seq = data.get('seq')
+                if (connection is not None and connection is not self.primary and seq is not None
+                        and self.book_seq is not None and seq <= self.book_seq):
+                    return
+                self.orderbook.load_snapshot(data.get('bids', []), data.get('asks', []))
+                self.book_seq = seq
+                self.last_book_time = time.monotonic()
+                self.trades_since_book = False
+                if self.resync_started is not None:
+                    self.resync_done()
+                if self.book_snapshot_listeners:
+                    time_ms = data.get('timestamp') or int(time.time() * 1000)
+                    for listener in self.book_snapshot_listeners:
+                        listener(self.orderbook, time_ms)
+                self.book_changed()
+
+            elif feed == 'book':
+                if all(key in data for key in ('side', 'price', 'qty')):
+                    if self.resync_started is not None:
+                        self.book_stats.held += 1
+                        return
+                    seq = data.get('seq')
+                    if seq is not None and self.book_seq is not None:
+                        if seq <= self.book_seq:
+                            # Already applied: the other connection's copy, or a replay
+                            return
+                        if seq != self.book_seq + 1:
+                            self.book_stats.gaps += 1
+                            self.resync('gap', expected=self.book_seq + 1, seq=seq)
+                            return
+                    self.book_seq = seq
+                    self.last_book_time = time.monotonic()
+                    self.trades_since_book = False
+                    orderbook = self.orderbook
+                    side = data['side']
+                    # Only a level with size can cross, and only against the opposite best; a crossing
+                    # delta is neither applied nor passed on, so the held book is the last good one
+                    if data['qty'] and self.instrument.size_to_units(data['qty']) > 0:
+                        ticks = self.instrument.price_to_ticks(data['price'])
+                        if side in ('bids', 'buy'):
+                            opposite = orderbook.best_ask()
+                            crossed = opposite is not None and ticks >= opposite
+                        else:
+                            opposite = orderbook.best_bid()
+                            crossed = opposite is not None and ticks <= opposite
+                        if crossed:
+                            self.book_stats.crossed += 1
+                            self.resync('crossed', seq=seq)
+                            return
+                    ticks = orderbook.apply_delta(side, data['price'], data['qty'])
+                    if self.book_delta_listeners:
+                        time_ms = data.get('timestamp') or int(time.time() * 1000)
+                        for listener in self.book_delta_listeners:
+                            listener(orderbook, side, ticks, time_ms)
+                    self.book_changed()
+
+            elif feed in ACCOUNT_FEEDS:
+                self.handle_account(data)
+
+            elif feed == 'ticker':
+                if 'markPrice' in data:
+                    mark_price = float(data['markPrice'])
+                    product_id = data.get('product_id', self.symbol)
+                    self.account.portfolio.update_mark(product_id, mark_price)
+                    for listener in self.mark_listeners:
+                        listener(product_id, mark_price)
+                    if product_id == self.symbol:
+                        self.on_index(mark_price)
+
+        except Exception:
+            log.exception("Error in message processing", extra={'fields': {'symbol': self.symbol}})
+
+    def handle_account(self, data):
+        """Apply a parsed open_orders/open_positions message; paper trading delivers its fills here too."""
+        if data.get('feed') in ('open_orders_snapshot', 'open_orders'):
+            self.account.handle_order_update(data)
+            for listener in self.order_listeners:
+                listener(data)
+            self.on_orders(tuple(self.account.open_orders.values()))
+        else:
+            held = self.account.handle_positions(data.get('positions', []))
+            new_tickers = [symbol for symbol in held if symbol not in self.ticker_subscriptions]
+            if new_tickers:
+                self.ticker_subscriptions.update(new_tickers)
+                self.send({"event": "subscribe", "feed": "ticker", "product_ids": new_tickers})
+            self.on_position(self.account.position)
+
+    def first_arrival(self, data, feed, connection):
+        """False for a copy of a trade or ticker the other connection already delivered.
+
+        Book messages are ordered and deduplicated by their seq in handle_message.
+        """
+        if feed == 'trade':
+            key, mark = ('trade', data.get('product_id')), data.get('seq')
+        elif feed == 'ticker':
+            key, mark = ('ticker', data.get('product_id')), data.get('time')
+        elif feed == 'book_snapshot' and connection is self.primary:
+            # A snapshot on the primary is authoritative: restart the baselines for the product
+            product_id = data.get('product_id')
+            self.last_seq.pop(('trade', product_id), None)
+            self.last_seq.pop(('ticker', product_id), None)
+            return True
+        else:
+            return True
+        if mark is None:
+            return True
+        last = self.last_seq.get(key)
+        if last is not None and mark <= last:
+            return False
+        self.last_seq[key] = mark
+        return True
+
+    def resync(self, reason, **fields):
+        """Hold the book at its last good state and resubscribe just the book for a fresh snapshot."""
+        now = time.monotonic()
+        if self.resync_started is None:
+            self.resync_started = now
+            self.resync_reason = reason
+            self.book_stats.resyncs += 1
+            log.warning("Book resync", extra={'fields': {'symbol': self.symbol, 'reason': reason, **fields}})
+        self.resync_sent = now
+        self.send({"event": "unsubscribe", "feed": "book", "product_ids": [self.symbol]})
+        self.send({"event": "subscribe", "feed": "book", "product_ids": [self.symbol]})
+
+    def resync_done(self):
+        duration_ms = round((time.monotonic() - self.resync_started) * 1000, 1)
+        self.book_stats.durations_ms.append(duration_ms)
+        log.info("Book resynced", extra={'fields': {'symbol': self.symbol, 'reason': self.resync_reason,
+                                                    'duration_ms': duration_ms, 'gaps': self.book_stats.gaps}})
+        self.resync_started = self.resync_sent = self.resync_reason = None
+
+    def subscribe_private(self, challenge, connection):
+        signed_challenge = sign_challenge(challenge, self.api_secret)
+        for feed in ('open_orders', 'open_positions'):
+            connection.send({
+                "event": "subscribe",
+                "feed": feed,
+                "api_key": self.api_key,
+                "original_challenge": challenge,
+                "signed_challenge": signed_challenge
+            })
+
+    def subscribe_public(self, connection):
+        if connection is self.primary:
+            self.ticker_subscriptions = {self.symbol}
+        for feed in ('book', 'trade', 'ticker'):
+            connection.send({"event": "subscribe", "feed": feed, "product_ids": [self.symbol]})
+        if connection is self.primary and self.private_feeds:
+            connection.send({"event": "challenge", "api_key": self.api_key})
+
+    def standby(self):
+        return next((c for c in self.connections if c is not self.primary), None)
+
+    def failover(self, standby):
+        """Promote standby to primary and demote the old primary, which reconnects as the standby."""
+        old = self.primary
+        old.role, standby.role = 'standby', 'primary'
+        self.primary = standby
+        self.failovers += 1
+        log.warning("Feed failover", extra={'fields': {'symbol': self.symbol, 'failovers': self.failovers,
+                                                       'silent_ms': old.age_ms(time.monotonic())}})
+        self.resync('failover')
+        other_tickers = sorted(self.ticker_subscriptions - {self.symbol})
+        if other_tickers:
+            standby.send({"event": "subscribe", "feed": "ticker", "product_ids": other_tickers})
+        if self.private_feeds:
+            standby.send({"event": "challenge", "api_key": self.api_key})
+        old.restart()
+
+    def connection_lost(self, connection):
+        with self.lock:
+            if connection is not self.primary:
+                return
+            standby = self.standby()
+            if standby is not None and standby.fresh(time.monotonic(), self.stale_ms):
+                self.failover(standby)
+                return
+        self.on_error()
+
+    def check_feeds(self):
+        """One watchdog pass: fail over or reconnect silent connections and report the primary's health."""
+        now = time.monotonic()
+        with self.lock:
+            primary = self.primary
+            if not primary.fresh(now, self.stale_ms):
+                standby = self.standby()
+                if standby is not None and standby.fresh(now, self.stale_ms):
+                    self.failover(standby)
+                elif primary.connected:
+                    log.warning("Feed stale, reconnecting", extra={'fields': {'symbol': self.symbol,
+                                                                              'silent_ms': primary.age_ms(now)}})
+                    primary.restart()
+            standby = self.standby()
+            if standby is not None and standby.connected and not standby.fresh(now, self.stale_ms):
+                standby.restart()
+            if self.resync_started is not None:
+                if (now - self.resync_sent) * 1000 > self.resync_timeout_ms:
+                    self.resync(self.resync_reason)
+            elif self.trades_since_book and (now - self.last_book_time) * 1000 > self.book_stale_ms:
+                self.book_stats.stale += 1
+                self.resync('stale', silent_ms=int((now - self.last_book_time) * 1000))
+            primary = self.primary
+            if primary.fresh(now, self.stale_ms):
+                state = 'live'
+            else:
+                state = 'stale' if primary.connected else 'down'
+        if state != self.health:
+            self.health = state
+            self.on_health(FeedHealth(state, primary.age_ms(now), self.failovers))
+
+    def watch(self):
+        while not self.stopped.wait(self.watchdog_ms / 1000):
+            try:
+                self.check_feeds()
+            except Exception:
+                log.exception("Error in feed watchdog", extra={'fields': {'symbol': self.symbol}})
+
+    def book_changed(self):
+        for listener in self.book_listeners:
+            listener(self.orderbook)
+        self.emit_book_update()
+
+    def emit_book_update(self):
+        current_time = time.time() * 1000
+        if current_time - self.last_book_update > int(self.book_throttle):
+            if self.orderbook.bids and self.orderbook.asks:
+                best_bid = self.orderbook.best_bid()
+                best_ask = self.orderbook.best_ask()
+                self.on_book(Quote(self.instrument.ticks_to_price(best_bid), self.instrument.ticks_to_price(best_ask),
+                                   best_bid, best_ask))
+                self.last_book_update = current_time
+
+    def run(self):
+        self.thread_ident = threading.get_ident()
+        threading.Thread(target=self.watch, name='market-data-watchdog', daemon=True).start()
+        for connection in self.connections[1:]:
+            threading.Thread(target=connection.run, name='market-data-standby', daemon=True).start()
+        self.connections[0].run()
+
+    def stop(self):
+        self.running = False
+        self.stopped.set()
+        for connection in self.connections:
+            if connection.ws:
+                connection.ws.close()
@@ -0,0 +1,115 @@
+from collections import deque
+from core.events import Signals
+from orderbook import LevelIndex
+
+
+class Microstructure:
+    """Microprice, top-N imbalance, cumulative volume delta and trade-flow pressure for one book.
+
+    Each side keeps its price levels in a LevelIndex. A delta costs one bisection;
+    only a delta inside the top levels re-sums those few levels from the book, so
+    the book is never rescanned.
+    Trades add to the delta and to a window of flow_window_s by exchange time.
+
+    Listeners run on the feed thread under the engine lock. Each side's top of book
+    is published as one tuple, so snapshot() can be called from any thread.
+    """
+
+    def __init__(self, levels=5, flow_window_s=5):
+        self.levels = levels
+        self.flow_window_ms = flow_window_s * 1000
+        self.engine = None
+        self.reset()
+
+    def reset(self):
+        self.bid_levels = LevelIndex(True)
+        self.ask_levels = LevelIndex(False)
+        # (best ticks, best units, units in the top levels), None while the side is empty
+        self.bid_top = None
+        self.ask_top = None
+        self.cvd = 0.0
+        self.flow = deque()
+        self.flow_buy = 0.0
+        self.flow_sell = 0.0
+
+    def attach(self, engine):
+        with engine.lock:
+            self.reset()
+            self.on_snapshot(engine.orderbook, None)
+            engine.book_snapshot_listeners.append(self.on_snapshot)
+            engine.book_delta_listeners.append(self.on_delta)
+            engine.trade_listeners.append(self.on_trade)
+        self.engine = engine
+
+    def detach(self, engine):
+        for listeners, listener in ((engine.book_snapshot_listeners, self.on_snapshot),
+                                    (engine.book_delta_listeners, self.on_delta),
+                                    (engine.trade_listeners, self.on_trade)):
+            if listener in listeners:
+                listeners.remove(listener)
+        if self.engine is engine:
+            self.engine = None
+
+    def on_snapshot(self, orderbook, time_ms):
+        self.bid_levels.load(orderbook.bids)
+        self.ask_levels.load(orderbook.asks)
+        self.bid_top = self.top(self.bid_levels, orderbook.bids)
+        self.ask_top = self.top(self.ask_levels, orderbook.asks)
+
+    def on_delta(self, orderbook, side, ticks, time_ms):
+        if side in ('bids', 'buy'):
+            index = self.bid_levels.update(orderbook.bids, ticks)
+            if index is not None and index < self.levels:
+                self.bid_top = self.top(self.bid_levels, orderbook.bids)
+        else:
+            index = self.ask_levels.update(orderbook.asks, ticks)
+            if index is not None and index < self.levels:
+                self.ask_top = self.top(self.ask_levels, orderbook.asks)
+
+    def top(self, levels, book_side):
+        top = levels.top(book_side, self.levels)
+        if not top:
+            return None
+        best, units = top[0]
+        return best, units, sum(units for _, units in top)
+
+    def on_trade(self, trade):
+        amount = trade.amount
+        flow = self.flow
+        if trade.side == 'buy':
+            self.cvd += amount
+            self.flow_buy += amount
+        elif trade.side == 'sell':
+            self.cvd -= amount
+            self.flow_sell += amount
+        else:
+            return
+        flow.append(trade)
+        cutoff = trade.time - self.flow_window_ms
+        while flow[0].time <= cutoff:
+            expired = flow.popleft()
+            if expired.side == 'buy':
+                self.flow_buy -= expired.amount
+            else:
+                self.flow_sell -= expired.amount
+
+    def snapshot(self):
+        """Current Signals, or None until both sides of the book are known.
+
+        micro_ticks weighs the best bid and ask by the size on the opposite side;
+        depth_ticks does the same with the top levels, i.e. mid shifted by imbalance
+        times half the spread. Imbalance and flow run from -1 (all asks, all sells)
+        to +1; flow is None with no trades in the window.
+        """
+        bid_top, ask_top = self.bid_top, self.ask_top
+        if bid_top is None or ask_top is None:
+            return None
+        bid_ticks, bid_units, bid_depth = bid_top
+        ask_ticks, ask_units, ask_depth = ask_top
+        micro_ticks = (bid_ticks * ask_units + ask_ticks * bid_units) / (bid_units + ask_units)
+        imbalance = (bid_depth - ask_depth) / (bid_depth + ask_depth)
+        depth_ticks = (bid_ticks + ask_ticks) / 2 + imbalance * (ask_ticks - bid_ticks) / 2
+        flow_buy, flow_sell = self.flow_buy, self.flow_sell
+        total = flow_buy + flow_sell
+        flow = (flow_buy - flow_sell) / total if total > 1e-12 else None
+        return Signals(micro_ticks, depth_ticks, imbalance, self.cvd, flow)
@@ -0,0 +1,372 @@
+import ccxt
+import threading
+import time
+from collections import namedtuple
+from settings import KRAKEN_API_KEY, KRAKEN_API_SECRET, KRAKEN_REST_URL, REST_RATE_BUDGET, REST_RATE_WINDOW_S
+from helpers import get_user_position
+from instrument import Instrument
+from log import get_logger
+
+DEFAULT_REST_URL = 'https://futures.kraken.com'
+log = get_logger('orders')
+
+# A validated order ready to send as is; price None is a market order
+StagedOrder = namedtuple('StagedOrder', 'symbol side amount price')
+
+# Kraken Futures cost units per /derivatives call; a batch costs 9 plus one per order in it.
+# flatten covers only its fetch_positions call; the market order it sends is charged as a place
+REQUEST_COSTS = {'place': 10, 'cancel': 10, 'flatten': 2, 'batch': 9}
+LADDER_DISTRIBUTIONS = ('flat', 'linear', 'geometric')
+
+
+def create_exchange(api_key=KRAKEN_API_KEY, api_secret=KRAKEN_API_SECRET, rest_url=KRAKEN_REST_URL):
+    exchange = ccxt.krakenfutures({
+        'apiKey': api_key,
+        'secret': api_secret,
+        'enableRateLimit': True,
+        'options': {
+            'defaultType': 'future'
+        }
+    })
+    rest_url = (rest_url or DEFAULT_REST_URL).rstrip('/')
+    if rest_url != DEFAULT_REST_URL:
+        # Every krakenfutures API group (public, private, charts, history, feeds) lives under one host
+        exchange.urls['api'] = {name: url.replace(DEFAULT_REST_URL, rest_url) if isinstance(url, str) else url
+                                for name, url in exchange.urls['api'].items()}
+    return exchange
+
+
+class RateBudget:
+    """Token bucket mirroring the exchange's REST cost limit: capacity units refilled over window_s.
+
+    The OrderManager spends from it for every request it sends, so background
+    senders can check what is left before adding traffic of their own.
+    """
+
+    def __init__(self, capacity=REST_RATE_BUDGET, window_s=REST_RATE_WINDOW_S):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / window_s
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        with self.lock:
+            self.refill()
+            return self.tokens
+
+    def spend(self, cost):
+        with self.lock:
+            self.refill()
+            self.tokens -= cost
+
+    def allows(self, cost, reserve=0.0):
+        """True if cost can be spent and still leave reserve units for other callers."""
+        return self.available() - cost >= reserve
+
+
+class OrderManager:
+    """Single path for every order action the terminal sends to the exchange.
+
+    Calls are serialized so the GUI and scripted callers share one client and one
+    rate-limit budget without interleaving requests. With a journal, every action is
+    recorded before it is sent and again when the exchange answers.
+    """
+
+    def __init__(self, exchange, journal=None):
+        self.exchange = exchange
+        self.journal = journal
+        self.lock = threading.RLock()
+        self.wire = threading.local()
+        self.keypress_to_wire_ns = None
+        self.budget = RateBudget()
+        fetch = getattr(exchange, 'fetch', None)
+        if fetch is not None:
+            exchange.fetch = self.timed(fetch)
+
+    def timed(self, fetch):
+        """Wrap ccxt's HTTP call, which runs after signing, to stamp when a request leaves."""
+        wire = self.wire
+
+        def timed_fetch(*args, **kwargs):
+            wire.ns = time.perf_counter_ns()
+            return fetch(*args, **kwargs)
+        return timed_fetch
+
+    def journaled(self, action, request, send, order_id=None):
+        cost = REQUEST_COSTS.get(action, 10)
+        if 'order_ids' in request:
+            # cancel_all sends one cancel per order
+            cost *= len(request['order_ids'])
+        if 'orders' in request:
+            cost += len(request['orders'])
+        self.budget.spend(cost)
+        journal = self.journal
+        if journal is None:
+            return send()
+        client_id = request.get('client_id') or journal.next_client_id()
+        sent_ns = time.time_ns()
+        start_ns = time.perf_counter_ns()
+        journal.sent(client_id, action, request, sent_ns)
+        try:
+            result = send()
+        except Exception as e:
+            journal.done(client_id, action, sent_ns, time.time_ns(), time.perf_counter_ns() - start_ns,
+                         order_id, f"error: {e}")
+            raise
+        latency_ns = time.perf_counter_ns() - start_ns
+        if isinstance(result, dict):
+            order_id = result.get('id', order_id)
+        journal.done(client_id, action, sent_ns, time.time_ns(), latency_ns, order_id, 'ok')
+        return result
+
+    def place_order(self, symbol, side, amount, price=None, reduce_only=False):
+        """Send a post-only limit order at price, or a market order when price is None."""
+        with self.lock:
+            client_id = self.journal.next_client_id() if self.journal else None
+            request = {'client_id': client_id, 'symbol': symbol, 'side': side, 'amount': amount,
+                       'price': price, 'type': 'market' if price is None else 'limit'}
+            if reduce_only:
+                request['reduce_only'] = True
+            return self.journaled('place', request, lambda: self.create_order(symbol, side, amount, price,
+                                                                               reduce_only, client_id))
+
+    def create_order(self, symbol, side, amount, price=None, reduce_only=False, client_id=None):
+        """The exchange call behind place_order, without journaling or budget."""
+        params = {} if price is None else {'postOnly': True}
+        if reduce_only:
+            params['reduceOnly'] = True
+        if client_id:
+            params['clientOrderId'] = client_id
+        if price is None:
+            return self.exchange.create_order(
+                symbol=symbol,
+                type='market',
+                side=side,
+                amount=amount,
+                params=params
+            )
+        return self.exchange.create_order(
+            symbol=symbol,
+            type='limit',
+            side=side,
+            amount=amount,
+            price=price,
+            params=params
+        )
+
+    def place_stop(self, symbol, side, amount, trigger_price):
+        """Send a reduce-only stop-market order the exchange triggers at trigger_price."""
+        params = {'triggerPrice': trigger_price, 'reduceOnly': True}
+        with self.lock:
+            if self.journal:
+                params['clientOrderId'] = self.journal.next_client_id()
+            request = {'client_id': params.get('clientOrderId'), 'symbol': symbol, 'side': side, 'amount': amount,
+                       'price': trigger_price, 'type': 'stop', 'reduce_only': True}
+            return self.journaled('place', request, lambda: self.exchange.create_order(
+                symbol=symbol,
+                type='market',
+                side=side,
+                amount=amount,
+                params=params
+            ))
+
+    def place_batch(self, symbol, orders, post_only=True):
+        """Send (side, amount, price) limit orders in one batchorder request.
+
+        Returns (statuses, latency_ns): per order, in the order given, {'order_id', 'status'}
+        where status is 'placed' or the exchange's reason for rejecting it.
+        """
+        with self.lock:
+            market_id = self.exchange.market(symbol)['id']
+            instructions = []
+            for tag, (side, amount, price) in enumerate(orders):
+                instruction = {'order': 'send', 'order_tag': str(tag), 'orderType': 'post' if post_only else 'lmt',
+                               'symbol': market_id, 'side': side, 'size': amount, 'limitPrice': price}
+                if self.journal:
+                    instruction['cliOrdId'] = self.journal.next_client_id()
+                instructions.append(instruction)
+            request = {'symbol': symbol, 'type': 'batch',
+                       'orders': [{'client_id': i.get('cliOrdId'), 'side': i['side'], 'amount': i['size'],
+                                   'price': i['limitPrice']} for i in instructions]}
+            start_ns = time.perf_counter_ns()
+            # ccxt's sign() sends batchorder params as json=<params>, so they go in unencoded
+            response = self.journaled('batch', request, lambda: self.exchange.privatePostBatchorder(
+                {'batchOrder': instructions}))
+            latency_ns = time.perf_counter_ns() - start_ns
+        if response.get('result') not in (None, 'success'):
+            raise ccxt.ExchangeError(f"batchorder failed: {response.get('error') or response}")
+        by_tag = {status.get('order_tag'): status for status in response.get('batchStatus', [])}
+        statuses = []
+        for instruction in instructions:
+            status = by_tag.get(instruction['order_tag'], {})
+            placed = status.get('status') == 'placed'
+            statuses.append({'order_id': status.get('order_id') if placed else None,
+                             'status': status.get('status', 'missing')})
+        return statuses, latency_ns
+
+    def send(self, staged, keypress_ns=None, reduce_only=False):
+        """Place a StagedOrder. keypress_ns is perf_counter_ns() when the hotkey (or a trigger)
+        fired; the time from then until the request went out is left in keypress_to_wire_ns."""
+        with self.lock:
+            self.wire.ns = None
+            self.keypress_to_wire_ns = None
+            order = self.place_order(*staged, reduce_only=reduce_only)
+            if keypress_ns is not None and self.wire.ns is not None:
+                self.keypress_to_wire_ns = self.wire.ns - keypress_ns
+            return order
+
+    def cancel_order(self, order_id, symbol):
+        with self.lock:
+            return self.journaled('cancel', {'symbol': symbol, 'order_id': order_id},
+                                  lambda: self.exchange.cancel_order(order_id, symbol), order_id)
+
+    def cancel_orders(self, order_ids, symbol):
+        cancelled = []
+
+        def cancel_each():
+            for order_id in order_ids:
+                self.exchange.cancel_order(order_id, symbol)
+                log.info("Order cancelled", extra={'fields': {'order_id': order_id, 'symbol': symbol}})
+                cancelled.append(order_id)
+            return cancelled
+
+        with self.lock:
+            return self.journaled('cancel_all', {'symbol': symbol, 'order_ids': list(order_ids)}, cancel_each)
+
+    def flatten(self, symbol):
+        """Market close the position in symbol. Returns (side, amount, order) or None if flat.
+
+        Journaled once as a flatten, whose client id the market order carries.
+        """
+        def close_position():
+            position = get_user_position(self.exchange, symbol)
+            if not position or position['contracts'] == 0:
+                return None
+            amount = abs(float(position['contracts']))
+            side = 'sell' if position['info']['side'].upper() == 'LONG' else 'buy'
+            self.budget.spend(REQUEST_COSTS['place'])
+            order = self.create_order(symbol, side, amount, client_id=client_id)
+            return {'id': (order or {}).get('id'), 'side': side, 'amount': amount, 'order': order}
+
+        with self.lock:
+            client_id = self.journal.next_client_id() if self.journal else None
+            result = self.journaled('flatten', {'client_id': client_id, 'symbol': symbol}, close_position)
+        if not result:
+            return None
+        return result['side'], result['amount'], result['order']
+
+
+def ladder_rungs(units, start_ticks, end_ticks, count, distribution='flat', ratio=1.5):
+    """Split units over count prices from start_ticks to end_ticks, as [(ticks, units)] in that order.
+
+    'flat' gives every rung the same size; 'linear' (1, 2, .., count) and 'geometric'
+    (1, ratio, ratio ** 2, ..) weight rungs more heavily towards end_ticks. Units are
+    apportioned by largest remainder so they add up exactly, and rungs that land on
+    the same tick are merged.
+    """
+    if count < 1:
+        raise ValueError("A ladder needs at least one rung")
+    if distribution not in LADDER_DISTRIBUTIONS:
+        raise ValueError(f"distribution must be one of {', '.join(LADDER_DISTRIBUTIONS)}")
+    if units < count:
+        raise ValueError(f"Size is too small to split into {count} rungs")
+    if distribution == 'flat':
+        weights = [1.0] * count
+    elif distribution == 'linear':
+        weights = [float(i + 1) for i in range(count)]
+    else:
+        weights = [ratio ** i for i in range(count)]
+    total = sum(weights)
+    shares = [units * weight / total for weight in weights]
+    sizes = [int(share) for share in shares]
+    for i in sorted(range(count), key=lambda i: sizes[i] - shares[i])[:units - sum(sizes)]:
+        sizes[i] += 1
+    step = (end_ticks - start_ticks) / (count - 1) if count > 1 else 0
+    rungs = {}
+    for i, size in enumerate(sizes):
+        if size > 0:
+            ticks = round(start_ticks + i * step)
+            rungs[ticks] = rungs.get(ticks, 0) + size
+    return list(rungs.items())
+
+
+class OrderTicket:
+    """The order the place-order hotkey sends next, kept staged as its inputs change.
+
+    Side, price mode ('best', 'mid', 'micro', 'depth', 'market' or 'input'), size in units,
+    the typed price in ticks, the top of book and the fractional microprice and depth-weighted
+    price (from Microstructure) are pushed in through update() as they change; each
+    update re-validates and rebuilds staged, so placing the order is only a send.
+    staged is None, with the reason in error, while no valid order can be built.
+    """
+
+    def __init__(self, symbol=None, instrument=None):
+        self.symbol = symbol
+        self.instrument = instrument
+        self.side = None
+        self.mode = None
+        self.units = 0
+        self.input_ticks = None
+        self.bid_ticks = None
+        self.ask_ticks = None
+        self.micro_ticks = None
+        self.depth_ticks = None
+        self.price_ticks = None
+        self.staged = None
+        self.error = 'no instrument'
+
+    def update(self, **changes):
+        for name, value in changes.items():
+            setattr(self, name, value)
+        self.stage()
+        return self.staged
+
+    def stage(self):
+        self.staged = None
+        self.price_ticks = None
+        side = self.side
+        bid_ticks, ask_ticks = self.bid_ticks, self.ask_ticks
+        if self.instrument is None:
+            self.error = 'no instrument'
+            return
+        if side not in ('buy', 'sell'):
+            self.error = 'select Buy/Sell first'
+            return
+        if self.units <= 0:
+            self.error = 'no size'
+            return
+        mode = self.mode
+        if mode == 'market':
+            ticks = None
+        elif mode == 'best':
+            ticks = bid_ticks if side == 'buy' else ask_ticks
+        elif mode == 'mid':
+            ticks = Instrument.adjusted_mid(bid_ticks, ask_ticks, side) if bid_ticks and ask_ticks else None
+        elif mode in ('micro', 'depth'):
+            fair_ticks = self.micro_ticks if mode == 'micro' else self.depth_ticks
+            ticks = Instrument.passive_ticks(fair_ticks, bid_ticks, ask_ticks, side) \
+                if fair_ticks is not None and bid_ticks and ask_ticks else None
+        elif mode == 'input':
+            ticks = self.input_ticks
+        else:
+            self.error = 'select a price'
+            return
+        if mode != 'market':
+            if not ticks or ticks <= 0:
+                self.error = 'no price'
+                return
+            # Post-only: an order that would take liquidity is rejected by the exchange anyway
+            if (side == 'buy' and ask_ticks and ticks >= ask_ticks) or \
+                    (side == 'sell' and bid_ticks and ticks <= bid_ticks):
+                self.error = 'post-only price would cross the book'
+                return
+        self.price_ticks = ticks
+        self.staged = StagedOrder(self.symbol, side, self.instrument.units_to_size(self.units),
+                                  None if ticks is None else self.instrument.ticks_to_price(ticks))
+        self.error = None
@@ -0,0 +1,409 @@
+import ccxt
+import itertools
+import threading
+import time
+from collections import deque
+from log import get_logger
+
+log = get_logger('paper')
+
+
+class PaperOrder:
+    __slots__ = ('id', 'client_id', 'symbol', 'side', 'units', 'filled', 'ticks', 'queue_ahead', 'time', 'last_update')
+
+    def __init__(self, order_id, client_id, symbol, side, units, ticks, queue_ahead, time_ms):
+        self.id = order_id
+        self.client_id = client_id
+        self.symbol = symbol
+        self.side = side
+        self.units = units
+        self.filled = 0
+        self.ticks = ticks
+        self.queue_ahead = queue_ahead
+        self.time = time_ms
+        self.last_update = time_ms
+
+
+class PaperExchange:
+    """Paper trading stand-in for the ccxt client: orders fill against a live (or replayed) engine.
+
+    The order and account calls the terminal makes are simulated. Everything else,
+    such as markets and candles, is delegated to the real client.
+    - A limit order joins the back of its price level. The size shown there at the
+      time is its queue, which shrinks as prints trade at that price and can never
+      exceed what the level shows.
+    - The order fills once its queue is gone, a print trades through it, or the other
+      side of the book moves onto its price.
+    - Post-only orders that would cross are rejected.
+    - Market orders sweep a copy of the visible book. Paper fills never move the live book.
+
+    Matching runs on the feed thread through the engine's listeners, which hold the
+    engine lock before taking self.lock; calls from other threads that read the book
+    take the two locks in the same order. With no paper order
+    resting, each message costs one or two attribute checks. Order and position updates
+    are queued as Kraken open_orders/open_positions messages. The feed thread hands them
+    to engine.handle_account, so the UI sees them exactly as it sees the private feeds.
+    """
+
+    def __init__(self, exchange, balance=10000.0):
+        self.exchange = exchange
+        self.starting_balance = balance
+        self.realized = 0.0
+        self.lock = threading.RLock()
+        self.engine = None
+        self.initial_margin = 0.1
+        self.orders = {}
+        self.positions = {}
+        self.outbox = deque()
+        # Highest resting buy and lowest resting sell on the attached symbol, None when there are none
+        self.best_buy = None
+        self.best_sell = None
+        self.sequence = itertools.count(1)
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__['exchange'], name)
+
+    def attach(self, engine, initial_margin=None):
+        with self.lock:
+            self.engine = engine
+            if initial_margin:
+                self.initial_margin = float(initial_margin)
+            engine.private_feeds = False
+            engine.trade_listeners.append(self.on_trade)
+            engine.book_delta_listeners.append(self.on_book_delta)
+            engine.book_snapshot_listeners.append(self.on_book_snapshot)
+            engine.mark_listeners.append(self.on_mark)
+            # Resting orders only match against the attached book, so they do not follow a symbol change
+            stale = [order_id for order_id, order in self.orders.items() if order.symbol != engine.symbol]
+            for order_id in stale:
+                del self.orders[order_id]
+            if stale:
+                log.info("Paper orders cancelled on symbol change", extra={'fields': {'count': len(stale)}})
+            self.update_thresholds()
+            self.outbox.append({'feed': 'open_orders_snapshot', 'account': 'paper',
+                                'orders': [self.order_row(order) for order in self.orders.values()]})
+            self.outbox.append(self.positions_message())
+
+    def detach(self, engine):
+        with self.lock:
+            for listeners, listener in ((engine.trade_listeners, self.on_trade),
+                                        (engine.book_delta_listeners, self.on_book_delta),
+                                        (engine.book_snapshot_listeners, self.on_book_snapshot),
+                                        (engine.mark_listeners, self.on_mark)):
+                if listener in listeners:
+                    listeners.remove(listener)
+            if self.engine is engine:
+                self.engine = None
+                self.best_buy = self.best_sell = None
+
+    def require(self, symbol):
+        engine = self.engine
+        if engine is None or symbol != engine.symbol:
+            raise ccxt.BadSymbol(f"Paper trading has no live book for {symbol}")
+        return engine
+
+    # Order calls, from the GUI or control thread
+
+    def book_locked(self):
+        """engine.lock (when attached) then self.lock, so the book holds still while an order reads it."""
+        engine = self.engine
+        return (engine.lock if engine is not None else self.lock), self.lock
+
+    def create_order(self, symbol, type, side, amount, price=None, params=None):
+        params = params or {}
+        engine_lock, lock = self.book_locked()
+        with engine_lock, lock:
+            engine = self.require(symbol)
+            if engine.lock is not engine_lock:
+                raise ccxt.BadSymbol(f"Paper trading switched books while placing a {symbol} order")
+            instrument = engine.instrument
+            book = engine.orderbook
+            if params.get('triggerPrice') is not None:
+                raise ccxt.InvalidOrder("Paper trading has no exchange-side stop orders")
+            units = instrument.size_to_units(amount)
+            if params.get('reduceOnly'):
+                balance = self.positions.get(symbol, (0, 0))[0]
+                if (balance > 0) == (side == 'buy') or not balance:
+                    raise ccxt.InvalidOrder(f"Reduce-only {side} would not reduce the {symbol} position")
+                units = min(units, instrument.size_to_units(abs(balance)))
+            if units <= 0:
+                raise ccxt.InvalidOrder(f"Size {amount} is below the contract precision")
+            order_id = f"paper-{next(self.sequence)}"
+            time_ms = int(time.time() * 1000)
+            if type == 'market':
+                fills = self.sweep(book, side, units)
+                if not fills:
+                    raise ccxt.InvalidOrder(f"No {symbol} liquidity to fill a market {side}")
+                for ticks, filled in fills:
+                    self.apply_fill(symbol, side, filled, ticks)
+                filled = sum(units for _, units in fills)
+                average = instrument.ticks_to_price(sum(t * u for t, u in fills) / filled)
+                return self.ccxt_order(order_id, params.get('clientOrderId'), symbol, 'market', side,
+                                       instrument.units_to_size(units), average, instrument.units_to_size(filled),
+                                       'closed', time_ms)
+
+            ticks = instrument.price_to_ticks(price)
+            opposite = book.best_ask() if side == 'buy' else book.best_bid()
+            crosses = opposite is not None and (ticks >= opposite if side == 'buy' else ticks <= opposite)
+            if crosses and params.get('postOnly'):
+                raise ccxt.OrderImmediatelyFillable(f"postWouldExecute: {side} at {price} crosses the book")
+            levels = book.bids if side == 'buy' else book.asks
+            order = PaperOrder(order_id, params.get('clientOrderId'), symbol, side, units, ticks,
+                               levels.get(ticks, 0), time_ms)
+            if crosses:
+                for fill_ticks, filled in self.sweep(book, side, units, ticks):
+                    order.filled += filled
+                    self.apply_fill(symbol, side, filled, fill_ticks)
+            if order.filled < order.units:
+                self.orders[order_id] = order
+                self.update_thresholds()
+                self.outbox.append(self.order_message(order, 'new_placed_order_by_user'))
+            return self.ccxt_order(order_id, order.client_id, symbol, 'limit', side, instrument.units_to_size(units),
+                                   price, instrument.units_to_size(order.filled),
+                                   'open' if order.filled < order.units else 'closed', time_ms)
+
+    def cancel_order(self, id, symbol=None, params=None):
+        with self.lock:
+            order = self.orders.pop(id, None)
+            if order is None:
+                raise ccxt.OrderNotFound(f"Paper order {id} is not open")
+            self.update_thresholds()
+            self.outbox.append({'feed': 'open_orders', 'order_id': id, 'is_cancel': True,
+                                'reason': 'cancelled_by_user'})
+            return {'id': id, 'symbol': order.symbol, 'status': 'canceled', 'info': {'status': 'cancelled'}}
+
+    def privatePostBatchorder(self, params):
+        """Kraken's batchorder endpoint, which ccxt exposes raw: each send instruction goes through create_order.
+
+        params is what a caller hands ccxt, {'batchOrder': [...]}; ccxt would encode it as json=<params>.
+        """
+        statuses = []
+        for instruction in params.get('batchOrder', []):
+            status = {'order_tag': instruction.get('order_tag')}
+            if instruction.get('order') != 'send':
+                statuses.append(dict(status, status='invalidArgument'))
+                continue
+            try:
+                order = self.create_order(instruction['symbol'], 'limit', instruction['side'], instruction['size'],
+                                          instruction['limitPrice'],
+                                          {'postOnly': instruction.get('orderType') == 'post',
+                                           'clientOrderId': instruction.get('cliOrdId')})
+                statuses.append(dict(status, status='placed', order_id=order['id']))
+            except ccxt.OrderImmediatelyFillable:
+                statuses.append(dict(status, status='postWouldExecute'))
+            except ccxt.BaseError as e:
+                statuses.append(dict(status, status=str(e)))
+        return {'result': 'success', 'batchStatus': statuses}
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params=None):
+        with self.lock:
+            if self.engine is None:
+                return []
+            instrument = self.engine.instrument
+            return [self.ccxt_order(o.id, o.client_id, o.symbol, 'limit', o.side,
+                                    instrument.units_to_size(o.units), instrument.ticks_to_price(o.ticks),
+                                    instrument.units_to_size(o.filled), 'open', o.time)
+                    for o in self.orders.values() if symbol is None or o.symbol == symbol]
+
+    def fetch_positions(self, symbols=None, params=None):
+        with self.lock:
+            positions = []
+            for symbol, (balance, entry) in self.positions.items():
+                side = 'long' if balance > 0 else 'short'
+                positions.append({'symbol': symbol, 'contracts': abs(balance), 'side': side, 'entryPrice': entry,
+                                  'info': {'symbol': symbol, 'side': side, 'size': abs(balance), 'price': entry}})
+            return positions
+
+    def fetch_balance(self, params=None):
+        engine_lock, lock = self.book_locked()
+        with engine_lock, lock:
+            rows = self.position_rows()
+            upnl = sum(row['pnl'] for row in rows)
+            margin = sum(row['initial_margin'] for row in rows)
+            value = self.starting_balance + self.realized + upnl
+            flex = {'balanceValue': value, 'availableMargin': value - margin, 'initialMargin': margin,
+                    'pnl': upnl, 'portfolioValue': value}
+            return {'info': {'accounts': {'flex': flex}}, 'USD': {'free': value - margin, 'used': margin,
+                                                                   'total': value}}
+
+    def ccxt_order(self, order_id, client_id, symbol, type, side, amount, price, filled, status, time_ms):
+        return {'id': order_id, 'clientOrderId': client_id, 'symbol': symbol, 'type': type, 'side': side,
+                'amount': amount, 'price': price, 'filled': filled, 'remaining': amount - filled, 'status': status,
+                'timestamp': time_ms, 'info': {'order_id': order_id, 'paper': True}}
+
+    # Matching
+
+    @staticmethod
+    def sweep(book, side, units, limit_ticks=None):
+        """(ticks, units) fills walking the visible opposite side, stopping at limit_ticks."""
+        levels = book.asks if side == 'buy' else book.bids
+        fills = []
+        for ticks in sorted(levels, reverse=side == 'sell'):
+            if units <= 0 or (limit_ticks is not None and (ticks > limit_ticks if side == 'buy' else ticks < limit_ticks)):
+                break
+            filled = min(units, levels[ticks])
+            fills.append((ticks, filled))
+            units -= filled
+        return fills
+
+    def update_thresholds(self):
+        symbol = self.engine.symbol if self.engine else None
+        buys = [o.ticks for o in self.orders.values() if o.symbol == symbol and o.side == 'buy']
+        sells = [o.ticks for o in self.orders.values() if o.symbol == symbol and o.side == 'sell']
+        self.best_buy = max(buys) if buys else None
+        self.best_sell = min(sells) if sells else None
+
+    def on_trade(self, trade):
+        if self.outbox:
+            self.flush()
+        if self.best_buy is None and self.best_sell is None:
+            return
+        instrument = self.engine.instrument
+        ticks = instrument.price_to_ticks(trade.price)
+        # A buy print lifts offers, so it can only reach resting sells, and the reverse
+        if trade.side == 'buy':
+            if self.best_sell is not None and ticks >= self.best_sell:
+                self.match_print('sell', ticks, instrument.size_to_units(trade.amount))
+        elif self.best_buy is not None and ticks <= self.best_buy:
+            self.match_print('buy', ticks, instrument.size_to_units(trade.amount))
+
+    def on_book_delta(self, orderbook, side, ticks, time_ms):
+        if self.outbox:
+            self.flush()
+        best_buy, best_sell = self.best_buy, self.best_sell
+        if best_buy is None and best_sell is None:
+            return
+        if side in ('bids', 'buy'):
+            if best_buy is not None and ticks <= best_buy:
+                self.level_changed('buy', ticks, orderbook.bids.get(ticks, 0))
+            if best_sell is not None and ticks >= best_sell and ticks in orderbook.bids:
+                self.book_crossed('sell', ticks)
+        else:
+            if best_sell is not None and ticks >= best_sell:
+                self.level_changed('sell', ticks, orderbook.asks.get(ticks, 0))
+            if best_buy is not None and ticks <= best_buy and ticks in orderbook.asks:
+                self.book_crossed('buy', ticks)
+
+    def on_book_snapshot(self, orderbook, time_ms):
+        if self.outbox:
+            self.flush()
+        with self.lock:
+            for order in self.orders.values():
+                if self.engine and order.symbol == self.engine.symbol:
+                    levels = orderbook.bids if order.side == 'buy' else orderbook.asks
+                    order.queue_ahead = min(order.queue_ahead, levels.get(order.ticks, 0))
+
+    def on_mark(self, product_id, mark_price):
+        if self.outbox:
+            self.flush()
+
+    def resting(self, side):
+        symbol = self.engine.symbol
+        return [o for o in self.orders.values() if o.symbol == symbol and o.side == side]
+
+    def match_print(self, side, ticks, units):
+        with self.lock:
+            for order in self.resting(side):
+                through = ticks > order.ticks if side == 'sell' else ticks < order.ticks
+                if through:
+                    self.fill(order, order.units - order.filled)
+                elif ticks == order.ticks:
+                    order.queue_ahead -= units
+                    if order.queue_ahead < 0:
+                        self.fill(order, min(-order.queue_ahead, order.units - order.filled))
+                        order.queue_ahead = 0
+            self.flush()
+
+    def level_changed(self, side, ticks, units):
+        # Cancels ahead of us or behind us are indistinguishable; the queue can only be what the level shows
+        with self.lock:
+            for order in self.resting(side):
+                if order.ticks == ticks and units < order.queue_ahead:
+                    order.queue_ahead = units
+
+    def book_crossed(self, side, ticks):
+        # Someone is resting on the other side at or through our price, so our order must have traded
+        with self.lock:
+            for order in self.resting(side):
+                if (ticks <= order.ticks) if side == 'buy' else (ticks >= order.ticks):
+                    self.fill(order, order.units - order.filled)
+            self.flush()
+
+    def fill(self, order, units):
+        if units <= 0:
+            return
+        order.filled += units
+        order.last_update = int(time.time() * 1000)
+        self.apply_fill(order.symbol, order.side, units, order.ticks)
+        done = order.filled >= order.units
+        if done:
+            self.orders.pop(order.id, None)
+            self.update_thresholds()
+        self.outbox.append(self.order_message(order, 'full_fill' if done else 'partial_fill'))
+        log.info("Paper fill", extra={'fields': {'order_id': order.id, 'side': order.side,
+                                                 'size': self.engine.instrument.units_to_size(units),
+                                                 'price': self.engine.instrument.ticks_to_price(order.ticks)}})
+
+    def apply_fill(self, symbol, side, units, ticks):
+        instrument = self.engine.instrument
+        size = instrument.units_to_size(units)
+        price = instrument.ticks_to_price(ticks)
+        signed = size if side == 'buy' else -size
+        position = self.positions.get(symbol)
+        if position is None:
+            self.positions[symbol] = [signed, price]
+        else:
+            balance, entry = position
+            if balance * signed >= 0:
+                position[1] = (balance * entry + signed * price) / (balance + signed)
+            else:
+                closed = min(abs(signed), abs(balance))
+                self.realized += closed * (price - entry) * (1 if balance > 0 else -1)
+                if abs(signed) > abs(balance):
+                    position[1] = price
+            position[0] = instrument.round_size(balance + signed)
+            if not position[0]:
+                del self.positions[symbol]
+        self.outbox.append(self.positions_message())
+
+    # Messages in the shape of Kraken's private feeds
+
+    def flush(self):
+        """Deliver queued account messages; only ever called on the feed thread."""
+        engine = self.engine
+        outbox = self.outbox
+        for _ in range(len(outbox)):
+            message = outbox.popleft()
+            if engine is not None:
+                engine.handle_account(message)
+
+    def order_row(self, order):
+        instrument = self.engine.instrument
+        return {'instrument': order.symbol, 'time': order.time, 'last_update_time': order.last_update,
+                'qty': instrument.units_to_size(order.units), 'filled': instrument.units_to_size(order.filled),
+                'limit_price': instrument.ticks_to_price(order.ticks), 'stop_price': 0.0, 'type': 'limit',
+                'order_id': order.id, 'cli_ord_id': order.client_id, 'direction': 0 if order.side == 'buy' else 1,
+                'reduce_only': False}
+
+    def order_message(self, order, reason):
+        return {'feed': 'open_orders', 'order': self.order_row(order), 'is_cancel': False, 'reason': reason}
+
+    def mark_price(self, symbol, entry):
+        # Callers hold engine.lock: the feed thread, create_order and fetch_balance
+        engine = self.engine
+        if engine is not None and symbol == engine.symbol:
+            bid, ask = engine.orderbook.best_bid(), engine.orderbook.best_ask()
+            if bid is not None and ask is not None:
+                return engine.instrument.ticks_to_price((bid + ask) / 2)
+        return entry
+
+    def position_rows(self):
+        rows = []
+        for symbol, (balance, entry) in self.positions.items():
+            mark = self.mark_price(symbol, entry)
+            rows.append({'instrument': symbol, 'balance': balance, 'entry_price': entry, 'mark_price': mark,
+                         'pnl': (mark - entry) * balance, 'initial_margin': abs(balance) * mark * self.initial_margin})
+        return rows
+
+    def positions_message(self):
+        return {'feed': 'open_positions', 'account': 'paper', 'positions': self.position_rows()}
@@ -0,0 +1,361 @@
+import itertools
+import queue
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque
+from core.orders import StagedOrder
+from log import get_logger
+
+log = get_logger('triggers')
+
+
+def _ignore(*args):
+    pass
+
+
+class Trigger:
+    __slots__ = ('id', 'bracket', 'kind', 'side', 'ticks', 'below', 'source')
+
+    def __init__(self, trigger_id, bracket, kind, side, ticks, below, source):
+        self.id = trigger_id
+        self.bracket = bracket
+        self.kind = kind
+        self.side = side
+        self.ticks = ticks
+        self.below = below
+        self.source = source
+
+
+class Bracket:
+    """Stop-loss and/or take-profit on one position; the first to fire cancels the rest (OCO)."""
+    __slots__ = ('id', 'symbol', 'side', 'amount', 'stop', 'take_profit', 'source', 'backup', 'backup_order_id',
+                 'triggers', 'state', 'armed_ns')
+
+    def __init__(self, bracket_id, symbol, side, amount, stop, take_profit, source, backup):
+        self.id = bracket_id
+        self.symbol = symbol
+        # Side of the closing order: 'sell' for a long position, 'buy' for a short
+        self.side = side
+        self.amount = amount
+        self.stop = stop
+        self.take_profit = take_profit
+        self.source = source
+        self.backup = backup
+        self.backup_order_id = None
+        self.triggers = []
+        self.state = 'armed'
+        self.armed_ns = time.perf_counter_ns()
+
+    def describe(self):
+        return {'id': self.id, 'symbol': self.symbol, 'side': self.side, 'amount': self.amount, 'stop': self.stop,
+                'take_profit': self.take_profit, 'source': self.source, 'backup_order_id': self.backup_order_id,
+                'state': self.state}
+
+
+class TriggerIndex:
+    """Armed levels for one direction, ascending, with their items (triggers, alerts) alongside.
+
+    'below' items fire once the value is at or under their level, so the ones due
+    are always a suffix; 'above' items fire at or over it, a prefix. A value that
+    fires nothing is a single comparison against the nearest level.
+    """
+    __slots__ = ('below', 'levels', 'items')
+
+    def __init__(self, below):
+        self.below = below
+        self.levels = []
+        self.items = []
+
+    def __len__(self):
+        return len(self.levels)
+
+    def add(self, level, item):
+        index = bisect_right(self.levels, level)
+        self.levels.insert(index, level)
+        self.items.insert(index, item)
+
+    def remove(self, level, item):
+        index = bisect_left(self.levels, level)
+        while index < len(self.levels) and self.levels[index] == level:
+            if self.items[index] is item:
+                del self.levels[index]
+                del self.items[index]
+                return True
+            index += 1
+        return False
+
+    def due(self, value):
+        levels = self.levels
+        if not levels:
+            return ()
+        if self.below:
+            if levels[-1] < value:
+                return ()
+            index = bisect_left(levels, value)
+            fired = self.items[index:]
+            del levels[index:]
+            del self.items[index:]
+        else:
+            if levels[0] > value:
+                return ()
+            index = bisect_right(levels, value)
+            fired = self.items[:index]
+            del levels[:index]
+            del self.items[:index]
+        return fired
+
+
+class TriggerEngine:
+    """Client-side brackets evaluated on the feed thread, fired through the OrderManager.
+
+    Triggers on source 'trade' compare against the last trade; on 'book' a sell
+    compares against the best bid and a buy against the best ask. Levels sit in
+    eight TriggerIndexes per symbol, so each trade or book change costs four
+    comparisons however many triggers are armed. Bisection only happens when
+    something fires. The REST calls happen on a worker thread, never on the feed
+    thread.
+
+    eval_ns keeps the cost of recent evaluations, and evaluations over
+    eval_budget_ns are counted and logged. fire_to_wire_ns keeps the time from the
+    message that fired a trigger until its order left for the exchange.
+
+    With backup set, a reduce-only stop-market order is also placed on the exchange
+    backup_offset_ticks beyond the client stop. It protects the position if the
+    terminal goes away, and is cancelled when the bracket fires or is cancelled.
+    """
+
+    def __init__(self, order_manager, backup_offset_ticks=10, eval_budget_us=50):
+        self.order_manager = order_manager
+        self.backup_offset_ticks = backup_offset_ticks
+        self.eval_budget_ns = eval_budget_us * 1000
+        self.lock = threading.Lock()
+        self.engine = None
+        self.brackets = {}
+        # symbol: {(source, side, below): TriggerIndex}
+        self.indexes = {}
+        self.active = None
+        self.armed = 0
+        self.ids = itertools.count(1)
+        self.eval_ns = deque(maxlen=4096)
+        self.over_budget = 0
+        self.fire_to_wire_ns = deque(maxlen=256)
+        self.work = queue.SimpleQueue()
+        self.on_change = _ignore
+        threading.Thread(target=self.run, name='triggers', daemon=True).start()
+
+    def attach(self, engine):
+        with self.lock:
+            self.engine = engine
+            self.active = self.symbol_indexes(engine.symbol)
+            self.armed = sum(len(index) for index in self.active.values())
+        engine.trade_listeners.append(self.on_trade)
+        engine.book_listeners.append(self.on_book)
+
+    def detach(self, engine):
+        for listeners, listener in ((engine.trade_listeners, self.on_trade), (engine.book_listeners, self.on_book)):
+            if listener in listeners:
+                listeners.remove(listener)
+        with self.lock:
+            if self.engine is engine:
+                self.engine = None
+                self.active = None
+                self.armed = 0
+
+    def symbol_indexes(self, symbol):
+        indexes = self.indexes.get(symbol)
+        if indexes is None:
+            indexes = self.indexes[symbol] = {(source, side, below): TriggerIndex(below)
+                                              for source in ('trade', 'book') for side in ('buy', 'sell')
+                                              for below in (True, False)}
+        return indexes
+
+    # Arming, from the GUI or control thread
+
+    def add_bracket(self, symbol, position_side, amount, stop=None, take_profit=None, source='trade', backup=False):
+        """Arm a bracket closing a 'long' or 'short' position of amount in the active symbol."""
+        engine = self.engine
+        if engine is None or engine.symbol != symbol:
+            raise ValueError(f"{symbol} is not the active symbol")
+        if stop is None and take_profit is None:
+            raise ValueError("A bracket needs a stop, a take profit or both")
+        if source not in ('trade', 'book'):
+            raise ValueError("source must be 'trade' or 'book'")
+        instrument = engine.instrument
+        long = position_side.lower() == 'long'
+        side = 'sell' if long else 'buy'
+        # Held until the bracket is armed: the feed thread checks triggers under the engine lock, so the
+        # market cannot move through a level between the check below and arming it
+        with engine.lock:
+            bid, ask = engine.orderbook.best_bid(), engine.orderbook.best_ask()
+            reference = bid if long else ask
+            levels = []
+            if stop is not None:
+                ticks = instrument.price_to_ticks(stop)
+                if reference is not None and (ticks >= reference if long else ticks <= reference):
+                    raise ValueError(f"Stop {stop} is already through the market")
+                levels.append(('stop', ticks, long))
+            if take_profit is not None:
+                ticks = instrument.price_to_ticks(take_profit)
+                if reference is not None and (ticks <= reference if long else ticks >= reference):
+                    raise ValueError(f"Take profit {take_profit} is already through the market")
+                levels.append(('take_profit', ticks, not long))
+
+            with self.lock:
+                bracket = Bracket(next(self.ids), symbol, side, instrument.round_size(amount),
+                                  None if stop is None else instrument.round_price(stop),
+                                  None if take_profit is None else instrument.round_price(take_profit), source, backup)
+                indexes = self.symbol_indexes(symbol)
+                for kind, ticks, below in levels:
+                    trigger = Trigger(next(self.ids), bracket, kind, side, ticks, below, source)
+                    bracket.triggers.append(trigger)
+                    indexes[(source, side, below)].add(ticks, trigger)
+                self.brackets[bracket.id] = bracket
+                if indexes is self.active:
+                    self.armed += len(levels)
+        log.info("Bracket armed", extra={'fields': bracket.describe()})
+        if backup and stop is not None:
+            self.work.put(('backup', bracket, None))
+        self.on_change()
+        return bracket
+
+    def cancel_bracket(self, bracket_id, reason='cancelled'):
+        with self.lock:
+            bracket = self.brackets.pop(bracket_id, None)
+            if bracket is None:
+                return None
+            self.disarm(bracket)
+            bracket.state = reason
+        log.info("Bracket cancelled", extra={'fields': {'id': bracket_id, 'reason': reason}})
+        if bracket.backup_order_id:
+            self.work.put(('cancel_backup', bracket, None))
+        self.on_change()
+        return bracket
+
+    def sync_position(self, symbol, contracts):
+        """Cancel the brackets on symbol once its position is flat."""
+        if contracts:
+            return
+        for bracket in [b for b in self.brackets.values() if b.symbol == symbol]:
+            self.cancel_bracket(bracket.id, 'position closed')
+
+    def brackets_for(self, symbol):
+        return [bracket for bracket in self.brackets.values() if bracket.symbol == symbol]
+
+    def disarm(self, bracket):
+        indexes = self.symbol_indexes(bracket.symbol)
+        for trigger in bracket.triggers:
+            if indexes[(trigger.source, trigger.side, trigger.below)].remove(trigger.ticks, trigger) and \
+                    indexes is self.active:
+                self.armed -= 1
+
+    # Evaluation, on the feed thread
+
+    def on_trade(self, trade):
+        if not self.armed:
+            return
+        start_ns = time.perf_counter_ns()
+        ticks = self.engine.instrument.price_to_ticks(trade.price)
+        self.evaluate(start_ns, (('trade', 'sell', True), ticks), (('trade', 'sell', False), ticks),
+                      (('trade', 'buy', True), ticks), (('trade', 'buy', False), ticks))
+
+    def on_book(self, orderbook):
+        if not self.armed:
+            return
+        start_ns = time.perf_counter_ns()
+        bid, ask = orderbook.best_bid(), orderbook.best_ask()
+        if bid is None or ask is None:
+            return
+        self.evaluate(start_ns, (('book', 'sell', True), bid), (('book', 'sell', False), bid),
+                      (('book', 'buy', True), ask), (('book', 'buy', False), ask))
+
+    def evaluate(self, start_ns, *checks):
+        fired = []
+        with self.lock:
+            active = self.active
+            if active is None:
+                return
+            for key, ticks in checks:
+                due = active[key].due(ticks)
+                if due:
+                    self.armed -= len(due)
+                    fired.extend(due)
+            for trigger in fired:
+                bracket = trigger.bracket
+                if bracket.state != 'armed':
+                    continue
+                bracket.state = trigger.kind
+                self.brackets.pop(bracket.id, None)
+                self.disarm(bracket)
+                self.work.put(('fire', trigger, start_ns))
+        elapsed_ns = time.perf_counter_ns() - start_ns
+        self.eval_ns.append(elapsed_ns)
+        if elapsed_ns > self.eval_budget_ns:
+            self.over_budget += 1
+            log.warning("Trigger evaluation over budget", extra={'fields': {'elapsed_us': elapsed_ns // 1000,
+                                                                             'armed': self.armed}})
+
+    # Orders, on the worker thread
+
+    def run(self):
+        while True:
+            action, item, start_ns = self.work.get()
+            try:
+                if action == 'fire':
+                    self.fire(item, start_ns)
+                elif action == 'backup':
+                    self.place_backup(item)
+                else:
+                    self.cancel_backup(item)
+            except Exception as e:
+                log.error("Bracket %s failed: %s", action, e, extra={'fields': {'action': action}})
+            if action == 'fire':
+                self.on_change()
+
+    def fire(self, trigger, start_ns):
+        bracket = trigger.bracket
+        manager = self.order_manager
+        with manager.lock:
+            order = manager.send(StagedOrder(bracket.symbol, bracket.side, bracket.amount, None), start_ns,
+                                 reduce_only=True)
+            fire_to_wire_ns = manager.keypress_to_wire_ns
+        if fire_to_wire_ns is not None:
+            self.fire_to_wire_ns.append(fire_to_wire_ns)
+        log.info("Bracket fired", extra={'fields': {'id': bracket.id, 'kind': trigger.kind, 'side': bracket.side,
+                                                    'amount': bracket.amount, 'order_id': (order or {}).get('id'),
+                                                    'fire_to_wire_us': None if fire_to_wire_ns is None
+                                                    else fire_to_wire_ns // 1000}})
+        if bracket.backup_order_id:
+            self.cancel_backup(bracket)
+
+    def place_backup(self, bracket):
+        if bracket.state != 'armed':
+            return
+        instrument = self.engine.instrument if self.engine else None
+        if instrument is None:
+            return
+        offset = self.backup_offset_ticks if bracket.side == 'buy' else -self.backup_offset_ticks
+        price = instrument.ticks_to_price(instrument.price_to_ticks(bracket.stop) + offset)
+        order = self.order_manager.place_stop(bracket.symbol, bracket.side, bracket.amount, price)
+        bracket.backup_order_id = (order or {}).get('id')
+        log.info("Backup stop placed", extra={'fields': {'id': bracket.id, 'stop': price,
+                                                         'order_id': bracket.backup_order_id}})
+        if bracket.state != 'armed':
+            # The bracket fired or was cancelled while the stop was in flight
+            self.cancel_backup(bracket)
+
+    def cancel_backup(self, bracket):
+        order_id, bracket.backup_order_id = bracket.backup_order_id, None
+        if order_id:
+            self.order_manager.cancel_order(order_id, bracket.symbol)
+
+    def stats(self):
+        evals = sorted(self.eval_ns)
+        wires = sorted(self.fire_to_wire_ns)
+
+        def percentile(values, fraction):
+            return values[min(len(values) - 1, int(len(values) * fraction))] if values else None
+        return {'armed': self.armed, 'brackets': len(self.brackets), 'evaluations': len(evals),
+                'eval_ns_p50': percentile(evals, 0.5), 'eval_ns_p99': percentile(evals, 0.99),
+                'eval_ns_max': evals[-1] if evals else None, 'over_budget': self.over_budget,
+                'fire_to_wire_ns_p50': percentile(wires, 0.5), 'fire_to_wire_ns_max': wires[-1] if wires else None}
@@ -0,0 +1,240 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+
+def default_directory():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'diagnostics')
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Diagnostics:
+    """CPU profiling and memory tracing switched on and off at runtime.
+
+    Nothing is installed until a session is started: the sampling profiler is a
+    background thread reading sys._current_frames(), so it covers the GUI thread and
+    the feed thread alike; the cProfile mode hooks the GUI thread and, through
+    engine.profile, the feed thread's message handler. Reports are written to directory
+    with the active symbol and the per-feed message rates over the session.
+    """
+
+    def __init__(self, get_engine=lambda: None, directory=None, sample_ms=5, memory_interval_s=60):
+        self.get_engine = get_engine
+        self.directory = directory or default_directory()
+        self.sample_interval = sample_ms / 1000
+        self.memory_interval = memory_interval_s
+        self.profile_mode = None
+        self.profile_started = None
+        self.profile_counts = None
+        self.profiles = []
+        self.profile_engine = None
+        self.sampler = None
+        self.samples = Counter()
+        self.tracing = False
+        self.memory_thread = None
+        self.memory_path = None
+        self.memory_stop = threading.Event()
+
+    @property
+    def profiling(self):
+        return self.profile_mode is not None
+
+    def message_counts(self):
+        engine = self.get_engine()
+        return dict(engine.message_counts) if engine else {}
+
+    def context(self, started, counts_before):
+        engine = self.get_engine()
+        elapsed = max(time.time() - started, 1e-9)
+        lines = [
+            f"symbol:   {engine.symbol if engine else 'none'}",
+            f"started:  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started))}",
+            f"duration: {elapsed:.1f}s",
+            "message rates (per second):"
+        ]
+        counts = self.message_counts()
+        total = 0
+        for kind, count in sorted(counts.items(), key=lambda item: str(item[0])):
+            delta = count - counts_before.get(kind, 0)
+            total += delta
+            if delta:
+                lines.append(f"    {kind:<24} {delta / elapsed:10.1f}")
+        lines.append(f"    {'total':<24} {total / elapsed:10.1f}")
+        if engine:
+            stats = engine.book_stats.summary()
+            lines.append("book sync: " + ', '.join(f"{key} {value}" for key, value in stats.items()))
+        return lines
+
+    def report_path(self, kind):
+        os.makedirs(self.directory, exist_ok=True)
+        engine = self.get_engine()
+        symbol = engine.symbol if engine else 'none'
+        return os.path.join(self.directory, f"{kind}-{symbol}-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+
+    def start_profile(self, mode='sample'):
+        if self.profiling:
+            return
+        self.profile_started = time.time()
+        self.profile_counts = self.message_counts()
+        self.profile_mode = mode
+        if mode == 'cprofile':
+            gui_profile = cProfile.Profile()
+            self.profiles = [gui_profile]
+            # Profiles are per thread before 3.12; the feed thread enables its own per message
+            if sys.version_info < (3, 12):
+                self.profile_engine = self.get_engine()
+                if self.profile_engine:
+                    feed_profile = cProfile.Profile()
+                    self.profiles.append(feed_profile)
+                    self.profile_engine.profile = feed_profile
+            gui_profile.enable()
+        else:
+            self.samples = Counter()
+            self.sampler = threading.Thread(target=self.sample, name='profiler', daemon=True)
+            self.sampler.start()
+
+    def stop_profile(self):
+        """Stop the running profile and return the report path."""
+        if not self.profiling:
+            return None
+        mode = self.profile_mode
+        self.profile_mode = None
+        path = self.report_path('profile')
+        lines = [f"{mode} profile"] + self.context(self.profile_started, self.profile_counts) + ['']
+        if mode == 'cprofile':
+            self.profiles[0].disable()
+            if self.profile_engine:
+                self.profile_engine.profile = None
+                self.profile_engine = None
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profiles[0], stream=stream)
+            for profile in self.profiles[1:]:
+                profile.create_stats()
+                if profile.stats:
+                    stats.add(profile)
+            stats.sort_stats('cumulative').print_stats(60)
+            stats.sort_stats('tottime').print_stats(40)
+            lines.append(stream.getvalue())
+            self.profiles = []
+        else:
+            self.sampler.join()
+            self.sampler = None
+            lines.extend(self.sample_report())
+            with open(path.replace('.txt', '.folded'), 'w') as file:
+                for (thread, stack), count in self.samples.items():
+                    file.write(f"{thread};{';'.join(frame_label(code) for code in stack)} {count}\n")
+        with open(path, 'w') as file:
+            file.write('\n'.join(lines))
+        return path
+
+    def thread_names(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        names[threading.main_thread().ident] = 'gui'
+        engine = self.get_engine()
+        if engine and engine.thread_ident:
+            names[engine.thread_ident] = 'feed'
+        return names
+
+    def sample(self):
+        own_ident = threading.get_ident()
+        names = self.thread_names()
+        next_names = time.monotonic() + 1
+        while self.profile_mode == 'sample':
+            if time.monotonic() > next_names:
+                names = self.thread_names()
+                next_names = time.monotonic() + 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[(names.get(ident, f"thread-{ident}"), tuple(stack))] += 1
+            time.sleep(self.sample_interval)
+
+    def sample_report(self, top=30):
+        lines = [f"sample interval {self.sample_interval * 1000:.1f}ms; the .folded file next to this "
+                 "report loads into flame graph tools"]
+        by_thread = {}
+        for (thread, stack), count in self.samples.items():
+            by_thread.setdefault(thread, []).append((stack, count))
+        for thread, stacks in sorted(by_thread.items()):
+            total = sum(count for _, count in stacks)
+            own = Counter()
+            inclusive = Counter()
+            for stack, count in stacks:
+                if stack:
+                    own[stack[-1]] += count
+                for code in set(stack):
+                    inclusive[code] += count
+            lines.append(f"\n[{thread}] {total} samples")
+            lines.append("  self%   total%  function")
+            for code, count in own.most_common(top):
+                lines.append(f"  {100 * count / total:5.1f}  {100 * inclusive[code] / total:6.1f}  {frame_label(code)}")
+        return lines
+
+    def start_memory_trace(self, frames=1):
+        if self.tracing:
+            return
+        self.tracing = True
+        tracemalloc.start(frames)
+        self.memory_stop.clear()
+        self.memory_thread = threading.Thread(target=self.trace_memory, name='memory-trace', daemon=True)
+        self.memory_thread.start()
+
+    def stop_memory_trace(self):
+        """Stop tracing, write the final diff and return the report path."""
+        if not self.tracing:
+            return None
+        self.memory_stop.set()
+        self.memory_thread.join()
+        self.memory_thread = None
+        self.tracing = False
+        path = self.memory_path
+        tracemalloc.stop()
+        return path
+
+    def snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        ))
+
+    def trace_memory(self):
+        started = time.time()
+        counts = self.message_counts()
+        self.memory_path = self.report_path('memory')
+        first = previous = self.snapshot()
+        with open(self.memory_path, 'w') as file:
+            file.write('\n'.join(["memory trace"] + self.context(started, counts)[:2]) + '\n')
+        while not self.memory_stop.wait(self.memory_interval):
+            current = self.snapshot()
+            self.write_diff(current, previous, f"change over the last {self.memory_interval}s")
+            previous = current
+        current = self.snapshot()
+        current_size, peak_size = tracemalloc.get_traced_memory()
+        with open(self.memory_path, 'a') as file:
+            file.write('\n'.join([''] + self.context(started, counts)) + '\n')
+            file.write(f"traced {current_size / 1e6:.1f} MB, peak {peak_size / 1e6:.1f} MB\n")
+        self.write_diff(current, first, "change since the trace started")
+
+    def write_diff(self, current, previous, title, top=25):
+        with open(self.memory_path, 'a') as file:
+            file.write(f"\n{time.strftime('%H:%M:%S')} {title}\n")
+            for stat in current.compare_to(previous, 'lineno')[:top]:
+                file.write(f"    {stat}\n")
+
+    def close(self):
+        self.stop_profile()
+        self.stop_memory_trace()
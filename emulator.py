@@ -0,0 +1,768 @@
+"""Local stand-in for the Kraken Futures API, serving WebSocket v1 and REST on one port.
+
+It covers the parts the terminal uses. The WebSocket side speaks challenge auth and
+the book_snapshot/book, trade, ticker, open_orders and open_positions feeds, with a
+per-product seq on book messages (--book-drop-rate skips some to cause gaps). The
+REST side serves instruments, tickers, accounts, openpositions, openorders,
+sendorder, cancelorder, cancelallorders, batchorder and trade candles.
+
+Each product has a synthetic book around a random-walk mid. Book changes, trades and
+tickers arrive as Poisson processes at the configured rates, and --speed multiplies
+all of them for load runs. Orders match against that book:
+    - market orders walk it and print trades
+    - post-only orders that would cross are rejected
+    - resting orders fill completely once a trade prints through their price
+    - stop orders (stp, stop-market only) execute as market orders once a print reaches them
+Signatures are not checked.
+
+    python emulator.py [--port 8766] [--symbols XBT,ETH] [--book-rate 50] [--trade-rate 5]
+                       [--ticker-rate 1] [--speed 10] [--rest-latency-ms 0] [--seed 1] [--book-drop-rate 0.001]
+
+Point the terminal at it with KRAKEN_WS_URL = 'ws://127.0.0.1:8766/ws/v1' and
+KRAKEN_REST_URL = 'http://127.0.0.1:8766' in settings.py.
+"""
+import argparse
+import base64
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import random
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from instrument import Instrument
+from log import get_logger
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+TEXT, CLOSE, PING, PONG = 0x1, 0x8, 0x9, 0xA
+PRIVATE_FEEDS = ('open_orders', 'open_positions')
+REST_PREFIX = '/derivatives/api/v3/'
+CHARTS_PREFIX = '/api/charts/v1/'
+# symbol: (tick size, size step, starting price, initial margin)
+INSTRUMENTS = {
+    'PF_XBTUSD': (1.0, 0.0001, 60000.0, 0.02),
+    'PF_ETHUSD': (0.1, 0.001, 3000.0, 0.02),
+    'PF_SOLUSD': (0.01, 0.01, 150.0, 0.05),
+    'PF_BONKUSD': (0.00000001, 1.0, 0.00002, 0.1),
+    'PF_CRVUSD': (0.0001, 1.0, 0.5, 0.1),
+}
+DEFAULT_INSTRUMENT = (0.01, 0.01, 100.0, 0.1)
+STARTING_BALANCE = 100000.0
+log = get_logger('emulator')
+
+
+def iso_time(time_ms):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(time_ms / 1000)) + f".{int(time_ms % 1000):03d}Z"
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def encode_frame(payload, opcode=TEXT):
+    header = bytearray((0x80 | opcode,))
+    length = len(payload)
+    if length < 126:
+        header.append(length)
+    elif length < 65536:
+        header.append(126)
+        header += struct.pack('>H', length)
+    else:
+        header.append(127)
+        header += struct.pack('>Q', length)
+    return bytes(header) + payload
+
+
+def read_exact(file, count):
+    data = file.read(count)
+    if len(data) < count:
+        raise ConnectionError('WebSocket closed')
+    return data
+
+
+def read_frame(file):
+    """Return (opcode, payload) of the next client frame; fragmented messages are not used by clients here."""
+    first, second = read_exact(file, 2)
+    length = second & 0x7f
+    if length == 126:
+        length = struct.unpack('>H', read_exact(file, 2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', read_exact(file, 8))[0]
+    mask = read_exact(file, 4) if second & 0x80 else None
+    payload = read_exact(file, length)
+    if mask:
+        key = int.from_bytes((mask * (length // 4 + 1))[:length], 'big')
+        payload = (int.from_bytes(payload, 'big') ^ key).to_bytes(length, 'big')
+    return first & 0x0f, payload
+
+
+class WsClient:
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+        self.feeds = set()
+        self.open = True
+
+    def send(self, message):
+        self.send_frame(json.dumps(message).encode())
+
+    def send_frame(self, payload, opcode=TEXT):
+        if not self.open:
+            return
+        try:
+            with self.lock:
+                self.connection.sendall(encode_frame(payload, opcode))
+        except OSError:
+            self.open = False
+
+
+class SimulatedMarket:
+    """Synthetic L2 book for one product: bids below mid, asks at or above it, so it never crosses."""
+
+    def __init__(self, symbol, rng, depth=25):
+        tick_size, size_step, price, margin = INSTRUMENTS.get(symbol, DEFAULT_INSTRUMENT)
+        self.symbol = symbol
+        self.instrument = Instrument(symbol, tick_size, size_step)
+        self.initial_margin = margin
+        self.rng = rng
+        self.depth = depth
+        self.mid = self.instrument.price_to_ticks(price)
+        self.bids = {self.mid - 1 - k: self.random_units() for k in range(depth)}
+        self.asks = {self.mid + k: self.random_units() for k in range(depth)}
+        self.book_seq = 0
+        self.trade_seq = 0
+        self.last_ticks = self.mid
+        self.volume = 0.0
+        self.candles = {}
+
+    def random_units(self):
+        notional = self.rng.uniform(200, 20000)
+        price = self.instrument.ticks_to_price(self.mid)
+        return max(1, self.instrument.size_to_units(notional / price))
+
+    def best_bid(self):
+        return max(self.bids) if self.bids else None
+
+    def best_ask(self):
+        return min(self.asks) if self.asks else None
+
+    def set_level(self, deltas, side, ticks, units):
+        levels = self.bids if side == 'buy' else self.asks
+        if units:
+            levels[ticks] = units
+        elif levels.pop(ticks, None) is None:
+            return
+        deltas.append((side, ticks, units))
+
+    def step(self):
+        """One random book change; returns the (side, ticks, units) deltas it made."""
+        rng = self.rng
+        deltas = []
+        if rng.random() < 0.1:
+            if rng.random() < 0.5:
+                old = self.mid
+                self.mid += 1
+                self.set_level(deltas, 'sell', old, 0)
+                self.set_level(deltas, 'buy', old, self.random_units())
+                self.set_level(deltas, 'buy', self.mid - 1 - self.depth, 0)
+            else:
+                self.mid -= 1
+                self.set_level(deltas, 'buy', self.mid, 0)
+                self.set_level(deltas, 'sell', self.mid, self.random_units())
+                self.set_level(deltas, 'sell', self.mid + self.depth, 0)
+        else:
+            side = 'buy' if rng.random() < 0.5 else 'sell'
+            offset = int(rng.expovariate(0.3)) % self.depth
+            ticks = self.mid - 1 - offset if side == 'buy' else self.mid + offset
+            units = 0 if offset and rng.random() < 0.2 else self.random_units()
+            self.set_level(deltas, side, ticks, units)
+        return deltas
+
+    def take(self, side, units, limit_ticks=None):
+        """Aggress with units on side ('buy' lifts asks); returns (fills [(ticks, units)], book deltas)."""
+        fills = []
+        deltas = []
+        levels = self.asks if side == 'buy' else self.bids
+        opposite = 'sell' if side == 'buy' else 'buy'
+        for ticks in sorted(levels, reverse=side == 'sell'):
+            if units <= 0 or (limit_ticks is not None and (ticks > limit_ticks if side == 'buy' else ticks < limit_ticks)):
+                break
+            filled = min(units, levels[ticks])
+            fills.append((ticks, filled))
+            units -= filled
+            self.set_level(deltas, opposite, ticks, levels[ticks] - filled)
+        return fills, deltas
+
+    def record_trade(self, ticks, units, time_ms):
+        self.last_ticks = ticks
+        size = self.instrument.units_to_size(units)
+        self.volume += size
+        price = self.instrument.ticks_to_price(ticks)
+        minute = time_ms // 60000 * 60000
+        candle = self.candles.get(minute)
+        if candle is None:
+            self.candles[minute] = [price, price, price, price, size]
+        else:
+            candle[1] = max(candle[1], price)
+            candle[2] = min(candle[2], price)
+            candle[3] = price
+            candle[4] += size
+
+
+class Emulator:
+    """Markets, one account and the connected WebSocket clients; every state change happens under lock."""
+
+    def __init__(self, symbols, book_rate=50.0, trade_rate=5.0, ticker_rate=1.0, speed=1.0, rest_latency_ms=0,
+                 seed=None, book_drop_rate=0.0):
+        self.rng = random.Random(seed)
+        self.markets = {symbol: SimulatedMarket(symbol, self.rng) for symbol in symbols}
+        self.rates = {'book': book_rate * speed, 'trade': trade_rate * speed, 'ticker': ticker_rate * speed}
+        self.rest_latency = rest_latency_ms / 1000
+        # Chance each client misses a book delta, leaving a seq gap to exercise resyncs
+        self.book_drop_rate = book_drop_rate
+        self.lock = threading.RLock()
+        self.clients = set()
+        self.orders = {}
+        self.positions = {}
+        self.realized = 0.0
+        self.order_ids = itertools.count(1)
+        self.running = False
+        self.stopped = threading.Event()
+        self.thread = None
+
+    # Market activity
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='emulator-market', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.stopped.set()
+        if self.thread:
+            self.thread.join(2)
+
+    def run(self):
+        rng = self.rng
+        events = []
+        start = time.monotonic()
+        for symbol in self.markets:
+            for kind, rate in self.rates.items():
+                if rate > 0:
+                    events.append((start + rng.expovariate(rate), kind, symbol))
+        heapq.heapify(events)
+        while self.running and events:
+            due, kind, symbol = events[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                self.stopped.wait(delay)
+                continue
+            heapq.heapreplace(events, (due + rng.expovariate(self.rates[kind]), kind, symbol))
+            with self.lock:
+                market = self.markets[symbol]
+                if kind == 'book':
+                    self.publish_deltas(market, market.step())
+                elif kind == 'trade':
+                    side = 'buy' if rng.random() < 0.5 else 'sell'
+                    fills, deltas = market.take(side, market.random_units())
+                    self.publish_deltas(market, deltas)
+                    self.publish_trades(market, side, fills)
+                else:
+                    self.broadcast('ticker', symbol, self.ticker_message(market))
+
+    def broadcast(self, feed, product, message, drop_rate=0.0):
+        for client in list(self.clients):
+            if (feed, product) in client.feeds and not (drop_rate and self.rng.random() < drop_rate):
+                client.send(message)
+
+    def publish_deltas(self, market, deltas):
+        time_ms = now_ms()
+        for side, ticks, units in deltas:
+            market.book_seq += 1
+            self.broadcast('book', market.symbol, {
+                'feed': 'book', 'product_id': market.symbol, 'side': side, 'seq': market.book_seq,
+                'price': market.instrument.ticks_to_price(ticks), 'qty': market.instrument.units_to_size(units),
+                'timestamp': time_ms}, self.book_drop_rate)
+
+    def publish_trades(self, market, side, fills):
+        time_ms = now_ms()
+        for ticks, units in fills:
+            market.trade_seq += 1
+            market.record_trade(ticks, units, time_ms)
+            self.broadcast('trade', market.symbol, {
+                'feed': 'trade', 'product_id': market.symbol, 'uid': str(uuid.uuid4()), 'side': side,
+                'type': 'fill', 'seq': market.trade_seq, 'time': time_ms,
+                'qty': market.instrument.units_to_size(units), 'price': market.instrument.ticks_to_price(ticks)})
+            self.fill_resting(market, side, ticks)
+
+    def fill_resting(self, market, aggressor, ticks):
+        """Resting orders priced at or through a print fill completely at their own price; stops
+        the print reaches become market orders."""
+        triggered = []
+        for order in list(self.orders.values()):
+            if order['symbol'] != market.symbol:
+                continue
+            if order['type'] == 'stp':
+                stop_ticks = market.instrument.price_to_ticks(order['stop_price'])
+                if (order['side'] == 'buy' and ticks >= stop_ticks) or (order['side'] == 'sell' and ticks <= stop_ticks):
+                    triggered.append(order)
+                continue
+            if order['side'] == aggressor:
+                continue
+            limit_ticks = market.instrument.price_to_ticks(order['limit_price'])
+            if (order['side'] == 'buy' and ticks <= limit_ticks) or (order['side'] == 'sell' and ticks >= limit_ticks):
+                self.fill_order(order, order['qty'] - order['filled'], order['limit_price'])
+        for order in triggered:
+            if self.orders.pop(order['order_id'], None) is not None:
+                self.trigger_stop(market, order)
+
+    def trigger_stop(self, market, order):
+        instrument = market.instrument
+        fills, deltas = market.take(order['side'], instrument.size_to_units(order['qty'] - order['filled']))
+        self.publish_deltas(market, deltas)
+        for fill_ticks, filled in fills:
+            order['filled'] += instrument.units_to_size(filled)
+            self.apply_fill(market.symbol, order['side'], instrument.units_to_size(filled),
+                            instrument.ticks_to_price(fill_ticks))
+        order['last_update'] = now_ms()
+        self.publish_order(order, 'full_fill')
+        self.publish_trades(market, order['side'], fills)
+
+    def ticker_message(self, market):
+        instrument = market.instrument
+        bid, ask = market.best_bid(), market.best_ask()
+        mark = instrument.ticks_to_price(market.mid)
+        return {'feed': 'ticker', 'product_id': market.symbol, 'time': now_ms(),
+                'bid': instrument.ticks_to_price(bid) if bid else 0.0,
+                'ask': instrument.ticks_to_price(ask) if ask else 0.0,
+                'bid_size': instrument.units_to_size(market.bids.get(bid, 0)),
+                'ask_size': instrument.units_to_size(market.asks.get(ask, 0)),
+                'last': instrument.ticks_to_price(market.last_ticks), 'volume': market.volume,
+                'markPrice': mark, 'index': mark, 'funding_rate': 0.0, 'tag': 'perpetual', 'suspended': False}
+
+    # Account
+
+    def fill_order(self, order, size, price):
+        order['filled'] += size
+        order['last_update'] = now_ms()
+        self.apply_fill(order['symbol'], order['side'], size, price)
+        if order['filled'] >= order['qty']:
+            self.orders.pop(order['order_id'], None)
+        self.publish_order(order, 'full_fill' if order['filled'] >= order['qty'] else 'partial_fill')
+
+    def apply_fill(self, symbol, side, size, price):
+        signed = size if side == 'buy' else -size
+        position = self.positions.get(symbol)
+        if position is None:
+            self.positions[symbol] = [signed, price]
+        else:
+            balance, entry = position
+            if balance * signed >= 0:
+                position[1] = (balance * entry + signed * price) / (balance + signed)
+            else:
+                closed = min(abs(signed), abs(balance))
+                self.realized += closed * (price - entry) * (1 if balance > 0 else -1)
+                if abs(signed) > abs(balance):
+                    position[1] = price
+            position[0] = round(balance + signed, 12)
+            if not position[0]:
+                del self.positions[symbol]
+        self.publish_positions()
+
+    def position_rows(self):
+        rows = []
+        for symbol, (balance, entry) in self.positions.items():
+            market = self.markets.get(symbol)
+            mark = market.instrument.ticks_to_price(market.mid) if market else entry
+            margin = market.initial_margin if market else 0.1
+            rows.append({'instrument': symbol, 'balance': balance, 'entry_price': entry, 'mark_price': mark,
+                         'index_price': mark, 'pnl': (mark - entry) * balance,
+                         'initial_margin': abs(balance) * mark * margin})
+        return rows
+
+    def publish_positions(self):
+        self.broadcast('open_positions', None, {'feed': 'open_positions', 'account': 'emulator',
+                                                'positions': self.position_rows()})
+
+    def feed_order(self, order):
+        return {'instrument': order['symbol'], 'time': order['time'], 'last_update_time': order['last_update'],
+                'qty': order['qty'], 'filled': order['filled'], 'limit_price': order['limit_price'],
+                'stop_price': order['stop_price'], 'type': 'stop' if order['type'] == 'stp' else 'limit',
+                'order_id': order['order_id'], 'cli_ord_id': order['cli_ord_id'],
+                'direction': 0 if order['side'] == 'buy' else 1, 'reduce_only': order['reduce_only']}
+
+    def rest_order(self, order):
+        return {'orderId': order['order_id'], 'cliOrdId': order['cli_ord_id'], 'type': order['type'],
+                'symbol': order['symbol'], 'side': order['side'], 'quantity': order['qty'], 'filled': order['filled'],
+                'limitPrice': order['limit_price'], 'reduceOnly': order['reduce_only'],
+                'timestamp': iso_time(order['time']), 'lastUpdateTimestamp': iso_time(order['last_update'])}
+
+    def publish_order(self, order, reason):
+        self.broadcast('open_orders', None, {'feed': 'open_orders', 'order': self.feed_order(order),
+                                             'is_cancel': False, 'reason': reason})
+
+    def send_order(self, params):
+        """Handle one sendorder request; returns the sendStatus object."""
+        symbol = params.get('symbol', '')
+        market = self.markets.get(symbol.upper())
+        received = iso_time(now_ms())
+        if market is None:
+            return {'status': 'invalidArgument', 'receivedTime': received, 'orderEvents': []}
+        order_type = params.get('orderType', 'lmt')
+        side = params.get('side', 'buy')
+        instrument = market.instrument
+        units = instrument.size_to_units(params.get('size') or 0)
+        if units <= 0 or side not in ('buy', 'sell'):
+            return {'status': 'invalidSize', 'receivedTime': received, 'orderEvents': []}
+        time_ms = now_ms()
+        order = {'order_id': str(uuid.uuid4()), 'cli_ord_id': params.get('cliOrdId'), 'symbol': market.symbol,
+                 'side': side, 'qty': instrument.units_to_size(units), 'filled': 0.0, 'limit_price': 0.0, 'stop_price': 0.0,
+                 'type': order_type, 'reduce_only': str(params.get('reduceOnly', '')).lower() == 'true',
+                 'time': time_ms, 'last_update': time_ms}
+        status = {'order_id': order['order_id'], 'cliOrdId': order['cli_ord_id'], 'receivedTime': received}
+
+        if order_type == 'mkt':
+            fills, deltas = market.take(side, units)
+            if not fills:
+                return dict(status, status='insufficientAvailableFunds', orderEvents=[])
+            self.publish_deltas(market, deltas)
+            events = []
+            for ticks, filled in fills:
+                price = instrument.ticks_to_price(ticks)
+                events.append({'type': 'EXECUTION', 'executionId': str(uuid.uuid4()), 'price': price,
+                               'amount': instrument.units_to_size(filled), 'orderPriorExecution': self.rest_order(order)})
+                order['filled'] += instrument.units_to_size(filled)
+                self.apply_fill(market.symbol, side, instrument.units_to_size(filled), price)
+            self.publish_trades(market, side, fills)
+            return dict(status, status='placed', orderEvents=events)
+
+        if order_type == 'stp':
+            # Stop-market only: rests until a print reaches stopPrice, then executes as a market order
+            order['stop_price'] = instrument.round_price(params.get('stopPrice') or 0)
+            self.orders[order['order_id']] = order
+            self.publish_order(order, 'new_placed_order_by_user')
+            return dict(status, status='placed', orderEvents=[{'type': 'PLACE', 'order': self.rest_order(order),
+                                                             'reducedQuantity': None}])
+
+        limit_ticks = instrument.price_to_ticks(params.get('limitPrice') or 0)
+        order['limit_price'] = instrument.ticks_to_price(limit_ticks)
+        best_opposite = market.best_ask() if side == 'buy' else market.best_bid()
+        crosses = best_opposite is not None and (limit_ticks >= best_opposite if side == 'buy'
+                                                 else limit_ticks <= best_opposite)
+        if crosses and order_type == 'post':
+            return dict(status, status='postWouldExecute',
+                        orderEvents=[{'type': 'POST_WOULD_EXECUTE', 'reason': 'POST_WOULD_EXECUTE',
+                                      'order': self.rest_order(order)}])
+        events = [{'type': 'PLACE', 'order': self.rest_order(order), 'reducedQuantity': None}]
+        if crosses:
+            fills, deltas = market.take(side, units, limit_ticks)
+            self.publish_deltas(market, deltas)
+            for ticks, filled in fills:
+                price = instrument.ticks_to_price(ticks)
+                events.append({'type': 'EXECUTION', 'executionId': str(uuid.uuid4()), 'price': price,
+                               'amount': instrument.units_to_size(filled), 'orderPriorExecution': self.rest_order(order)})
+                order['filled'] += instrument.units_to_size(filled)
+                self.apply_fill(market.symbol, side, instrument.units_to_size(filled), price)
+            self.publish_trades(market, side, fills)
+        if order['filled'] < order['qty']:
+            self.orders[order['order_id']] = order
+            self.publish_order(order, 'new_placed_order_by_user')
+        return dict(status, status='placed', orderEvents=events)
+
+    def cancel_order(self, order_id=None, cli_ord_id=None):
+        order = self.orders.get(order_id)
+        if order is None and cli_ord_id:
+            order = next((o for o in self.orders.values() if o['cli_ord_id'] == cli_ord_id), None)
+        received = iso_time(now_ms())
+        if order is None:
+            return {'status': 'notFound', 'order_id': order_id, 'receivedTime': received, 'orderEvents': []}
+        del self.orders[order['order_id']]
+        self.broadcast('open_orders', None, {'feed': 'open_orders', 'order_id': order['order_id'],
+                                             'is_cancel': True, 'reason': 'cancelled_by_user'})
+        return {'status': 'cancelled', 'order_id': order['order_id'], 'receivedTime': received,
+                'orderEvents': [{'uid': order['order_id'], 'order': self.rest_order(order), 'type': 'CANCEL'}]}
+
+    # REST
+
+    def rest(self, method, path, params):
+        """Return (http status, JSON body) for one REST request."""
+        if path.startswith(CHARTS_PREFIX):
+            return 200, self.candles(path[len(CHARTS_PREFIX):].split('/'), params)
+        if not path.startswith(REST_PREFIX):
+            return 404, {'result': 'error', 'error': 'Not found'}
+        endpoint = path[len(REST_PREFIX):].strip('/')
+        with self.lock:
+            if endpoint == 'instruments':
+                return 200, {'result': 'success', 'instruments': [self.instrument_row(m) for m in self.markets.values()]}
+            if endpoint == 'tickers':
+                return 200, {'result': 'success', 'tickers': [self.ticker_row(m) for m in self.markets.values()]}
+            if endpoint == 'accounts':
+                return 200, {'result': 'success', 'accounts': {'flex': self.flex_account()}}
+            if endpoint == 'openpositions':
+                return 200, {'result': 'success', 'openPositions': [
+                    {'side': 'long' if row['balance'] > 0 else 'short', 'symbol': row['instrument'],
+                     'price': row['entry_price'], 'fillTime': iso_time(now_ms()), 'size': abs(row['balance']),
+                     'unrealizedFunding': 0.0, 'pnlCurrency': 'USD'} for row in self.position_rows()]}
+            if endpoint == 'openorders':
+                return 200, {'result': 'success', 'openOrders': [
+                    {'order_id': o['order_id'], 'cliOrdId': o['cli_ord_id'], 'symbol': o['symbol'], 'side': o['side'],
+                     'orderType': o['type'], 'limitPrice': o['limit_price'], 'unfilledSize': o['qty'] - o['filled'],
+                     'filledSize': o['filled'], 'receivedTime': iso_time(o['time']), 'status': 'untouched',
+                     'reduceOnly': o['reduce_only'], 'lastUpdateTime': iso_time(o['last_update'])}
+                    for o in self.orders.values()]}
+            if method != 'POST':
+                return 404, {'result': 'error', 'error': f"Unknown endpoint {endpoint}"}
+            if endpoint == 'sendorder':
+                return 200, {'result': 'success', 'serverTime': iso_time(now_ms()), 'sendStatus': self.send_order(params)}
+            if endpoint == 'cancelorder':
+                return 200, {'result': 'success', 'serverTime': iso_time(now_ms()),
+                             'cancelStatus': self.cancel_order(params.get('order_id'), params.get('cliOrdId'))}
+            if endpoint == 'cancelallorders':
+                symbol = params.get('symbol')
+                cancelled = [self.cancel_order(o['order_id']) for o in list(self.orders.values())
+                             if not symbol or o['symbol'] == symbol.upper()]
+                return 200, {'result': 'success', 'cancelStatus': {
+                    'status': 'cancelled', 'receivedTime': iso_time(now_ms()),
+                    'cancelledOrders': [{'order_id': c['order_id']} for c in cancelled]}}
+            if endpoint == 'batchorder':
+                return 200, {'result': 'success', 'serverTime': iso_time(now_ms()),
+                             'batchStatus': self.batch(json.loads(params['json']) if 'json' in params else params)}
+        return 404, {'result': 'error', 'error': f"Unknown endpoint {endpoint}"}
+
+    def batch(self, request):
+        statuses = []
+        for instruction in request.get('batchOrder', []):
+            kind = instruction.get('order')
+            if kind == 'send':
+                status = self.send_order(instruction)
+                status['order_tag'] = instruction.get('order_tag')
+            elif kind == 'cancel':
+                status = self.cancel_order(instruction.get('order_id'), instruction.get('cliOrdId'))
+            else:
+                status = {'status': 'invalidArgument', 'orderEvents': []}
+            status['dateTimeReceived'] = status.pop('receivedTime', iso_time(now_ms()))
+            statuses.append(status)
+        return statuses
+
+    def instrument_row(self, market):
+        instrument = market.instrument
+        base = market.symbol[3:-3]
+        precision = max(0, round(-math.log10(instrument.size_step)))
+        return {'symbol': market.symbol, 'type': 'flexible_futures', 'tradeable': True, 'pair': f"{base}:USD",
+                'base': base, 'quote': 'USD', 'underlying': f"rr_{base.lower()}usd", 'tickSize': instrument.tick_size,
+                'contractSize': 1, 'contractValueTradePrecision': precision, 'impactMidSize': 1,
+                'maxPositionSize': 1000000, 'openingDate': '2022-01-01T00:00:00.000Z', 'fundingRateCoefficient': 8,
+                'maxRelativeFundingRate': 0.001, 'isin': None, 'postOnly': False, 'feeScheduleUid': 'emulator',
+                'retailMarginLevels': [], 'category': '', 'tags': [],
+                'marginLevels': [{'numNonContractUnits': 0, 'initialMargin': market.initial_margin,
+                                  'maintenanceMargin': market.initial_margin / 2}]}
+
+    def ticker_row(self, market):
+        message = self.ticker_message(market)
+        base = market.symbol[3:-3]
+        return {'symbol': market.symbol, 'tag': 'perpetual', 'pair': f"{base}:USD", 'bid': message['bid'],
+                'ask': message['ask'], 'bidSize': message['bid_size'], 'askSize': message['ask_size'],
+                'last': message['last'], 'lastTime': iso_time(message['time']), 'markPrice': message['markPrice'],
+                'indexPrice': message['index'], 'vol24h': market.volume, 'open24h': message['last'],
+                'fundingRate': 0.0, 'suspended': False, 'postOnly': False}
+
+    def flex_account(self):
+        rows = self.position_rows()
+        upnl = sum(row['pnl'] for row in rows)
+        margin = sum(row['initial_margin'] for row in rows)
+        value = STARTING_BALANCE + self.realized + upnl
+        return {'type': 'multiCollateralMarginAccount',
+                'currencies': {'USD': {'quantity': STARTING_BALANCE + self.realized, 'value': value,
+                                       'collateral': value, 'available': value - margin}},
+                'initialMargin': margin, 'maintenanceMargin': margin / 2, 'balanceValue': value,
+                'portfolioValue': value, 'collateralValue': value, 'pnl': upnl, 'unrealizedFunding': 0.0,
+                'totalUnrealized': upnl, 'availableMargin': value - margin, 'marginEquity': value}
+
+    def candles(self, parts, params):
+        if len(parts) < 3:
+            return {'candles': [], 'more_candles': False}
+        market = self.markets.get(parts[1].upper())
+        if market is None:
+            return {'candles': [], 'more_candles': False}
+        with self.lock:
+            rows = sorted(market.candles.items())
+        return {'candles': [{'time': minute, 'open': str(o), 'high': str(h), 'low': str(lo), 'close': str(c),
+                             'volume': str(v)} for minute, (o, h, lo, c, v) in rows], 'more_candles': False}
+
+    # WebSocket
+
+    def serve_ws(self, connection, rfile):
+        client = WsClient(connection)
+        with self.lock:
+            self.clients.add(client)
+        client.send({'event': 'info', 'version': 1})
+        try:
+            while self.running and client.open:
+                opcode, payload = read_frame(rfile)
+                if opcode == CLOSE:
+                    client.send_frame(payload[:2], CLOSE)
+                    break
+                if opcode == PING:
+                    client.send_frame(payload, PONG)
+                elif opcode == TEXT:
+                    self.handle_ws(client, json.loads(payload))
+        except (OSError, ValueError):
+            pass
+        finally:
+            client.open = False
+            with self.lock:
+                self.clients.discard(client)
+
+    def handle_ws(self, client, message):
+        event = message.get('event')
+        feed = message.get('feed')
+        if event == 'challenge':
+            client.send({'event': 'challenge', 'message': str(uuid.uuid4())})
+            return
+        if event not in ('subscribe', 'unsubscribe'):
+            client.send({'event': 'error', 'message': 'Json Error'})
+            return
+        with self.lock:
+            if feed in PRIVATE_FEEDS:
+                if not (message.get('api_key') and message.get('original_challenge') and message.get('signed_challenge')):
+                    client.send({'event': 'error', 'message': 'Invalid challenge'})
+                    return
+                keys = [(feed, None)]
+            else:
+                products = [p for p in message.get('product_ids', []) if p in self.markets]
+                if not products:
+                    client.send({'event': 'alert', 'message': 'Invalid product id'})
+                    return
+                keys = [(feed, product) for product in products]
+            if event == 'unsubscribe':
+                client.feeds.difference_update(keys)
+                client.send({'event': 'unsubscribed', 'feed': feed, 'product_ids': [k[1] for k in keys if k[1]]})
+                return
+            client.feeds.update(keys)
+            if feed in PRIVATE_FEEDS:
+                client.send({'event': 'subscribed', 'feed': feed})
+                if feed == 'open_orders':
+                    client.send({'feed': 'open_orders_snapshot', 'account': 'emulator',
+                                 'orders': [self.feed_order(o) for o in self.orders.values()]})
+                else:
+                    client.send({'feed': 'open_positions', 'account': 'emulator', 'positions': self.position_rows()})
+                return
+            client.send({'event': 'subscribed', 'feed': feed, 'product_ids': [k[1] for k in keys]})
+            for _, product in keys:
+                market = self.markets[product]
+                if feed == 'book':
+                    # The snapshot carries the seq of the last delta it includes; the next delta is seq + 1
+                    instrument = market.instrument
+                    client.send({'feed': 'book_snapshot', 'product_id': product, 'timestamp': now_ms(),
+                                 'seq': market.book_seq, 'tickSize': None,
+                                 'bids': [{'price': instrument.ticks_to_price(t), 'qty': instrument.units_to_size(u)}
+                                          for t, u in sorted(market.bids.items(), reverse=True)],
+                                 'asks': [{'price': instrument.ticks_to_price(t), 'qty': instrument.units_to_size(u)}
+                                          for t, u in sorted(market.asks.items())]})
+                elif feed == 'trade':
+                    client.send({'feed': 'trade_snapshot', 'product_id': product, 'trades': []})
+                elif feed == 'ticker':
+                    client.send(self.ticker_message(market))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.headers.get('Upgrade', '').lower() == 'websocket':
+            self.upgrade()
+        else:
+            self.respond('GET')
+
+    def do_POST(self):
+        self.respond('POST')
+
+    def upgrade(self):
+        key = self.headers.get('Sec-WebSocket-Key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.server.emulator.serve_ws(self.connection, self.rfile)
+        self.close_connection = True
+
+    def respond(self, method):
+        emulator = self.server.emulator
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = self.rfile.read(length).decode()
+            if body.lstrip().startswith('{'):
+                params.update(json.loads(body))
+            else:
+                params.update(parse_qsl(body))
+        if emulator.rest_latency:
+            time.sleep(emulator.rest_latency)
+        try:
+            status, response = emulator.rest(method, url.path, params)
+        except Exception as e:
+            log.exception("Error handling %s %s", method, url.path)
+            status, response = 500, {'result': 'error', 'error': str(e)}
+        payload = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+def serve(emulator, host='127.0.0.1', port=8766):
+    """Start the market thread and return the HTTP server; call serve_forever() on it."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.emulator = emulator
+    emulator.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Kraken Futures emulator (WebSocket v1 + REST)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--symbols', default='XBT,ETH,SOL,BONK,CRV', help='comma separated pairs or PF_ symbols')
+    parser.add_argument('--book-rate', type=float, default=50.0, help='book changes per second per product')
+    parser.add_argument('--trade-rate', type=float, default=5.0, help='trade prints per second per product')
+    parser.add_argument('--ticker-rate', type=float, default=1.0, help='ticker messages per second per product')
+    parser.add_argument('--speed', type=float, default=1.0, help='multiplier on every rate, e.g. 10 for load runs')
+    parser.add_argument('--rest-latency-ms', type=float, default=0.0, help='delay added to every REST response')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--book-drop-rate', type=float, default=0.0, help='chance each client misses a book delta')
+    args = parser.parse_args()
+
+    import log as logging_setup
+    logging_setup.configure()
+    symbols = [s if s.startswith('PF_') else f"PF_{s}USD" for s in args.symbols.upper().split(',') if s]
+    emulator = Emulator(symbols, args.book_rate, args.trade_rate, args.ticker_rate, args.speed,
+                        args.rest_latency_ms, args.seed, args.book_drop_rate)
+    server = serve(emulator, args.host, args.port)
+    log.info("Emulator listening on ws://%s:%d/ws/v1 and http://%s:%d", args.host, args.port, args.host, args.port,
+             extra={'fields': {'symbols': ','.join(symbols), 'speed': args.speed}})
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
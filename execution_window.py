@@ -0,0 +1,114 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit, QComboBox
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QDoubleValidator
+from settings import GUI_FONT, GUI_FONT_SIZE, EXECUTION_REFRESH_MS
+from helpers import format_price
+
+
+class ExecutionWindow(QWidget):
+    """Starts TWAP/iceberg parents from the order ticket and shows their progress."""
+    start_requested = pyqtSignal(str, float, object)
+    parent_cancelled = pyqtSignal(int)
+    clear_requested = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle('Execution')
+        self.scheduler = None
+        self.dirty = True
+        font = QFont(GUI_FONT, max(GUI_FONT_SIZE - 4, 8))
+        layout = QVBoxLayout(self)
+
+        form_layout = QHBoxLayout()
+        self.style_input = QComboBox()
+        self.style_input.addItems(['TWAP', 'Iceberg'])
+        self.style_input.currentTextChanged.connect(self.update_placeholder)
+        form_layout.addWidget(self.style_input)
+        self.value_input = QLineEdit()
+        self.value_input.setValidator(QDoubleValidator())
+        form_layout.addWidget(self.value_input)
+        self.limit_input = QLineEdit()
+        self.limit_input.setValidator(QDoubleValidator())
+        self.limit_input.setPlaceholderText('Limit (optional)')
+        form_layout.addWidget(self.limit_input)
+        start_button = QPushButton('Start', font=font)
+        start_button.clicked.connect(self.request_start)
+        form_layout.addWidget(start_button)
+        clear_button = QPushButton('Clear finished', font=font)
+        clear_button.clicked.connect(self.clear_requested.emit)
+        form_layout.addWidget(clear_button)
+        layout.addLayout(form_layout)
+        self.update_placeholder(self.style_input.currentText())
+
+        self.status_label = QLabel('Side and size come from the order ticket')
+        self.status_label.setFont(font)
+        layout.addWidget(self.status_label)
+        self.rows_layout = QVBoxLayout()
+        self.rows_layout.setSpacing(2)
+        layout.addLayout(self.rows_layout)
+        layout.addStretch()
+        self.resize(700, 250)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(int(EXECUTION_REFRESH_MS))
+
+    def update_placeholder(self, style):
+        self.value_input.setPlaceholderText('Minutes' if style == 'TWAP' else 'Display size')
+
+    def request_start(self):
+        value = self.value_input.text().strip()
+        if not value:
+            self.show_status(f"Enter the {self.value_input.placeholderText().lower()}")
+            return
+        limit = self.limit_input.text().strip()
+        self.start_requested.emit(self.style_input.currentText().lower(), float(value), float(limit) if limit else None)
+
+    def show_status(self, text):
+        self.status_label.setText(text)
+
+    def set_scheduler(self, scheduler):
+        self.scheduler = scheduler
+        self.dirty = True
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def refresh(self):
+        if not self.isVisible() or not self.scheduler or not self.dirty:
+            return
+        self.dirty = False
+        for i in reversed(range(self.rows_layout.count())):
+            self.rows_layout.itemAt(i).widget().setParent(None)
+
+        for parent in self.scheduler.describe():
+            row = QWidget()
+            row_layout = QHBoxLayout(row)
+            row_layout.setContentsMargins(0, 0, 0, 0)
+            side_color = 'green' if parent['side'] == 'buy' else 'red'
+            detail = f"{parent['duration_s'] / 60:g}m" if parent['style'] == 'twap' else f"show {parent['display']}"
+            text = (f"#{parent['id']} {parent['style'].upper()} {parent['symbol']} "
+                    f"<font color='{side_color}'>{parent['side'].upper()}</font> {parent['amount']} ({detail}) | "
+                    f"<b>{parent['progress'] * 100:.1f}%</b> {parent['filled']} filled")
+            if parent['average_price'] is not None:
+                text += f" @ {format_price(parent['average_price'])}"
+            if parent['working']:
+                text += f" | working {parent['working']} @ {format_price(parent['working_price'])}"
+            text += f" | {parent['children']} children | {parent['state']}"
+            if parent['throttled']:
+                text += f" | rate-held {parent['throttled']}x"
+            if parent['error']:
+                text += f" | <font color='red'>{parent['error']}</font>"
+            label = QLabel(text)
+            label.setFont(QFont(GUI_FONT, max(GUI_FONT_SIZE - 6, 8)))
+            label.setTextFormat(Qt.RichText)
+            row_layout.addWidget(label)
+            if parent['state'] in ('starting', 'working'):
+                cancel_button = QPushButton('❌')
+                cancel_button.setFixedSize(30, 30)
+                cancel_button.setStyleSheet("color: red;")
+                cancel_button.clicked.connect(lambda checked=False, parent_id=parent['id']:
+                                              self.parent_cancelled.emit(parent_id))
+                row_layout.addWidget(cancel_button)
+            row_layout.addStretch()
+            self.rows_layout.addWidget(row)
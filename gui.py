@@ -1,269 +1,109 @@
-from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QTextEdit, \
-    QFrame, QDialog,QSizePolicy, QShortcut, QGridLayout
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, \
+    QTextEdit, QSystemTrayIcon, QStyle, QFrame, QDialog,QSizePolicy, QShortcut, QGridLayout, QMenu, QCheckBox, QComboBox
 from PyQt5.QtCore import QThread, pyqtSignal, Qt, QTimer
-from PyQt5.QtGui import QFont, QKeySequence, QDoubleValidator
-import ccxt
-import traceback
-from settings import (KRAKEN_API_KEY, KRAKEN_API_SECRET, GUI_FONT, GUI_FONT_SIZE, QUICK_SWAP_TICKERS,
-                      save_settings, BOOK_UPDATE_THROTTLE, PLACE_ORDER_HOTKEY, CLOSE_ORDERS_HOTKEY,
+from PyQt5.QtGui import QFont, QKeySequence, QDoubleValidator, QIntValidator
+from settings import (GUI_FONT, GUI_FONT_SIZE, QUICK_SWAP_TICKERS,
+                      save_settings, PLACE_ORDER_HOTKEY, CLOSE_ORDERS_HOTKEY,
                       CLOSE_LAST_ORDER_HOTKEY, BUY_HOTKEY, SELL_HOTKEY, BEST_PRICE_HOTKEY, PRICE_INPUT_HOTKEY,
-                      MARKET_PRICE_HOTKEY, MID_PRICE_HOTKEY)
-from helpers import format_price, round_to_tick, calculate_adjusted_mid, get_full_symbol, get_user_position, \
-    get_open_orders
+                      MARKET_PRICE_HOTKEY, MID_PRICE_HOTKEY, MICRO_PRICE_HOTKEY, DEPTH_PRICE_HOTKEY,
+                      SHARED_BOOK_ENABLED, SHARED_BOOK_DEPTH,
+                      SHARED_BOOK_DIR, CONTROL_API_ENABLED, CONTROL_API_ADDRESS,
+                      HISTORY_ENABLED, HISTORY_DIR, HISTORY_FLUSH_MS, BOOK_JOURNAL_ENABLED, BOOK_JOURNAL_DIR,
+                      BOOK_JOURNAL_SNAPSHOT_EVERY, PROFILE_HOTKEY, MEMORY_TRACE_HOTKEY, DIAGNOSTICS_DIR,
+                      PROFILE_SAMPLE_MS, MEMORY_SNAPSHOT_SECONDS, ORDER_JOURNAL_ENABLED, ORDER_JOURNAL_PATH,
+                      PAPER_TRADING, PAPER_BALANCE, BRACKET_BACKUP_OFFSET_TICKS, BRACKET_TRIGGER_SOURCE,
+                      TRIGGER_EVAL_BUDGET_US, EXECUTION_SLICE_SECONDS, EXECUTION_PARTICIPATION,
+                      EXECUTION_DEPTH_FRACTION, EXECUTION_DEPTH_LEVELS, EXECUTION_REPRICE_TICKS, EXECUTION_RATE_RESERVE,
+                      ALERT_SOUND, ALERT_DESKTOP_NOTIFY, ALERT_REPEAT_COOLDOWN_S, SIGNAL_DEPTH_LEVELS,
+                      SIGNAL_FLOW_WINDOW_S, BALANCE_POLL_MS)
+from helpers import format_price, round_to_tick, get_full_symbol, get_user_position, get_open_orders, \
+    format_volume_usd, format_signals
+from instrument import Instrument
+from core import (MarketDataEngine, OrderManager, OrderJournal, OrderTicket, PaperExchange, TriggerEngine, Batch,
+                  Latest, ExecutionScheduler, AlertEngine, Microstructure, create_exchange, fetch_balance_summary,
+                  load_instrument, ladder_rungs, LADDER_DISTRIBUTIONS)
+from ladder import PriceLadder
+from chart import ChartWindow
+from watchlist import WatchlistWindow
+from portfolio import PortfolioWindow
+from execution_window import ExecutionWindow
+from alerts_window import AlertsWindow
+from shared_book import SharedBookWriter
+from control_api import ControlServer
+from history import HistoryWriter
+from book_journal import BookJournalWriter
+from diagnostics import Diagnostics
+from log import get_logger
 from datetime import datetime
-import websocket
-import json
+import threading
 import time
 from collections import deque
-import hashlib
-import base64
-import hmac
+
+log = get_logger('gui')
+order_log = get_logger('orders')
 
 class WebSocketThread(QThread):
-    trade_signal = pyqtSignal(dict)
-    last_price_signal = pyqtSignal(float)
-    book_signal = pyqtSignal(dict)
+    """Qt adapter running a MarketDataEngine and re-emitting its callbacks as signals.
+
+    Trades and quotes are not carried by their signals: trades_signal fires once per
+    undrained burst (read it with take_trades()) and book_signal once per unread quote
+    (take_quote()). Other payloads are immutable tuples passed as object, which Qt hands
+    over by reference instead of converting to a QVariant copy.
+    """
+    trades_signal = pyqtSignal()
+    book_signal = pyqtSignal()
     index_signal = pyqtSignal(float)
-    orders_signal = pyqtSignal(list)
-    position_signal = pyqtSignal(dict)
+    orders_signal = pyqtSignal(object)
+    position_signal = pyqtSignal(object)
     error_signal = pyqtSignal()
+    health_signal = pyqtSignal(object)
 
-    def __init__(self, symbol):
+    def __init__(self, symbol, instrument):
         super().__init__()
         self.symbol = symbol
-        self.ws = None
-        self.running = True
-        self.orderbook = {'bids': {}, 'asks': {}}
-        self.last_book_update = 0
-        self.book_throttle = BOOK_UPDATE_THROTTLE
-        self.ping_interval = 30
-        self.open_orders = {}
-
-    def sign_challenge(self, challenge):
-        challenge_hash = hashlib.sha256(challenge.encode()).digest()
-        secret_decoded = base64.b64decode(KRAKEN_API_SECRET)
-        signature = hmac.new(secret_decoded, challenge_hash, hashlib.sha512)
-        signed_challenge = base64.b64encode(signature.digest()).decode()
-
-        return signed_challenge
-
-    def handle_order_update(self, data):
-        if data.get('feed') == 'open_orders_snapshot':
-            self.open_orders = {}
-            for order in data.get('orders', []):
-                if float(order.get('filled', 0)) < float(order.get('qty', 0)):
-                    order_id = order.get('order_id')
-                    self.open_orders[order_id] = {
-                        'id': order_id,
-                        'side': 'buy' if order.get('direction') == 0 else 'sell',
-                        'qty': float(order.get('qty', 0)),
-                        'limitPrice': float(order.get('limit_price', 0)),
-                        'filled': float(order.get('filled', 0)),
-                        'type': order.get('type'),
-                        'reduceOnly': order.get('reduce_only', False),
-                        'last_update': order.get('last_update_time')
-                    }
-        else:
-            is_cancel = data.get('is_cancel', False)
-            reason = data.get('reason')
-            order = data.get('order', {})
-
-            order_id = order.get('order_id') if order else data.get('order_id')
-
-            if is_cancel or (order and float(order.get('filled', 0)) >= float(order.get('qty', 0))):
-                if order_id in self.open_orders:
-                    del self.open_orders[order_id]
-                    print(f"Order {order_id} removed. Reason: {reason}")
-
-            elif order:
-                qty = float(order.get('qty', 0))
-                filled = float(order.get('filled', 0))
-                if filled < qty:
-                    self.open_orders[order_id] = {
-                        'id': order_id,
-                        'side': 'buy' if order.get('direction') == 0 else 'sell',
-                        'qty': qty,
-                        'limitPrice': float(order.get('limit_price', 0)),
-                        'filled': filled,
-                        'type': order.get('type'),
-                        'reduceOnly': order.get('reduce_only', False),
-                        'last_update': order.get('last_update_time')
-                    }
-
-        self.orders_signal.emit(list(self.open_orders.values()))
+        self.instrument = instrument
+        self.engine = MarketDataEngine(symbol, instrument)
+        self.trades = Batch(self.trades_signal.emit)
+        self.quotes = Latest(self.book_signal.emit)
+        self.engine.on_trade = self.trades.add
+        self.engine.on_book = self.quotes.set
+        self.engine.on_index = self.index_signal.emit
+        self.engine.on_orders = self.orders_signal.emit
+        self.engine.on_position = self.position_signal.emit
+        self.engine.on_error = self.error_signal.emit
+        self.engine.on_health = self.health_signal.emit
+
+    @property
+    def orderbook(self):
+        return self.engine.orderbook
+
+    def take_trades(self):
+        return self.trades.take()
+
+    def take_quote(self):
+        return self.quotes.take()
+
+    @property
+    def open_orders(self):
+        return self.engine.open_orders
+
+    @property
+    def portfolio(self):
+        return self.engine.portfolio
+
+    @property
+    def book_throttle(self):
+        return self.engine.book_throttle
+
+    @book_throttle.setter
+    def book_throttle(self, value):
+        self.engine.book_throttle = value
 
     def run(self):
-        def on_message(ws, message):
-            try:
-                data = json.loads(message)
-                # print(f"Processing message type: {data.get('event')} feed: {data.get('feed')} {data}")
-
-                if data.get('event') == 'challenge':
-                    challenge = data['message']
-                    signed_challenge = self.sign_challenge(challenge)
-
-                    orders_subscription = {
-                        "event": "subscribe",
-                        "feed": "open_orders",
-                        "api_key": KRAKEN_API_KEY,
-                        "original_challenge": challenge,
-                        "signed_challenge": signed_challenge
-                    }
-                    # print(f"Sending orders subscription: {orders_subscription}")
-                    positions_subscription = {
-                        "event": "subscribe",
-                        "feed": "open_positions",
-                        "api_key": KRAKEN_API_KEY,
-                        "original_challenge": challenge,
-                        "signed_challenge": signed_challenge
-                    }
-
-                    ws.send(json.dumps(orders_subscription))
-                    ws.send(json.dumps(positions_subscription))
-                    # print(f"Sending orders subscription: {positions_subscription}")
-
-                elif data.get('feed') == 'trade' and data.get('price') and data.get('qty'):
-                    if all(key in data for key in ('price', 'qty')):
-                        trade = {
-                            'time': data.get('time', int(time.time() * 1000)),
-                            'side': data.get('side', 'unknown'),
-                            'price': float(data.get('price', 0)),
-                            'amount': float(data.get('qty', 0))
-                        }
-                        self.trade_signal.emit(trade)
-                        self.last_price_signal.emit(float(data['price']))
-
-                elif data.get('feed') == 'book_snapshot':
-                    self.orderbook = {'bids': {}, 'asks': {}}
-                    bids = data.get('bids', [])
-                    asks = data.get('asks', [])
-
-                    for bid in bids:
-                        if isinstance(bid, (list, tuple)) and len(bid) >= 2:
-                            self.orderbook['bids'][float(bid[0])] = float(bid[1])
-
-                    for ask in asks:
-                        if isinstance(ask, (list, tuple)) and len(ask) >= 2:
-                            self.orderbook['asks'][float(ask[0])] = float(ask[1])
-
-                    self.emit_book_update()
-
-                elif data.get('feed') == 'book':
-                    if all(key in data for key in ('side', 'price', 'qty')):
-                        side = 'bids' if data['side'] == 'buy' else 'asks'
-                        price = float(data['price'])
-                        size = float(data['qty'])
-
-                        if size == 0:
-                            self.orderbook[side].pop(price, None)
-                        else:
-                            self.orderbook[side][price] = size
-
-                        self.emit_book_update()
-
-                elif data.get('feed') in ['open_orders_snapshot', 'open_orders']:
-                    self.handle_order_update(data)
-
-                elif data.get('feed') in ['open_positions', 'open_positions_snapshot']:
-                    positions = data.get('positions', [])
-                    current_symbol_position = next(
-                        (pos for pos in positions if pos.get('instrument') == self.symbol),
-                        None
-                    )
-                    if current_symbol_position:
-                        position_data = {
-                            'entryPrice': current_symbol_position['entry_price'],
-                            'contracts': current_symbol_position['balance'],
-                            'symbol': self.symbol,
-                            'info': {
-                                'side': 'LONG' if float(current_symbol_position['balance']) > 0 else 'SHORT'
-                            }
-                        }
-                        self.position_signal.emit(position_data)
-                    else:
-                        self.position_signal.emit({})
-
-                elif data.get('feed') == 'ticker':
-                    if 'markPrice' in data:
-                        index_price = float(data['markPrice'])
-                        self.index_signal.emit(index_price)
-
-            except Exception as e:
-                print(f"Error in message processing: {str(e)}")
-                traceback.print_exc()
-
-        def on_error(ws, error):
-            print(f"WebSocket error: {error}")
-            self.error_signal.emit()
-
-        def on_close(ws, close_status_code, close_msg):
-            print("WebSocket connection closed")
-            if self.running:
-                self.error_signal.emit()
-
-        def on_open(ws):
-            print("WebSocket connection opened")
-
-            subscribe_messages = [
-                {
-                    "event": "subscribe",
-                    "feed": "book",
-                    "product_ids": [self.symbol]
-                },
-                {
-                    "event": "subscribe",
-                    "feed": "trade",
-                    "product_ids": [self.symbol]
-                },
-                {
-                    "event": "subscribe",
-                    "feed": "ticker",
-                    "product_ids": [self.symbol]
-                }
-            ]
-
-            for msg in subscribe_messages:
-                # print(f"Sending subscription: {msg}")
-                ws.send(json.dumps(msg))
-
-            challenge_request = {
-                "event": "challenge",
-                "api_key": KRAKEN_API_KEY
-            }
-            # print(f"Sending challenge request: {challenge_request}")
-            ws.send(json.dumps(challenge_request))
-
-        while self.running:
-            try:
-                self.ws = websocket.WebSocketApp(
-                    "wss://futures.kraken.com/ws/v1",
-                    on_message=on_message,
-                    on_error=on_error,
-                    on_close=on_close)
-                self.ws.on_open = on_open
-                self.ws.run_forever()
-                if not self.running:
-                    break
-            except Exception as e:
-                print(f"WebSocket connection error: {e}")
-                time.sleep(1)
+        self.engine.run()
 
     def stop(self):
-        self.running = False
-        if self.ws:
-            self.ws.close()
-
-    def emit_book_update(self):
-        current_time = time.time() * 1000
-        if current_time - self.last_book_update > int(self.book_throttle):
-            if self.orderbook['bids'] and self.orderbook['asks']:
-                best_bid = max(self.orderbook['bids'].keys())
-                best_ask = min(self.orderbook['asks'].keys())
-                self.book_signal.emit({
-                    'bid': best_bid,
-                    'ask': best_ask
-                })
-                self.last_book_update = current_time
+        self.engine.stop()
 
 
 class RecentTradesWindow(QWidget):
@@ -303,8 +143,8 @@ class OrdersDisplay(QWidget):
                 order_layout = QHBoxLayout(order_widget)
                 order_layout.setContentsMargins(0, 0, 0, 0)
 
-                side_color = 'green' if order['side'] == 'buy' else 'red'
-                text = f"<font color='{side_color}'>{order['side'].upper()}</font> | Size: {order['qty']} | Price: {format_price(order['limitPrice'])}"
+                side_color = 'green' if order.side == 'buy' else 'red'
+                text = f"<font color='{side_color}'>{order.side.upper()}</font> | Size: {order.qty} | Price: {format_price(order.limit_price)}"
 
                 order_label = QLabel(text)
                 order_label.setFont(QFont(GUI_FONT, GUI_FONT_SIZE))
@@ -317,7 +157,7 @@ class OrdersDisplay(QWidget):
                 def create_cancel_handler(order_id):
                     return lambda: self.order_cancelled.emit(order_id)
 
-                cancel_button.clicked.connect(create_cancel_handler(order['id']))
+                cancel_button.clicked.connect(create_cancel_handler(order.id))
 
                 order_layout.addWidget(order_label)
                 order_layout.addWidget(cancel_button)
@@ -327,7 +167,7 @@ class OrdersDisplay(QWidget):
 
     def create_cancel_handler(self, order_id):
         def handler():
-            print(f"Cancel button clicked for order: {order_id}")
+            log.debug("Cancel button clicked for order %s", order_id)
             self.order_cancelled.emit(order_id)
         return handler
 
@@ -406,6 +246,14 @@ class SettingsDialog(QDialog):
         self.price_input_hotkey_input = QLineEdit(settings.PRICE_INPUT_HOTKEY)
         order_hotkeys_layout.addWidget(self.price_input_hotkey_input, 5, 1)
 
+        order_hotkeys_layout.addWidget(QLabel('Microprice Hotkey:'), 6, 0)
+        self.micro_price_hotkey_input = QLineEdit(settings.MICRO_PRICE_HOTKEY)
+        order_hotkeys_layout.addWidget(self.micro_price_hotkey_input, 6, 1)
+
+        order_hotkeys_layout.addWidget(QLabel('Depth Price Hotkey:'), 7, 0)
+        self.depth_price_hotkey_input = QLineEdit(settings.DEPTH_PRICE_HOTKEY)
+        order_hotkeys_layout.addWidget(self.depth_price_hotkey_input, 7, 1)
+
         layout.addLayout(order_hotkeys_layout)
 
         api_layout = QGridLayout()
@@ -440,6 +288,122 @@ class SettingsDialog(QDialog):
         self.parent().exchange.secret = self.api_secret_input.text()
         self.accept()
 
+class BracketDialog(QDialog):
+    """Stop-loss and take-profit prices for the open position, either optional."""
+
+    def __init__(self, position_side, brackets, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f'Bracket {position_side}')
+        self.cancel_existing = False
+        layout = QGridLayout()
+        layout.addWidget(QLabel('Stop loss:'), 0, 0)
+        self.stop_input = QLineEdit()
+        self.stop_input.setValidator(QDoubleValidator())
+        layout.addWidget(self.stop_input, 0, 1)
+        layout.addWidget(QLabel('Take profit:'), 1, 0)
+        self.take_profit_input = QLineEdit()
+        self.take_profit_input.setValidator(QDoubleValidator())
+        layout.addWidget(self.take_profit_input, 1, 1)
+        self.backup_checkbox = QCheckBox('Exchange stop as backup')
+        layout.addWidget(self.backup_checkbox, 2, 0, 1, 2)
+        arm_button = QPushButton('Arm')
+        arm_button.clicked.connect(self.accept)
+        layout.addWidget(arm_button, 3, 0)
+        cancel_button = QPushButton(f'Cancel {len(brackets)} armed')
+        cancel_button.setEnabled(bool(brackets))
+        cancel_button.clicked.connect(self.cancel_brackets)
+        layout.addWidget(cancel_button, 3, 1)
+        self.setLayout(layout)
+
+    def cancel_brackets(self):
+        self.cancel_existing = True
+        self.accept()
+
+    def prices(self):
+        stop = self.stop_input.text().strip()
+        take_profit = self.take_profit_input.text().strip()
+        return float(stop) if stop else None, float(take_profit) if take_profit else None
+
+
+class ScaledOrderDialog(QDialog):
+    """A ladder of post-only orders from a start to an end price, sent as one batch."""
+
+    def __init__(self, symbol, instrument, side, units, send, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f'Scaled {side} {instrument.units_to_size(units)} {symbol}')
+        self.instrument = instrument
+        self.units = units
+        self.send = send
+        self.rungs = []
+        layout = QGridLayout()
+        layout.addWidget(QLabel('Start price:'), 0, 0)
+        self.start_input = QLineEdit()
+        self.start_input.setValidator(QDoubleValidator())
+        layout.addWidget(self.start_input, 0, 1)
+        layout.addWidget(QLabel('End price:'), 1, 0)
+        self.end_input = QLineEdit()
+        self.end_input.setValidator(QDoubleValidator())
+        layout.addWidget(self.end_input, 1, 1)
+        layout.addWidget(QLabel('Orders:'), 2, 0)
+        self.count_input = QLineEdit('5')
+        self.count_input.setValidator(QIntValidator(1, 100))
+        layout.addWidget(self.count_input, 2, 1)
+        layout.addWidget(QLabel('Sizes:'), 3, 0)
+        self.distribution_input = QComboBox()
+        self.distribution_input.addItems(LADDER_DISTRIBUTIONS)
+        layout.addWidget(self.distribution_input, 3, 1)
+        self.preview_label = QLabel()
+        self.preview_label.setTextFormat(Qt.RichText)
+        layout.addWidget(self.preview_label, 4, 0, 1, 2)
+        self.send_button = QPushButton('Send')
+        self.send_button.clicked.connect(self.submit)
+        layout.addWidget(self.send_button, 5, 0)
+        close_button = QPushButton('Close')
+        close_button.clicked.connect(self.reject)
+        layout.addWidget(close_button, 5, 1)
+        self.setLayout(layout)
+        for field in (self.start_input, self.end_input, self.count_input):
+            field.textChanged.connect(self.update_preview)
+        self.distribution_input.currentTextChanged.connect(self.update_preview)
+        self.update_preview()
+
+    def update_preview(self):
+        self.rungs = []
+        start, end, count = self.start_input.text().strip(), self.end_input.text().strip(), self.count_input.text()
+        if not start or not end or not count:
+            self.preview_label.setText('Enter the start and end price')
+            return
+        instrument = self.instrument
+        try:
+            self.rungs = ladder_rungs(self.units, instrument.price_to_ticks(float(start)),
+                                      instrument.price_to_ticks(float(end)), int(count),
+                                      self.distribution_input.currentText())
+        except ValueError as e:
+            self.preview_label.setText(str(e))
+            return
+        self.preview_label.setText('<br>'.join(
+            f"{format_price(instrument.ticks_to_price(ticks))} &nbsp; {instrument.units_to_size(units)}"
+            for ticks, units in self.rungs))
+
+    def submit(self):
+        if not self.rungs:
+            return
+        try:
+            statuses, latency_ns = self.send(self.rungs)
+        except Exception as e:
+            self.preview_label.setText(f"<font color='red'>Not sent: {e}</font>")
+            return
+        instrument = self.instrument
+        placed = sum(status['status'] == 'placed' for status in statuses)
+        lines = [f"<b>{placed}/{len(statuses)} placed in {latency_ns / 1e6:.0f} ms</b>"]
+        for (ticks, units), status in zip(self.rungs, statuses):
+            color = 'green' if status['status'] == 'placed' else 'red'
+            lines.append(f"{format_price(instrument.ticks_to_price(ticks))} &nbsp; {instrument.units_to_size(units)} "
+                         f"&nbsp; <font color='{color}'>{status['status']}</font>")
+        self.preview_label.setText('<br>'.join(lines))
+        self.rungs = []
+
+
 class DataFetchThread(QThread):
     data_signal = pyqtSignal(dict)
     error_signal = pyqtSignal()
@@ -449,30 +413,33 @@ class DataFetchThread(QThread):
         self.exchange = exchange
         self.symbol = symbol
         self.running = True
+        self.wake = threading.Event()
 
     def run(self):
+        # Paced explicitly: a PaperExchange answers locally (under the engine lock), so the rate
+        # limiter no longer spaces the polls out
         while self.running:
             try:
-                balance = self.exchange.fetch_balance()
-                flex_account = balance['info']['accounts']['flex']
-                available_margin = float(flex_account['availableMargin'])
-                total_balance = float(flex_account['balanceValue'])
-
-                self.data_signal.emit({
-                    'available_margin': available_margin,
-                    'total_balance': total_balance
-                })
+                self.data_signal.emit(fetch_balance_summary(self.exchange))
             except Exception as e:
-                print(f"Error fetching data: {str(e)}")
+                log.error("Error fetching data: %s", e)
                 self.error_signal.emit()
+            self.wake.wait(BALANCE_POLL_MS / 1000)
 
     def stop(self):
         self.running = False
+        self.wake.set()
 
 
 class KrakenTerminal(QMainWindow):
-    def __init__(self):
+    brackets_changed = pyqtSignal()
+    executions_changed = pyqtSignal()
+    alerts_changed = pyqtSignal()
+    alert_fired = pyqtSignal(object)
+
+    def __init__(self, paper=PAPER_TRADING):
         super().__init__()
+        self.paper = paper
         self.light_theme = {
             'background': 'white',
             'text': 'black',
@@ -486,30 +453,50 @@ class KrakenTerminal(QMainWindow):
             'window': '#1e1e1e'
         }
         self.is_dark_mode = False
-        self.exchange = ccxt.krakenfutures({
-            'apiKey': KRAKEN_API_KEY,
-            'secret': KRAKEN_API_SECRET,
-            'enableRateLimit': True,
-            'options': {
-                'defaultType': 'future'
-            }
-        })
+        self.exchange = create_exchange()
+        if paper:
+            self.exchange = PaperExchange(self.exchange, float(PAPER_BALANCE))
+        self.order_journal = OrderJournal(ORDER_JOURNAL_PATH or None) if ORDER_JOURNAL_ENABLED else None
+        self.order_manager = OrderManager(self.exchange, self.order_journal)
+        self.triggers = TriggerEngine(self.order_manager, int(BRACKET_BACKUP_OFFSET_TICKS), int(TRIGGER_EVAL_BUDGET_US))
+        self.triggers.on_change = self.brackets_changed.emit
+        self.brackets_changed.connect(lambda: self.update_position_display(getattr(self, 'current_position', None)))
+        self.executions = ExecutionScheduler(self.order_manager, float(EXECUTION_SLICE_SECONDS),
+                                             float(EXECUTION_PARTICIPATION), float(EXECUTION_DEPTH_FRACTION),
+                                             int(EXECUTION_DEPTH_LEVELS), int(EXECUTION_REPRICE_TICKS),
+                                             float(EXECUTION_RATE_RESERVE), paper)
+        self.executions.on_change = self.executions_changed.emit
+        self.alerts = AlertEngine(self.order_manager, lambda: self.is_armed, float(ALERT_REPEAT_COOLDOWN_S))
+        self.alerts.on_change = self.alerts_changed.emit
+        self.alerts.on_fire = self.alert_fired.emit
+        self.alert_fired.connect(self.notify_alert)
+        self.tray_icon = None
+        self.microstructure = Microstructure(int(SIGNAL_DEPTH_LEVELS), float(SIGNAL_FLOW_WINDOW_S))
+        self.ticket = OrderTicket()
+        self.control_server = None
         self.last_price_label = QLabel()
         self.bid_label = QLabel()
         self.ask_label = QLabel()
         self.mid_label = QLabel()
         self.spread_label = QLabel()
+        self.signals_label = QLabel()
         self.index_price_label = QLabel()
         self.position_label = QLabel()
         self.order_type = None
         self.tick_size = None
+        self.instrument = None
+        self.bid_ticks = None
+        self.ask_ticks = None
         self.selected_price = None
         self.previous_last_price = None
         self.data_thread = None
         self.ws_thread = None
+        self.shared_book = None
+        self.history = None
+        self.book_journal = None
         self.current_price = None
         self.first_symbol = True
-        self.orderbook = {'bids': {}, 'asks': {}}
+        self.orderbook = None
         self.recent_trades = deque(maxlen=1000)
         self.one_minute_volume = 0
         self.one_minute_volume_usd = 0
@@ -533,16 +520,93 @@ class KrakenTerminal(QMainWindow):
         self.trades_button.setFixedSize(30, 30)
         self.trades_button.setFont(QFont(GUI_FONT, 14))
         self.trades_button.clicked.connect(self.toggle_trades_window)
+        self.ladder = PriceLadder()
+        self.ladder.price_clicked.connect(self.place_ladder_order)
+        self.ladder.cancel_clicked.connect(self.cancel_orders_at_price)
+        self.ladder_button = QPushButton('🪜')
+        self.ladder_button.setFixedSize(30, 30)
+        self.ladder_button.setFont(QFont(GUI_FONT, 14))
+        self.ladder_button.clicked.connect(self.toggle_ladder)
+        self.chart_window = ChartWindow()
+        self.chart_button = QPushButton('🕯️')
+        self.chart_button.setFixedSize(30, 30)
+        self.chart_button.setFont(QFont(GUI_FONT, 14))
+        self.chart_button.clicked.connect(self.toggle_chart_window)
+        self.watchlist = WatchlistWindow()
+        self.watchlist.symbol_clicked.connect(self.switch_symbol)
+        self.watchlist.start(QUICK_SWAP_TICKERS, self.alerts)
+        self.watchlist_button = QPushButton('👁')
+        self.watchlist_button.setFixedSize(30, 30)
+        self.watchlist_button.setFont(QFont(GUI_FONT, 14))
+        self.watchlist_button.clicked.connect(self.toggle_watchlist)
+        self.portfolio_window = PortfolioWindow()
+        self.portfolio_button = QPushButton('💼')
+        self.portfolio_button.setFixedSize(30, 30)
+        self.portfolio_button.setFont(QFont(GUI_FONT, 14))
+        self.portfolio_button.clicked.connect(self.toggle_portfolio_window)
+        self.execution_window = ExecutionWindow()
+        self.execution_window.set_scheduler(self.executions)
+        self.execution_window.start_requested.connect(self.start_execution)
+        self.execution_window.parent_cancelled.connect(self.executions.cancel)
+        self.execution_window.clear_requested.connect(self.executions.clear_finished)
+        self.executions_changed.connect(self.execution_window.mark_dirty)
+        self.execution_button = QPushButton('⏱')
+        self.execution_button.setFixedSize(30, 30)
+        self.execution_button.setFont(QFont(GUI_FONT, 14))
+        self.execution_button.clicked.connect(self.toggle_execution_window)
+        self.alerts_window = AlertsWindow()
+        self.alerts_window.set_alerts(self.alerts)
+        self.alerts_window.alert_requested.connect(self.add_alert)
+        self.alerts_window.alert_removed.connect(self.alerts.remove)
+        self.alerts_changed.connect(self.alerts_window.mark_dirty)
+        self.alerts_button = QPushButton('🔔')
+        self.alerts_button.setFixedSize(30, 30)
+        self.alerts_button.setFont(QFont(GUI_FONT, 14))
+        self.alerts_button.clicked.connect(self.toggle_alerts_window)
+        self.diagnostics = Diagnostics(lambda: self.ws_thread.engine if self.ws_thread else None,
+                                       DIAGNOSTICS_DIR or None, float(PROFILE_SAMPLE_MS), int(MEMORY_SNAPSHOT_SECONDS))
+        self.diagnostics_button = QPushButton('🩺')
+        self.diagnostics_button.setFixedSize(30, 30)
+        self.diagnostics_button.setFont(QFont(GUI_FONT, 14))
+        self.diagnostics_menu = QMenu(self)
+        self.sample_profile_action = self.diagnostics_menu.addAction('Sampling profile')
+        self.sample_profile_action.setCheckable(True)
+        self.sample_profile_action.triggered.connect(lambda: self.toggle_profile('sample'))
+        self.cprofile_action = self.diagnostics_menu.addAction('cProfile')
+        self.cprofile_action.setCheckable(True)
+        self.cprofile_action.triggered.connect(lambda: self.toggle_profile('cprofile'))
+        self.memory_trace_action = self.diagnostics_menu.addAction('Memory trace')
+        self.memory_trace_action.setCheckable(True)
+        self.memory_trace_action.triggered.connect(self.toggle_memory_trace)
+        self.diagnostics_button.setMenu(self.diagnostics_menu)
         self.last_price_label.setText('Last: waiting for data')
         self.volume_label.setText('1m vol: waiting for data')
         self.init_ui()
+        if CONTROL_API_ENABLED:
+            self.start_control_server()
 
 
     def mousePressEvent(self, event):
         self.setFocus()
 
+    def start_control_server(self):
+        try:
+            self.control_server = ControlServer(
+                self.order_manager,
+                lambda: self.ws_thread.engine if self.ws_thread else None,
+                lambda: self.is_armed,
+                CONTROL_API_ADDRESS or None,
+                self.triggers,
+                self.executions,
+                self.alerts,
+                self.microstructure)
+            self.control_server.start()
+        except Exception as e:
+            log.error("Error starting control API: %s", e)
+            self.control_server = None
+
     def init_ui(self):
-        self.setWindowTitle('KrakenFutures Terminal')
+        self.setWindowTitle('KrakenFutures Terminal [PAPER]' if self.paper else 'KrakenFutures Terminal')
         self.setGeometry(100, 100, 600, 100)
 
         central_widget = QWidget()
@@ -564,7 +628,7 @@ class KrakenTerminal(QMainWindow):
             self.quick_swap_buttons.append(button)
             quick_swap_layout.addWidget(button)
 
-        for i, ticker in enumerate(QUICK_SWAP_TICKERS):
+        for i, ticker in enumerate(QUICK_SWAP_TICKERS[:len(self.quick_swap_buttons)]):
             self.quick_swap_buttons[i].setText(ticker)
         self.main_layout.addLayout(quick_swap_layout)
 
@@ -603,10 +667,16 @@ class KrakenTerminal(QMainWindow):
 
         self.best_price_button = QPushButton("Best", font=default_font)
         self.mid_price_button = QPushButton("Mid", font=default_font)
+        self.micro_price_button = QPushButton("Micro", font=default_font)
+        self.depth_price_button = QPushButton("Depth", font=default_font)
         self.market_price_button = QPushButton("Market", font=default_font)
         self.price_button = QPushButton("Price", font=default_font)
+        self.price_mode_buttons = [self.best_price_button, self.mid_price_button, self.micro_price_button,
+                                   self.depth_price_button, self.market_price_button, self.price_button]
         self.best_price_button.clicked.connect(self.set_best_price)
         self.mid_price_button.clicked.connect(self.set_mid_price)
+        self.micro_price_button.clicked.connect(self.set_micro_price)
+        self.depth_price_button.clicked.connect(self.set_depth_price)
         self.market_price_button.clicked.connect(self.set_market_price)
         self.price_button.clicked.connect(self.set_price_input)
 
@@ -637,6 +707,8 @@ class KrakenTerminal(QMainWindow):
         price_layout = QHBoxLayout()
         price_layout.addWidget(self.best_price_button)
         price_layout.addWidget(self.mid_price_button)
+        price_layout.addWidget(self.micro_price_button)
+        price_layout.addWidget(self.depth_price_button)
         price_layout.addWidget(self.market_price_button)
         price_layout.addWidget(self.price_button)
         order_layout.addLayout(price_layout)
@@ -661,6 +733,7 @@ class KrakenTerminal(QMainWindow):
         self.volume_input = QLineEdit(font=QFont(GUI_FONT, GUI_FONT_SIZE))
         self.volume_input.setMinimumWidth(300)
         self.volume_input.textChanged.connect(self.update_usd_value)
+        self.volume_input.textChanged.connect(self.update_ticket_size)
         self.volume_input.editingFinished.connect(self.enforce_min_size_multiple)
         self.volume_input.editingFinished.connect(self.validate_volume_input)
         self.price_input.editingFinished.connect(self.validate_price_input)
@@ -713,11 +786,20 @@ class KrakenTerminal(QMainWindow):
         self.pos_button.hide()
 
         quantity_layout.addWidget(self.pos_button)
+
+        self.bracket_button = QPushButton('SL/TP', font=default_font)
+        self.bracket_button.clicked.connect(self.open_bracket_dialog)
+        self.bracket_button.hide()
+        quantity_layout.addWidget(self.bracket_button)
+
+        self.scale_button = QPushButton('Scale', font=default_font)
+        self.scale_button.clicked.connect(self.open_scaled_order_dialog)
+        quantity_layout.addWidget(self.scale_button)
         order_layout.addWidget(quantity_container)
         order_layout.addLayout(quantity_layout)
 
         self.place_order_button = QPushButton('Place Order', font=default_font)
-        self.place_order_button.clicked.connect(self.place_order)
+        self.place_order_button.clicked.connect(lambda: self.place_order(time.perf_counter_ns()))
         order_layout.addWidget(self.place_order_button)
         hidden_layout.addLayout(order_layout)
 
@@ -744,6 +826,8 @@ class KrakenTerminal(QMainWindow):
             data_layout.addWidget(label)
         self.volume_label.setFont(QFont(GUI_FONT, GUI_FONT_SIZE))
         data_layout.addWidget(self.volume_label)
+        self.signals_label.setFont(QFont(GUI_FONT, max(GUI_FONT_SIZE - 8, 8)))
+        data_layout.addWidget(self.signals_label)
 
         data_order_separator = QFrame()
         data_order_separator.setFrameShape(QFrame.HLine)
@@ -780,10 +864,17 @@ class KrakenTerminal(QMainWindow):
         self.settings_button.clicked.connect(self.open_settings)
         bottom_layout.addWidget(self.settings_button)
         bottom_layout.addWidget(self.trades_button)
+        bottom_layout.addWidget(self.ladder_button)
+        bottom_layout.addWidget(self.chart_button)
+        bottom_layout.addWidget(self.watchlist_button)
+        bottom_layout.addWidget(self.portfolio_button)
+        bottom_layout.addWidget(self.execution_button)
+        bottom_layout.addWidget(self.alerts_button)
+        bottom_layout.addWidget(self.diagnostics_button)
 
         self.place_order_shortcut = QShortcut(QKeySequence(PLACE_ORDER_HOTKEY), self)
         self.place_order_shortcut.activated.connect(
-            lambda: self.place_order() if self.ws_thread and self.is_armed else None)
+            lambda: self.place_order(time.perf_counter_ns()) if self.ws_thread and self.is_armed else None)
 
         self.close_orders_shortcut = QShortcut(QKeySequence(CLOSE_ORDERS_HOTKEY), self)
         self.close_orders_shortcut.activated.connect(
@@ -817,6 +908,20 @@ class KrakenTerminal(QMainWindow):
         self.price_input_shortcut.activated.connect(
             lambda: self.set_price_input() if self.ws_thread and self.order_type else None)
 
+        self.micro_price_shortcut = QShortcut(QKeySequence(MICRO_PRICE_HOTKEY), self)
+        self.micro_price_shortcut.activated.connect(
+            lambda: self.set_micro_price() if self.ws_thread and self.order_type else None)
+
+        self.depth_price_shortcut = QShortcut(QKeySequence(DEPTH_PRICE_HOTKEY), self)
+        self.depth_price_shortcut.activated.connect(
+            lambda: self.set_depth_price() if self.ws_thread and self.order_type else None)
+
+        self.profile_shortcut = QShortcut(QKeySequence(PROFILE_HOTKEY), self)
+        self.profile_shortcut.activated.connect(lambda: self.toggle_profile('sample'))
+
+        self.memory_trace_shortcut = QShortcut(QKeySequence(MEMORY_TRACE_HOTKEY), self)
+        self.memory_trace_shortcut.activated.connect(self.toggle_memory_trace)
+
         self.arm_button = QPushButton('ARM')
         self.arm_button.setFixedSize(120, 30)
         self.arm_button.setFont(QFont(GUI_FONT, 14))
@@ -846,11 +951,10 @@ class KrakenTerminal(QMainWindow):
         try:
             if hasattr(self, 'current_position') and self.current_position:
                 quantity = abs(float(self.current_position['contracts']))
-                partial_quantity = quantity * percentage
-                adjusted_quantity = round(partial_quantity / self.min_order_size) * self.min_order_size
-                self.volume_input.setText(str(adjusted_quantity))
+                units = self.instrument.size_to_units(quantity * percentage)
+                self.volume_input.setText(self.instrument.format_units(units))
         except Exception as e:
-            print(f"Error setting position percentage: {str(e)}")
+            log.error("Error setting position percentage: %s", e)
 
     def validate_volume_input(self):
         try:
@@ -869,54 +973,155 @@ class KrakenTerminal(QMainWindow):
             self.price_input.setText('')
 
     def close_last_order(self):
-        print('Attempting to close last order.')
-
         try:
             orders = list(self.ws_thread.open_orders.values())
             if orders:
                 last_order = orders[-1]
-                self.exchange.cancel_order(last_order['id'], get_full_symbol(self.pair_input.text()))
-                print(f"Last order {last_order['id']} has been closed.")
+                self.order_manager.cancel_order(last_order.id, get_full_symbol(self.pair_input.text()))
+                order_log.info("Last order closed", extra={'fields': {'order_id': last_order.id}})
         except Exception as e:
-            print(f"Error closing last order: {str(e)}")
+            order_log.error("Error closing last order: %s", e)
     def toggle_trades_window(self):
         if self.trades_window.isVisible():
             self.trades_window.hide()
         else:
             self.trades_window.show()
 
+    def toggle_ladder(self):
+        if self.ladder.isVisible():
+            self.ladder.hide()
+        else:
+            self.ladder.show()
+
+    def toggle_chart_window(self):
+        if self.chart_window.isVisible():
+            self.chart_window.hide()
+        else:
+            self.chart_window.show()
+
+    def toggle_watchlist(self):
+        if self.watchlist.isVisible():
+            self.watchlist.hide()
+        else:
+            self.watchlist.show()
+
+    def toggle_portfolio_window(self):
+        if self.portfolio_window.isVisible():
+            self.portfolio_window.hide()
+        else:
+            self.portfolio_window.show()
+
+    def toggle_execution_window(self):
+        if self.execution_window.isVisible():
+            self.execution_window.hide()
+        else:
+            self.execution_window.show()
+
+    def toggle_alerts_window(self):
+        if self.alerts_window.isVisible():
+            self.alerts_window.hide()
+        else:
+            self.alerts_window.set_symbol(self.pair_input.text())
+            self.alerts_window.show()
+
+    def add_alert(self, symbol, metric, condition, level, action, repeat):
+        try:
+            alert = self.alerts.add(symbol, metric, condition, level, action, repeat)
+            self.alerts_window.show_status(f"Armed #{alert.id}")
+        except ValueError as e:
+            self.alerts_window.show_status(str(e))
+
+    def notify_alert(self, alert):
+        text = alert.text()
+        if alert.action:
+            text += f" → {alert.action}" + ('' if self.is_armed else ' (skipped: not armed)')
+        if ALERT_SOUND:
+            QApplication.beep()
+        if ALERT_DESKTOP_NOTIFY and QSystemTrayIcon.isSystemTrayAvailable():
+            if self.tray_icon is None:
+                self.tray_icon = QSystemTrayIcon(self.style().standardIcon(QStyle.SP_MessageBoxInformation), self)
+                self.tray_icon.show()
+            self.tray_icon.showMessage('Alert', text, QSystemTrayIcon.Information, 5000)
+        self.alerts_window.show_status(f"Fired: {text}")
+
+    def toggle_profile(self, mode):
+        try:
+            if self.diagnostics.profiling:
+                log.info("Profile written to %s", self.diagnostics.stop_profile())
+            else:
+                self.diagnostics.start_profile(mode)
+                log.info("Started %s profile", mode)
+        except Exception as e:
+            log.error("Error toggling profiler: %s", e)
+        self.update_diagnostics_button()
+
+    def toggle_memory_trace(self):
+        try:
+            if self.diagnostics.tracing:
+                log.info("Memory trace written to %s", self.diagnostics.stop_memory_trace())
+            else:
+                self.diagnostics.start_memory_trace()
+                log.info("Started memory trace")
+        except Exception as e:
+            log.error("Error toggling memory trace: %s", e)
+        self.update_diagnostics_button()
+
+    def update_diagnostics_button(self):
+        mode = self.diagnostics.profile_mode
+        self.sample_profile_action.setChecked(mode == 'sample')
+        self.cprofile_action.setChecked(mode == 'cprofile')
+        self.memory_trace_action.setChecked(self.diagnostics.tracing)
+        active = self.diagnostics.profiling or self.diagnostics.tracing
+        self.diagnostics_button.setStyleSheet('background-color: orange' if active else '')
+
+    def switch_symbol(self, pair):
+        self.pair_input.setText(pair)
+        self.on_confirm()
+
+    def place_ladder_order(self, ticks, side):
+        if not self.ws_thread:
+            return
+        self.set_order_type(side)
+        if self.ticket.mode != 'input':
+            self.set_price_input()
+        self.price_input.setText(self.instrument.format_ticks(ticks))
+        if self.is_armed:
+            self.place_order()
+
+    def cancel_orders_at_price(self, ticks):
+        if not self.ws_thread:
+            return
+        for order in list(self.ws_thread.open_orders.values()):
+            if self.instrument.price_to_ticks(order.limit_price) == ticks:
+                self.cancel_specific_order(order.id)
+
     def adjust_price_by_ticks(self, num_ticks):
         if not self.order_type or not self.price_input.text():
             return
 
-        current_price = float(self.price_input.text())
-        adjustment = self.tick_size * num_ticks
+        current_ticks = self.instrument.price_to_ticks(self.price_input.text())
 
         if self.order_type == 'sell':
-            new_price = current_price + adjustment
+            new_ticks = current_ticks + num_ticks
         else:
-            new_price = current_price - adjustment
+            new_ticks = current_ticks - num_ticks
 
-        formatted_price = format_price(round_to_tick(new_price, self.tick_size))
-        self.price_input.setText(formatted_price)
+        self.price_input.setText(self.instrument.format_ticks(new_ticks))
 
     def adjust_quantity(self, multiplier):
         try:
-            current_qty = float(self.volume_input.text() or 0)
-            increment = self.min_order_size * multiplier
-            new_qty = current_qty + increment
-            self.volume_input.setText(str(new_qty))
+            current_units = self.instrument.size_to_units(self.volume_input.text() or 0)
+            self.volume_input.setText(self.instrument.format_units(current_units + multiplier))
 
         except ValueError:
-            self.volume_input.setText(str(self.min_order_size * multiplier))
+            self.volume_input.setText(self.instrument.format_units(multiplier))
 
     def cancel_specific_order(self, order_id):
-        print(f"Attempting to cancel order: {order_id}")
         try:
-            self.exchange.cancel_order(order_id, get_full_symbol(self.pair_input.text()))
-            print(f"Order {order_id} cancelled successfully")
+            self.order_manager.cancel_order(order_id, get_full_symbol(self.pair_input.text()))
+            order_log.info("Order cancelled", extra={'fields': {'order_id': order_id}})
         except Exception as e:
-            print(f"Error cancelling order: {str(e)}")
+            order_log.error("Error cancelling order: %s", e)
 
     def quick_swap_clicked(self, button_index):
         if self.quick_swap_buttons[button_index].text():
@@ -925,9 +1130,8 @@ class KrakenTerminal(QMainWindow):
 
     def enforce_min_size_multiple(self):
         try:
-            current_qty = float(self.volume_input.text() or 0)
-            closest_multiple = round(current_qty / self.min_order_size) * self.min_order_size
-            self.volume_input.setText(str(closest_multiple))
+            units = self.instrument.size_to_units(self.volume_input.text() or 0)
+            self.volume_input.setText(self.instrument.format_units(units))
         except ValueError:
             pass
 
@@ -977,6 +1181,9 @@ class KrakenTerminal(QMainWindow):
         """)
 
         self.theme_button.setText('☀️' if self.is_dark_mode else '🌙')
+        self.ladder.set_dark_mode(self.is_dark_mode)
+        self.chart_window.set_dark_mode(self.is_dark_mode)
+        self.watchlist.set_dark_mode(self.is_dark_mode)
 
     def update_connection_status(self, is_connected):
         color = "green" if is_connected else "red"
@@ -984,6 +1191,12 @@ class KrakenTerminal(QMainWindow):
             f"background-color: {color}; border-radius: 10px;"
         )
 
+    def update_feed_health(self, health):
+        color = {'live': 'green', 'stale': 'orange'}.get(health.state, 'red')
+        self.connection_status_label.setStyleSheet(f"background-color: {color}; border-radius: 10px;")
+        self.connection_status_label.setToolTip(
+            f"Feed {health.state}: last message {health.age_ms} ms ago, {health.failovers} failovers")
+
     def open_settings(self):
         dialog = SettingsDialog(self)
         if dialog.exec_():
@@ -991,8 +1204,9 @@ class KrakenTerminal(QMainWindow):
             import settings
             reload(settings)
 
-            for i, ticker in enumerate(settings.QUICK_SWAP_TICKERS):
+            for i, ticker in enumerate(settings.QUICK_SWAP_TICKERS[:len(self.quick_swap_buttons)]):
                 self.quick_swap_buttons[i].setText(ticker)
+            self.watchlist.start(settings.QUICK_SWAP_TICKERS, self.alerts)
 
             if self.ws_thread:
                 self.ws_thread.book_throttle = settings.BOOK_UPDATE_THROTTLE
@@ -1012,14 +1226,30 @@ class KrakenTerminal(QMainWindow):
                     self.data_thread.stop()
                     self.data_thread.wait()
                 if self.ws_thread:
+                    if self.paper:
+                        self.exchange.detach(self.ws_thread.engine)
+                        self.executions.detach(self.ws_thread.engine)
+                    self.alerts.detach(self.ws_thread.engine)
+                    self.microstructure.detach(self.ws_thread.engine)
+                    self.triggers.detach(self.ws_thread.engine)
                     self.ws_thread.stop()
                     self.ws_thread.wait()
+                if self.shared_book:
+                    self.shared_book.close()
+                    self.shared_book = None
+                if self.history:
+                    self.history.close()
+                    self.history = None
+                if self.book_journal:
+                    self.book_journal.close()
+                    self.book_journal = None
 
                 self.last_price_label.setText('Last: waiting...')
                 self.bid_label.setText('')
                 self.ask_label.setText('')
                 self.mid_label.setText('')
                 self.spread_label.setText('')
+                self.signals_label.setText('')
                 self.index_price_label.setText('')
                 self.volume_label.setText('1m vol: waiting...')
                 self.position_label.hide()
@@ -1028,30 +1258,29 @@ class KrakenTerminal(QMainWindow):
                 self.one_minute_volume = 0
                 self.one_minute_volume_usd = 0
                 self.current_price = None
+                self.bid_ticks = None
+                self.ask_ticks = None
                 self.previous_last_price = None
                 self.order_type = None
                 self.selected_price = None
                 self.buy_button.setStyleSheet('')
                 self.sell_button.setStyleSheet('')
-                self.best_price_button.setStyleSheet('')
-                self.mid_price_button.setStyleSheet('')
-                self.market_price_button.setStyleSheet('')
-                self.price_button.setStyleSheet('')
+                self.highlight_price_button(None)
                 self.price_input.hide()
                 self.price_input_container.hide()
                 self.volume_input.clear()
                 self.update_usd_value()
 
-                self.exchange.load_markets()
-                market = self.exchange.market(symbol)
-                self.margin_requirement = float(market['info']['marginLevels'][0]['initialMargin'])
+                self.instrument, self.margin_requirement = load_instrument(self.exchange, symbol)
                 self.get_tick_size()
+                self.ticket = OrderTicket(symbol, self.instrument)
 
                 self.data_thread = DataFetchThread(self.exchange, symbol)
                 self.data_thread.data_signal.connect(self.update_ui)
                 self.data_thread.error_signal.connect(lambda: self.update_connection_status(False))
                 self.data_thread.start()
                 self.trades_window.clear()
+                self.chart_window.load_history(self.exchange, symbol)
                 self.recent_trades = []
 
                 position = get_user_position(self.exchange, symbol)
@@ -1061,69 +1290,76 @@ class KrakenTerminal(QMainWindow):
                     'open_orders': open_orders
                 })
 
-                self.ws_thread = WebSocketThread(symbol)
-                self.ws_thread.trade_signal.connect(self.update_recent_trades)
-                self.ws_thread.last_price_signal.connect(self.update_last_price)
-                self.ws_thread.book_signal.connect(self.update_ticker)
+                self.ws_thread = WebSocketThread(symbol, self.instrument)
+                self.ws_thread.trades_signal.connect(self.on_trades)
+                self.ws_thread.book_signal.connect(self.on_quote)
                 self.ws_thread.orders_signal.connect(self.orders_display.update_orders)
+                self.ws_thread.orders_signal.connect(self.ladder.update_orders)
                 self.ws_thread.index_signal.connect(self.update_index_price)
                 self.ws_thread.error_signal.connect(lambda: self.update_connection_status(False))
+                self.ws_thread.health_signal.connect(self.update_feed_health)
                 self.ws_thread.position_signal.connect(self.update_position_display)
+                self.ladder.set_book(self.ws_thread.orderbook, self.instrument)
+                self.portfolio_window.set_portfolio(self.ws_thread.portfolio)
+                if self.paper:
+                    self.exchange.attach(self.ws_thread.engine, self.margin_requirement)
+                    # Paper fills only reach the engine the paper exchange is attached to
+                    self.executions.attach(self.ws_thread.engine)
+                self.triggers.attach(self.ws_thread.engine)
+                self.alerts.attach(self.ws_thread.engine)
+                self.microstructure.attach(self.ws_thread.engine)
+                if SHARED_BOOK_ENABLED:
+                    self.shared_book = SharedBookWriter(symbol, self.instrument, int(SHARED_BOOK_DEPTH),
+                                                        SHARED_BOOK_DIR or None)
+                    self.shared_book.attach(self.ws_thread.engine)
+                if HISTORY_ENABLED:
+                    self.history = HistoryWriter(symbol, self.instrument, HISTORY_DIR or None, int(HISTORY_FLUSH_MS))
+                    self.history.attach(self.ws_thread.engine)
+                if BOOK_JOURNAL_ENABLED:
+                    self.book_journal = BookJournalWriter(symbol, self.instrument, BOOK_JOURNAL_DIR or None,
+                                                          int(BOOK_JOURNAL_SNAPSHOT_EVERY))
+                    self.book_journal.attach(self.ws_thread.engine)
                 self.ws_thread.start()
 
                 self.hidden_content.show()
-                self.update_connection_status(True)
-                print(f"Data thread and WebSocket thread started for symbol: {symbol}")
+                # Turns green once the feed watchdog sees the new connection live
+                self.update_connection_status(False)
+                log.info("Data thread and WebSocket thread started for %s", symbol)
 
                 if symbol:
                     if self.first_symbol:
                         self.setGeometry(100, 100, 800, 600)
                         self.first_symbol = False
 
-        except Exception as e:
-            print(f"Error in on_confirm: {str(e)}")
-            print(traceback.format_exc())
+        except Exception:
+            log.exception("Error in on_confirm")
 
     def get_tick_size(self):
         try:
-            symbol = get_full_symbol(self.pair_input.text())
-            market = self.exchange.market(symbol)
-            self.tick_size = market['precision']['price']
-            self.min_order_size = market['precision']['amount']
+            symbol = self.instrument.symbol
+            self.tick_size = self.instrument.tick_size
+            self.min_order_size = self.instrument.size_step
             self.volume_input.setPlaceholderText(f"Min size: {self.min_order_size}")
-            print(f"Tick size for {symbol}: {self.tick_size}")
-            print(f"Minimum order size: {self.min_order_size}")
-        except Exception as e:
-            print(f"Error getting tick size: {str(e)}")
-            print(traceback.format_exc())
+            log.info("Instrument loaded", extra={'fields': {
+                'symbol': symbol, 'tick_size': self.tick_size, 'min_order_size': self.min_order_size}})
+        except Exception:
+            log.exception("Error getting tick size")
 
     def calculate_impact_price(self, size, side):
         """Calculate average execution price for market order of given size"""
-        total_cost = 0
-        remaining_size = size
-        book_side = 'bids' if side == 'sell' else 'asks'
-        prices = sorted(self.orderbook[book_side].keys(), reverse=(book_side == 'bids'))
-
-        for price in prices:
-            level_size = self.orderbook[book_side][price]
-            executed = min(remaining_size, level_size)
-            total_cost += executed * price
-            remaining_size -= executed
-
-            if remaining_size <= 0:
-                break
-
-        return total_cost / size
+        if not self.orderbook:
+            return 0
+        return self.orderbook.impact_price(size, side)
 
     def update_ui(self, data):
         try:
             available_margin = data['available_margin']
             total_balance = data['total_balance']
             self.balance_label.setText(f'Margin: ${available_margin:.2f} | Balance: ${total_balance:.2f}')
-            self.update_connection_status(True)
+            self.portfolio_window.set_balance(total_balance)
             self.update_usd_value()
         except Exception as e:
-            print(f"Error in update_ui: {str(e)}")
+            log.error("Error in update_ui: %s", e)
 
 
     def update_position_display(self, data):
@@ -1136,8 +1372,11 @@ class KrakenTerminal(QMainWindow):
             self.pos_20_button.hide()
             self.pos_33_button.hide()
             self.pos_50_button.hide()
+            self.bracket_button.hide()
             return
         try:
+            if self.ws_thread:
+                self.triggers.sync_position(self.ws_thread.symbol, data.get('contracts') if data else 0)
             if data and 'entryPrice' in data:
                 entry_price = float(data['entryPrice'])
                 quantity = abs(float(data['contracts']))
@@ -1174,6 +1413,10 @@ class KrakenTerminal(QMainWindow):
                     f"BEST <font color='{best_color}'>${abs(best_pnl):.2f} ({best_percentage:.2f}%)</font> | "
                     f"MARKET <font color='{impact_color}'>${abs(impact_pnl):.2f} ({impact_percentage:.2f}%)</font>"
                 )
+                for bracket in self.triggers.brackets_for(self.ws_thread.symbol if self.ws_thread else None):
+                    levels = [f"{label} {format_price(price)}" for label, price in
+                              (('SL', bracket.stop), ('TP', bracket.take_profit)) if price is not None]
+                    position_text += f"<br>{' / '.join(levels)}{' + exchange stop' if bracket.backup else ''}"
 
                 self.position_label.setText(position_text)
                 self.position_label.show()
@@ -1182,6 +1425,7 @@ class KrakenTerminal(QMainWindow):
                 self.pos_20_button.show()
                 self.pos_33_button.show()
                 self.pos_50_button.show()
+                self.bracket_button.show()
             else:
                 self.position_label.hide()
                 self.separator.hide()
@@ -1189,46 +1433,98 @@ class KrakenTerminal(QMainWindow):
                 self.pos_20_button.hide()
                 self.pos_33_button.hide()
                 self.pos_50_button.hide()
+                self.bracket_button.hide()
 
         except Exception as e:
-            print(f"Error in update_position_display: {str(e)}")
+            log.error("Error in update_position_display: %s", e)
 
-    def format_volume_usd(self, volume_usd):
-        if volume_usd >= 1000000:
-            return f"${volume_usd / 1000000:.2f}M"
-        elif volume_usd >= 1000:
-            return f"${volume_usd / 1000:.2f}K"
-        return f"${volume_usd:.2f}"
-
-    def update_recent_trades(self, trade):
+    def open_bracket_dialog(self):
+        position = getattr(self, 'current_position', None)
+        if not self.ws_thread or not position or 'entryPrice' not in position:
+            return
+        symbol = self.ws_thread.symbol
+        position_side = position['info']['side'].lower()
+        dialog = BracketDialog(position_side, self.triggers.brackets_for(symbol), self)
+        if not dialog.exec_():
+            return
+        try:
+            if dialog.cancel_existing:
+                for bracket in self.triggers.brackets_for(symbol):
+                    self.triggers.cancel_bracket(bracket.id)
+                return
+            stop, take_profit = dialog.prices()
+            self.triggers.add_bracket(symbol, position_side, abs(float(position['contracts'])), stop, take_profit,
+                                      BRACKET_TRIGGER_SOURCE, dialog.backup_checkbox.isChecked())
+        except ValueError as e:
+            order_log.warning("Bracket not armed: %s", e)
+            self.bracket_button.setToolTip(str(e))
+
+    def open_scaled_order_dialog(self):
+        ticket = self.ticket
+        if not self.ws_thread or not self.is_armed:
+            self.scale_button.setToolTip('Arm the terminal first')
+            return
+        if ticket.side not in ('buy', 'sell') or ticket.units <= 0:
+            self.scale_button.setToolTip('Select Buy/Sell and a size first')
+            return
+        ScaledOrderDialog(ticket.symbol, self.instrument, ticket.side, ticket.units,
+                          lambda rungs: self.send_scaled_order(ticket.symbol, ticket.side, rungs), self).exec_()
+
+    def send_scaled_order(self, symbol, side, rungs):
+        if not self.is_armed:
+            raise PermissionError('Terminal is not armed')
+        instrument = self.instrument
+        statuses, latency_ns = self.order_manager.place_batch(
+            symbol, [(side, instrument.units_to_size(units), instrument.ticks_to_price(ticks)) for ticks, units in rungs])
+        order_log.info("Scaled order sent", extra={'fields': {
+            'symbol': symbol, 'side': side, 'orders': len(statuses),
+            'placed': sum(status['status'] == 'placed' for status in statuses), 'latency_us': latency_ns // 1000}})
+        return statuses, latency_ns
+
+    def on_trades(self):
+        trades = self.ws_thread.take_trades() if self.ws_thread else None
+        if trades:
+            self.update_recent_trades(trades)
+            self.chart_window.add_trades(trades)
+            self.update_last_price(trades[-1].price)
+
+    def on_quote(self):
+        quote = self.ws_thread.take_quote() if self.ws_thread else None
+        if quote:
+            self.update_ticker(quote)
+
+    def update_recent_trades(self, trades):
         current_time = time.time()
-        if trade['amount'] > 0 and trade['price'] > 0:
-            self.recent_trades.append((current_time, trade))
-
+        added = False
+        for trade in trades:
+            if trade.amount > 0 and trade.price > 0:
+                self.recent_trades.append((current_time, trade))
+                added = True
+        if added:
             one_minute_ago = current_time - 60
             valid_trades = [(t, trade) for t, trade in self.recent_trades if t > one_minute_ago]
 
-            volume = sum(trade['amount'] for _, trade in valid_trades)
-            volume_usd = sum(trade['amount'] * trade['price'] for _, trade in valid_trades)
-            buy_volume = sum(trade['amount'] for _, trade in valid_trades if trade['side'] == 'buy')
-            sell_volume = sum(trade['amount'] for _, trade in valid_trades if trade['side'] == 'sell')
+            volume = sum(trade.amount for _, trade in valid_trades)
+            volume_usd = sum(trade.amount * trade.price for _, trade in valid_trades)
+            buy_volume = sum(trade.amount for _, trade in valid_trades if trade.side == 'buy')
+            sell_volume = sum(trade.amount for _, trade in valid_trades if trade.side == 'sell')
 
             buy_percentage = (buy_volume / volume * 100) if volume > 0 else 0
             sell_percentage = (sell_volume / volume * 100) if volume > 0 else 0
 
             volume_display = f"{volume / 1000000:.2f}M" if volume >= 1000000 else f"{volume:.4f}"
-            formatted_usd = self.format_volume_usd(volume_usd)
+            formatted_usd = format_volume_usd(volume_usd)
             self.volume_label.setText(
                 f"1M VOL: {volume_display} | {formatted_usd} (<font color='green'>{buy_percentage:.1f}%</font> / <font color='red'>{sell_percentage:.1f}%</font>)")
             trades_text = ""
             for _, trade in reversed(list(self.recent_trades)[-10:]):
-                timestamp = datetime.fromtimestamp(trade['time'] / 1000).strftime('%H:%M:%S')
-                color = '#00B300' if trade['side'] == 'buy' else 'red'
-                amount = trade['amount']
-                usd_value = amount * trade['price']
+                timestamp = datetime.fromtimestamp(trade.time / 1000).strftime('%H:%M:%S')
+                color = '#00B300' if trade.side == 'buy' else 'red'
+                amount = trade.amount
+                usd_value = amount * trade.price
                 if amount >= 1000000:
                     amount = f"{amount / 1000000:.2f}M"
-                trade_line = f"<font color='{color}'><b>{timestamp} | {format_price(trade['price']):<12} | {amount:<8} | ${usd_value:.2f}</b></font><br>"
+                trade_line = f"<font color='{color}'><b>{timestamp} | {format_price(trade.price):<12} | {amount:<8} | ${usd_value:.2f}</b></font><br>"
                 trades_text += trade_line
 
             self.trades_window.update_trades(trades_text)
@@ -1239,11 +1535,11 @@ class KrakenTerminal(QMainWindow):
 
         valid_trades = [(t, trade) for t, trade in self.recent_trades if t > one_minute_ago]
 
-        volume = sum(trade['amount'] for _, trade in valid_trades)
-        volume_usd = sum(trade['amount'] * trade['price'] for _, trade in valid_trades)
+        volume = sum(trade.amount for _, trade in valid_trades)
+        volume_usd = sum(trade.amount * trade.price for _, trade in valid_trades)
 
-        buy_volume = sum(trade['amount'] for _, trade in valid_trades if trade['side'] == 'buy')
-        sell_volume = sum(trade['amount'] for _, trade in valid_trades if trade['side'] == 'sell')
+        buy_volume = sum(trade.amount for _, trade in valid_trades if trade.side == 'buy')
+        sell_volume = sum(trade.amount for _, trade in valid_trades if trade.side == 'sell')
 
         buy_percentage = (buy_volume / volume * 100) if volume > 0 else 0
         sell_percentage = (sell_volume / volume * 100) if volume > 0 else 0
@@ -1266,9 +1562,9 @@ class KrakenTerminal(QMainWindow):
                     f'color: {self.dark_theme["text"] if self.is_dark_mode else self.light_theme["text"]}')
         self.previous_last_price = price
 
-    def update_ticker(self, data):
-        bid = data['bid']
-        ask = data['ask']
+    def update_ticker(self, quote):
+        bid = quote.bid
+        ask = quote.ask
         mid = (bid + ask) / 2
         spread = ask - bid
         spread_percentage = (spread / bid) * 100
@@ -1277,7 +1573,16 @@ class KrakenTerminal(QMainWindow):
         self.ask_label.setText(f'Ask: {format_price(ask)}')
         self.mid_label.setText(f'Mid: {format_price(mid)}')
         self.spread_label.setText(f'Spread: {format_price(spread)} ({spread_percentage:.2f}%)')
+        self.bid_ticks = quote.bid_ticks
+        self.ask_ticks = quote.ask_ticks
         self.orderbook = self.ws_thread.orderbook
+        signals = self.microstructure.snapshot()
+        if signals:
+            self.signals_label.setText(format_signals(signals, self.instrument))
+            self.ticket.update(bid_ticks=quote.bid_ticks, ask_ticks=quote.ask_ticks,
+                               micro_ticks=signals.micro_ticks, depth_ticks=signals.depth_ticks)
+        else:
+            self.ticket.update(bid_ticks=quote.bid_ticks, ask_ticks=quote.ask_ticks, micro_ticks=None, depth_ticks=None)
 
         # Update UPNL with current symbol's bid/ask
         if hasattr(self, 'current_position') and self.current_position:
@@ -1305,6 +1610,7 @@ class KrakenTerminal(QMainWindow):
     def set_order_type(self, type):
         if self.order_type != type:
             self.order_type = type
+            self.ticket.update(side=type)
             if type == 'buy':
                 self.buy_button.setStyleSheet('background-color: green')
                 self.sell_button.setStyleSheet('')
@@ -1312,11 +1618,15 @@ class KrakenTerminal(QMainWindow):
                 self.sell_button.setStyleSheet('background-color: red')
                 self.buy_button.setStyleSheet('')
 
-            if self.best_price_button.styleSheet() == 'background-color: blue':
+            if self.ticket.mode == 'best':
                 self.set_best_price()
-            elif self.mid_price_button.styleSheet() == 'background-color: blue':
+            elif self.ticket.mode == 'mid':
                 self.set_mid_price()
-            elif self.price_button.styleSheet() == 'background-color: blue':
+            elif self.ticket.mode == 'micro':
+                self.set_micro_price()
+            elif self.ticket.mode == 'depth':
+                self.set_depth_price()
+            elif self.ticket.mode == 'input':
                 if type == 'buy':
                     default_price = self.bid_label.text().split(': ')[1]
                 else:
@@ -1326,48 +1636,59 @@ class KrakenTerminal(QMainWindow):
 
             self.update_usd_value()
 
+    def highlight_price_button(self, selected):
+        for button in self.price_mode_buttons:
+            button.setStyleSheet('background-color: blue' if button is selected else '')
+
     def set_best_price(self):
-        if self.order_type == 'buy':
-            self.selected_price = float(self.bid_label.text().split(': ')[1])
-        elif self.order_type == 'sell':
-            self.selected_price = float(self.ask_label.text().split(': ')[1])
-        print(f"Best price set: {format_price(self.selected_price)}")
-        self.best_price_button.setStyleSheet('background-color: blue')
-        self.mid_price_button.setStyleSheet('')
-        self.market_price_button.setStyleSheet('')
-        self.price_button.setStyleSheet('')
+        self.ticket.update(mode='best')
+        if self.order_type == 'buy' and self.bid_ticks is not None:
+            self.selected_price = self.instrument.ticks_to_price(self.bid_ticks)
+        elif self.order_type == 'sell' and self.ask_ticks is not None:
+            self.selected_price = self.instrument.ticks_to_price(self.ask_ticks)
+        log.debug("Best price set: %s", self.selected_price)
+        self.highlight_price_button(self.best_price_button)
         self.price_input_container.hide()
         self.update_usd_value()
 
     def set_mid_price(self):
-        bid = float(self.bid_label.text().split(': ')[1])
-        ask = float(self.ask_label.text().split(': ')[1])
-        adjusted_mid = calculate_adjusted_mid(bid, ask, self.tick_size, self.order_type)
-        self.selected_price = round_to_tick(adjusted_mid, self.tick_size)
-        print(f"Adjusted mid price set: {format_price(self.selected_price)}")
-        self.mid_price_button.setStyleSheet('background-color: blue')
-        self.best_price_button.setStyleSheet('')
-        self.market_price_button.setStyleSheet('')
-        self.price_button.setStyleSheet('')
+        self.ticket.update(mode='mid')
+        adjusted_mid = Instrument.adjusted_mid(self.bid_ticks, self.ask_ticks, self.order_type)
+        self.selected_price = self.instrument.ticks_to_price(adjusted_mid)
+        log.debug("Adjusted mid price set: %s", self.selected_price)
+        self.highlight_price_button(self.mid_price_button)
+        self.price_input_container.hide()
+        self.update_usd_value()
+
+    def set_micro_price(self):
+        # Follows the book on every quote, so the USD estimate uses the mid
+        self.ticket.update(mode='micro')
+        self.selected_price = None
+        log.debug("Microprice selected")
+        self.highlight_price_button(self.micro_price_button)
+        self.price_input_container.hide()
+        self.update_usd_value()
+
+    def set_depth_price(self):
+        self.ticket.update(mode='depth')
+        self.selected_price = None
+        log.debug("Depth-weighted price selected")
+        self.highlight_price_button(self.depth_price_button)
         self.price_input_container.hide()
         self.update_usd_value()
 
     def set_market_price(self):
+        self.ticket.update(mode='market')
         self.selected_price = None
-        print("Market price selected")
-        self.market_price_button.setStyleSheet('background-color: blue')
-        self.best_price_button.setStyleSheet('')
-        self.mid_price_button.setStyleSheet('')
-        self.price_button.setStyleSheet('')
+        log.debug("Market price selected")
+        self.highlight_price_button(self.market_price_button)
         self.price_input_container.hide()
         self.update_usd_value()
 
     def set_price_input(self):
+        self.ticket.update(mode='input')
         self.selected_price = None
-        self.price_button.setStyleSheet('background-color: blue')
-        self.best_price_button.setStyleSheet('')
-        self.mid_price_button.setStyleSheet('')
-        self.market_price_button.setStyleSheet('')
+        self.highlight_price_button(self.price_button)
 
         self.price_input_container.show()
         self.price_input.show()
@@ -1391,27 +1712,33 @@ class KrakenTerminal(QMainWindow):
             total_balance = float(flex_account['balanceValue'])
             self.balance_label.setText(f'Free Margin: ${available_margin:.2f} | Balance: ${total_balance:.2f}')
         except Exception as e:
-            print(f"Error fetching balance: {e}")
+            log.error("Error fetching balance: %s", e)
 
     def update_selected_price(self):
         try:
-            entered_price = float(self.price_input.text())
-            bid = float(self.bid_label.text().split(': ')[1])
-            ask = float(self.ask_label.text().split(': ')[1])
+            entered_ticks = self.instrument.price_to_ticks(self.price_input.text())
 
             if self.order_type == 'buy':
-                max_price = ask - self.tick_size
-                if entered_price > max_price:
-                    self.price_input.setText(format_price(max_price))
+                max_ticks = self.ask_ticks - 1
+                if entered_ticks > max_ticks:
+                    self.price_input.setText(self.instrument.format_ticks(max_ticks))
             elif self.order_type == 'sell':
-                min_price = bid + self.tick_size
-                if entered_price < min_price:
-                    self.price_input.setText(format_price(min_price))
+                min_ticks = self.bid_ticks + 1
+                if entered_ticks < min_ticks:
+                    self.price_input.setText(self.instrument.format_ticks(min_ticks))
 
             self.selected_price = float(self.price_input.text())
+            self.ticket.update(input_ticks=self.instrument.price_to_ticks(self.selected_price))
             self.update_usd_value()
+        except (ValueError, TypeError):
+            self.ticket.update(input_ticks=None)
+
+    def update_ticket_size(self):
+        try:
+            units = self.instrument.size_to_units(self.volume_input.text() or 0) if self.instrument else 0
         except ValueError:
-            pass
+            units = 0
+        self.ticket.update(units=units)
 
     def update_usd_value(self):
         try:
@@ -1423,7 +1750,7 @@ class KrakenTerminal(QMainWindow):
 
             if self.selected_price:
                 price = self.selected_price
-            elif self.best_price_button.styleSheet() == 'background-color: blue':
+            elif self.ticket.mode == 'best':
                 if self.order_type == 'buy':
                     price = bid
                 elif self.order_type == 'sell':
@@ -1466,7 +1793,7 @@ class KrakenTerminal(QMainWindow):
                 quantity = abs(float(position['contracts']))
                 self.volume_input.setText(str(quantity))
         except Exception as e:
-            print(f"Error copying position size: {str(e)}")
+            log.error("Error copying position size: %s", e)
 
     def toggle_arm(self):
         try:
@@ -1491,98 +1818,95 @@ class KrakenTerminal(QMainWindow):
                 self.fast_exit_button.setStyleSheet('')
 
         except Exception as e:
-            print(f"Error in toggle_arm: {str(e)}")
+            log.error("Error in toggle_arm: %s", e)
 
-    def place_order(self):
-        pair = get_full_symbol(self.pair_input.text())
-        volume = self.volume_input.text()
-        if self.order_type:
-            try:
-                current_qty = float(self.volume_input.text() or 0)
-                adjusted_qty = round(current_qty / self.min_order_size) * self.min_order_size
-                self.volume_input.setText(str(adjusted_qty))
-
-                if self.best_price_button.styleSheet() == 'background-color: blue':
-                    self.set_best_price()
-                elif self.mid_price_button.styleSheet() == 'background-color: blue':
-                    self.set_mid_price()
-                elif self.price_button.styleSheet() == 'background-color: blue':
-                    self.selected_price = float(self.price_input.text())
-
-                is_market = self.market_price_button.styleSheet() == 'background-color: blue'
-                if is_market:
-                    order = self.exchange.create_order(
-                        symbol=pair,
-                        type='market',
-                        side=self.order_type,
-                        amount=float(volume)
-                    )
-                else:
-                    order = self.exchange.create_order(
-                        symbol=pair,
-                        type='limit',
-                        side=self.order_type,
-                        amount=float(volume),
-                        price=self.selected_price,
-                        params={'postOnly': True}
-                    )
-
-                print(
-                    f"{'Market' if is_market else 'Limit'} {self.order_type} order placed for {pair}: volume {volume}")
-                if not is_market:
-                    print(f"Price: {format_price(self.selected_price)}")
-                print(f"Order details: {order}")
-            except Exception as e:
-                print(f"Error placing order: {str(e)}")
-        else:
-            print("Please select Buy/Sell before placing an order.")
+    def place_order(self, keypress_ns=None):
+        staged = self.ticket.staged
+        if staged is None:
+            order_log.warning("Order not placed: %s", self.ticket.error)
+            return
+        try:
+            order = self.order_manager.send(staged, keypress_ns)
+            wire_us = None
+            if keypress_ns is not None and self.order_manager.keypress_to_wire_ns is not None:
+                wire_us = self.order_manager.keypress_to_wire_ns // 1000
+                self.place_order_button.setToolTip(f"Keypress to wire: {wire_us} µs")
+            order_log.info("Order placed", extra={'fields': {
+                'symbol': staged.symbol, 'side': staged.side, 'type': 'market' if staged.price is None else 'limit',
+                'size': staged.amount, 'price': staged.price, 'order_id': (order or {}).get('id'),
+                'keypress_to_wire_us': wire_us}})
+            order_log.debug("Order details: %s", order)
+        except Exception as e:
+            order_log.error("Error placing order: %s", e)
+
+    def start_execution(self, style, value, limit_price):
+        ticket = self.ticket
+        if not self.is_armed:
+            self.execution_window.show_status('Arm the terminal first')
+            return
+        if ticket.side not in ('buy', 'sell') or ticket.units <= 0:
+            self.execution_window.show_status('Select Buy/Sell and a size first')
+            return
+        amount = self.instrument.units_to_size(ticket.units)
+        try:
+            if style == 'twap':
+                parent = self.executions.start(ticket.symbol, ticket.side, amount, 'twap', duration_s=value * 60,
+                                               limit_price=limit_price)
+            else:
+                parent = self.executions.start(ticket.symbol, ticket.side, amount, 'iceberg', display=value,
+                                               limit_price=limit_price)
+            self.execution_window.show_status(f"Started #{parent.id}: {style.upper()} {ticket.side} {amount}")
+        except ValueError as e:
+            self.execution_window.show_status(str(e))
 
     def close_all_orders(self):
         try:
-            orders = list(self.ws_thread.open_orders.values())
-            for order in orders:
-                self.exchange.cancel_order(order['id'], get_full_symbol(self.pair_input.text()))
-                print(f"Order {order['id']} cancelled")
-            print("All open orders have been closed.")
+            order_ids = list(self.ws_thread.open_orders)
+            self.order_manager.cancel_orders(order_ids, get_full_symbol(self.pair_input.text()))
+            order_log.info("All open orders closed", extra={'fields': {'count': len(order_ids)}})
         except Exception as e:
-            print(f"Error closing orders: {str(e)}")
+            order_log.error("Error closing orders: %s", e)
 
     def fast_exit(self):
         try:
             symbol = get_full_symbol(self.pair_input.text())
-            position = get_user_position(self.exchange, symbol)
+            result = self.order_manager.flatten(symbol)
 
-            if position and position['contracts'] != 0:
-                amount = abs(float(position['contracts']))
-                side = 'sell' if position['info']['side'].upper() == 'LONG' else 'buy'
-                if side == 'sell':
-                    order = self.exchange.create_order(
-                        symbol=symbol,
-                        type='market',
-                        side='sell',
-                        amount=amount
-                    )
-                else:
-                    order = self.exchange.create_order(
-                        symbol=symbol,
-                        type='market',
-                        side='buy',
-                        amount=amount
-                    )
-
-                print(f"Fast Exit executed: {side.upper()} {amount} {symbol} at market price")
-                print(f"Order details: {order}")
+            if result:
+                side, amount, order = result
+                order_log.info("Fast exit executed", extra={'fields': {
+                    'symbol': symbol, 'side': side, 'size': amount, 'order_id': (order or {}).get('id')}})
+                order_log.debug("Order details: %s", order)
             else:
-                print("No open position to exit")
-        except Exception as e:
-            print(f"Error in fast exit: {str(e)}")
-            print(traceback.format_exc())
+                order_log.info("No open position to exit")
+        except Exception:
+            order_log.exception("Error in fast exit")
 
     def closeEvent(self, event):
+        self.ladder.close()
+        self.trades_window.close()
+        self.chart_window.close()
+        self.watchlist.stop()
+        self.watchlist.close()
+        self.portfolio_window.close()
+        self.execution_window.close()
+        self.alerts_window.close()
+        self.executions.stop()
         if self.data_thread:
             self.data_thread.stop()
             self.data_thread.wait()
         if self.ws_thread:
             self.ws_thread.stop()
             self.ws_thread.wait()
+        if self.shared_book:
+            self.shared_book.close()
+        if self.history:
+            self.history.close()
+        if self.book_journal:
+            self.book_journal.close()
+        if self.control_server:
+            self.control_server.stop()
+        self.diagnostics.close()
+        if self.order_journal:
+            self.order_journal.close()
         event.accept()
@@ -1,4 +1,7 @@
-from decimal import Decimal, ROUND_HALF_UP
+from instrument import Instrument, scaled_step
+from log import get_logger
+
+log = get_logger('rest')
 
 
 def format_price(price):
@@ -8,31 +11,37 @@ def format_price(price):
 
 def round_to_tick(price, tick_size):
     if tick_size:
-        decimal_places = str(tick_size)[::-1].find('.')
-        if decimal_places > 0:
-            multiplier = 10 ** decimal_places
-            return round(price / tick_size) * tick_size
+        tick_num, tick_scale = scaled_step(tick_size)
+        return round(price / tick_size) * tick_num / tick_scale
     return price
 
 
 def calculate_adjusted_mid(bid, ask, tick_size, order_type):
-    bid = Decimal(str(bid))
-    ask = Decimal(str(ask))
-    mid_price = (bid + ask) / Decimal('2')
-
     try:
-        tick_size_decimal = Decimal(str(tick_size))
-    except:
-        tick_size_decimal = Decimal('0.00000001')  # Default to 8 decimal places if conversion fails
+        tick_num, tick_scale = scaled_step(tick_size)
+    except Exception:
+        tick_num, tick_scale = 1, 10 ** 8  # Default to 8 decimal places if conversion fails
+    tick = tick_num / tick_scale
+    mid_ticks = Instrument.adjusted_mid(round(bid / tick), round(ask / tick), order_type)
+    return mid_ticks * tick_num / tick_scale
+
 
-    rounded_price = mid_price.quantize(tick_size_decimal, rounding=ROUND_HALF_UP)
+def format_volume_usd(volume_usd):
+    if volume_usd >= 1000000:
+        return f"${volume_usd / 1000000:.2f}M"
+    elif volume_usd >= 1000:
+        return f"${volume_usd / 1000:.2f}K"
+    return f"${volume_usd:.2f}"
 
-    if order_type == 'buy':
-        rounded_price = min(rounded_price, ask - tick_size_decimal)
-    elif order_type == 'sell':
-        rounded_price = max(rounded_price, bid + tick_size_decimal)
 
-    return float(rounded_price)
+def format_signals(signals, instrument):
+    """One compact line of Microstructure signals, fair prices rounded to a tenth of a tick."""
+    cvd = signals.cvd
+    cvd_display = f"{cvd / 1000000:+.2f}M" if abs(cvd) >= 1000000 else f"{cvd:+.4f}"
+    flow_display = f"{signals.flow * 100:+.0f}%" if signals.flow is not None else '-'
+    return (f"Micro {format_price(instrument.ticks_to_price(round(signals.micro_ticks, 1)))} | "
+            f"Depth {format_price(instrument.ticks_to_price(round(signals.depth_ticks, 1)))} | "
+            f"Imb {signals.imbalance:+.2f} | CVD {cvd_display} | Flow {flow_display}")
 
 
 def get_full_symbol(pair):
@@ -46,7 +55,7 @@ def get_user_position(exchange, symbol):
             return next((p for p in positions if p['info']['symbol'] == symbol), None)
         return None
     except Exception as e:
-        print(f"Error fetching position: {str(e)}")
+        log.error("Error fetching position: %s", e)
         return None
 
 
@@ -55,5 +64,5 @@ def get_open_orders(exchange, symbol):
         open_orders = exchange.fetch_open_orders(symbol)
         return open_orders
     except Exception as e:
-        print(f"Error fetching open orders: {str(e)}")
+        log.error("Error fetching open orders: %s", e)
         return []
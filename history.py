@@ -0,0 +1,203 @@
+"""Per-instrument, per-day columnar history of trades and top-of-book changes.
+
+Each UTC day is a directory <root>/<symbol>/<YYYYMMDD>/ holding one flat little-endian
+file per column, so every column can be memory-mapped as a NumPy array without parsing:
+
+    trades.time   int64  exchange time, ms since epoch
+    trades.price  int64  price in ticks
+    trades.size   int64  size in contract units
+    trades.side   int8   1 buy, -1 sell, 0 unknown
+    quotes.time   int64  receive time, ms since epoch
+    quotes.bid    int64  best bid in ticks      quotes.bid_size  int64 units
+    quotes.ask    int64  best ask in ticks      quotes.ask_size  int64 units
+
+<root>/<symbol>/meta.json holds the tick size and size step for converting back to
+prices and sizes. HistoryWriter appends rows in batches from a background thread, so
+the feed thread only pushes tuples onto a deque. Rows are stored in arrival order and
+range queries assume time is non-decreasing within a day, which holds for the feed.
+"""
+import calendar
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import deque
+from instrument import Instrument
+from log import get_logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DAY_MS = 86400000
+COLUMNS = {
+    'trades': (('time', 'q'), ('price', 'q'), ('size', 'q'), ('side', 'b')),
+    'quotes': (('time', 'q'), ('bid', 'q'), ('bid_size', 'q'), ('ask', 'q'), ('ask_size', 'q'))
+}
+NUMPY_TYPES = {'q': '<i8', 'b': 'i1'}
+SWAP_BYTES = sys.byteorder == 'big'
+log = get_logger('recorder')
+
+
+def default_directory():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history')
+
+
+def day_name(day):
+    return time.strftime('%Y%m%d', time.gmtime(day * DAY_MS / 1000))
+
+
+class HistoryWriter:
+    """Records every trade and top-of-book change of one engine to the columnar store."""
+
+    def __init__(self, symbol, instrument, directory=None, flush_ms=500):
+        self.symbol = symbol
+        self.instrument = instrument
+        self.root = os.path.join(directory or default_directory(), symbol)
+        self.flush_interval = flush_ms / 1000
+        self.pending = deque()
+        self.last_quote = None
+        self.day_directories = {}
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, 'meta.json'), 'w') as file:
+            json.dump({'symbol': symbol, 'tick_size': instrument.tick_size, 'size_step': instrument.size_step}, file)
+        self.running = True
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='history-writer', daemon=True)
+        self.thread.start()
+
+    def attach(self, engine):
+        engine.trade_listeners.append(self.record_trade)
+        engine.book_listeners.append(self.record_book)
+
+    def detach(self, engine):
+        for listeners, listener in ((engine.trade_listeners, self.record_trade),
+                                    (engine.book_listeners, self.record_book)):
+            if listener in listeners:
+                listeners.remove(listener)
+
+    def record_trade(self, trade):
+        side = 1 if trade.side == 'buy' else -1 if trade.side == 'sell' else 0
+        self.pending.append(('trades', (int(trade.time), self.instrument.price_to_ticks(trade.price),
+                                        self.instrument.size_to_units(trade.amount), side)))
+
+    def record_book(self, orderbook):
+        bid_ticks = orderbook.best_bid()
+        ask_ticks = orderbook.best_ask()
+        if bid_ticks is None or ask_ticks is None:
+            return
+        quote = (bid_ticks, orderbook.bids[bid_ticks], ask_ticks, orderbook.asks[ask_ticks])
+        if quote != self.last_quote:
+            self.last_quote = quote
+            self.pending.append(('quotes', (time.time_ns() // 1000000,) + quote))
+
+    def run(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        batches = {}
+        pending = self.pending
+        for _ in range(len(pending)):
+            table, row = pending.popleft()
+            batches.setdefault((table, row[0] // DAY_MS), []).append(row)
+        for (table, day), rows in batches.items():
+            try:
+                self.append(table, day, rows)
+            except OSError as e:
+                log.error("Error writing %s history: %s", table, e)
+
+    def append(self, table, day, rows):
+        directory = self.day_directories.get(day)
+        if directory is None:
+            directory = os.path.join(self.root, day_name(day))
+            os.makedirs(directory, exist_ok=True)
+            self.day_directories[day] = directory
+        for index, (name, typecode) in enumerate(COLUMNS[table]):
+            column = array(typecode, [row[index] for row in rows])
+            if SWAP_BYTES:
+                column.byteswap()
+            with open(os.path.join(directory, f"{table}.{name}"), 'ab') as file:
+                column.tofile(file)
+
+    def close(self):
+        self.running = False
+        self.wakeup.set()
+        self.thread.join(2)
+
+
+class HistoryReader:
+    """Loads time ranges from the store as NumPy arrays (memory-mapped), or array.array without NumPy.
+
+    trades() and quotes() take [start_ms, end_ms) and return a dict of column name to array;
+    prices are in ticks and sizes in units, see self.instrument to convert them.
+    """
+
+    def __init__(self, symbol, directory=None):
+        if not symbol.startswith('PF_'):
+            symbol = f"PF_{symbol}USD"
+        self.symbol = symbol
+        self.root = os.path.join(directory or default_directory(), symbol)
+        with open(os.path.join(self.root, 'meta.json')) as file:
+            meta = json.load(file)
+        self.instrument = Instrument(symbol, meta['tick_size'], meta['size_step'])
+
+    def trades(self, start_ms, end_ms):
+        return self.load('trades', start_ms, end_ms)
+
+    def quotes(self, start_ms, end_ms):
+        return self.load('quotes', start_ms, end_ms)
+
+    def load(self, table, start_ms, end_ms):
+        parts = {name: [] for name, _ in COLUMNS[table]}
+        first_day, last_day = start_ms // DAY_MS, (end_ms - 1) // DAY_MS
+        for name in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, name)
+            if not (name.isdigit() and os.path.isdir(directory)):
+                continue
+            if not first_day <= calendar.timegm(time.strptime(name, '%Y%m%d')) * 1000 // DAY_MS <= last_day:
+                continue
+            columns = self.read_day(table, directory)
+            times = columns['time']
+            if np is not None:
+                lo, hi = np.searchsorted(times, (start_ms, end_ms))
+            else:
+                lo, hi = bisect_left(times, start_ms), bisect_left(times, end_ms)
+            for name in parts:
+                parts[name].append(columns[name][lo:hi])
+        result = {}
+        for name, typecode in COLUMNS[table]:
+            if np is not None:
+                chunks = parts[name] or [np.empty(0, NUMPY_TYPES[typecode])]
+                result[name] = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+            else:
+                result[name] = array(typecode)
+                for chunk in parts[name]:
+                    result[name].extend(chunk)
+        return result
+
+    def read_day(self, table, directory):
+        """Every column of table for one day, truncated to the shortest in case a write was interrupted."""
+        columns = {}
+        for name, typecode in COLUMNS[table]:
+            path = os.path.join(directory, f"{table}.{name}")
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if np is not None:
+                dtype = np.dtype(NUMPY_TYPES[typecode])
+                columns[name] = np.memmap(path, dtype=dtype, mode='r') if size >= dtype.itemsize else np.empty(0, dtype)
+            else:
+                column = array(typecode)
+                if size:
+                    with open(path, 'rb') as file:
+                        column.fromfile(file, size // column.itemsize)
+                    if SWAP_BYTES:
+                        column.byteswap()
+                columns[name] = column
+        rows = min(len(column) for column in columns.values())
+        return {name: column[:rows] for name, column in columns.items()}
@@ -0,0 +1,79 @@
+import math
+from decimal import Decimal
+from functools import lru_cache
+
+
+@lru_cache(maxsize=64)
+def scaled_step(step):
+    """Return (numerator, scale) such that step == numerator / scale exactly."""
+    sign, digits, exponent = Decimal(str(step)).normalize().as_tuple()
+    numerator = int(''.join(map(str, digits)))
+    if exponent >= 0:
+        return numerator * 10 ** exponent, 1
+    return numerator, 10 ** -exponent
+
+
+def format_scaled(value, scale):
+    """Format the exact fraction value / scale (scale a power of ten) without floats."""
+    sign = '-' if value < 0 else ''
+    whole, frac = divmod(abs(value), scale)
+    if scale == 1 or not frac:
+        return f"{sign}{whole}"
+    digits = len(str(scale)) - 1
+    return f"{sign}{whole}.{str(frac).zfill(digits).rstrip('0')}"
+
+
+class Instrument:
+    """Fixed-point view of one contract.
+
+    Prices are integer tick counts and sizes are integer multiples of the contract
+    precision, so book keys are exact and submitted prices never pick up float drift.
+    """
+
+    def __init__(self, symbol, tick_size, size_step):
+        self.symbol = symbol
+        self.tick_size = float(tick_size)
+        self.size_step = float(size_step)
+        self._tick_num, self._tick_scale = scaled_step(tick_size)
+        self._size_num, self._size_scale = scaled_step(size_step)
+
+    def price_to_ticks(self, price):
+        return round(float(price) / self.tick_size)
+
+    def ticks_to_price(self, ticks):
+        return ticks * self._tick_num / self._tick_scale
+
+    def format_ticks(self, ticks):
+        return format_scaled(ticks * self._tick_num, self._tick_scale)
+
+    def size_to_units(self, size):
+        return round(float(size) / self.size_step)
+
+    def units_to_size(self, units):
+        return units * self._size_num / self._size_scale
+
+    def format_units(self, units):
+        return format_scaled(units * self._size_num, self._size_scale)
+
+    def round_price(self, price):
+        return self.ticks_to_price(self.price_to_ticks(price))
+
+    def round_size(self, size):
+        return self.units_to_size(self.size_to_units(size))
+
+    @staticmethod
+    def adjusted_mid(bid_ticks, ask_ticks, order_type):
+        """Mid rounded half-up to a tick, kept one tick inside the opposite side."""
+        mid_ticks = (bid_ticks + ask_ticks + 1) // 2
+        if order_type == 'buy':
+            mid_ticks = min(mid_ticks, ask_ticks - 1)
+        elif order_type == 'sell':
+            mid_ticks = max(mid_ticks, bid_ticks + 1)
+        return mid_ticks
+
+    @staticmethod
+    def passive_ticks(fair_ticks, bid_ticks, ask_ticks, order_type):
+        """A fractional fair price rounded away from the opposite side and kept one tick inside it."""
+        if order_type == 'buy':
+            return min(math.floor(fair_ticks), ask_ticks - 1)
+        return max(math.ceil(fair_ticks), bid_ticks + 1)
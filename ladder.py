@@ -0,0 +1,226 @@
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import pyqtSignal, Qt, QTimer, QRect
+from PyQt5.QtGui import QPainter, QColor, QFont, QFontMetrics
+from settings import GUI_FONT, GUI_FONT_SIZE, LADDER_LEVELS, LADDER_FRAME_MS
+
+# Column layout as fractions of the widget width: my bids | bid size | price | ask size | my asks
+COLUMNS = (0.12, 0.29, 0.18, 0.29, 0.12)
+RECENTER_MARGIN = 3
+
+
+class PriceLadder(QWidget):
+    """Vertical DOM ladder painted directly from the live OrderBook.
+
+    The book is sampled on a fixed frame timer rather than per message, and only the
+    rows whose contents changed since the last frame are invalidated. The ladder keeps
+    its center until the inside market drifts close to an edge, so a moving market
+    mostly repaints a handful of rows instead of the whole widget.
+    """
+    price_clicked = pyqtSignal(int, str)
+    cancel_clicked = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Price Ladder')
+        self.levels = int(LADDER_LEVELS)
+        self.book = None
+        self.instrument = None
+        self.center_ticks = None
+        self.rows = []
+        self.order_marks = {}
+        self.scale_units = 1
+        self.last_version = -1
+        self.needs_full_repaint = True
+        self.is_dark_mode = False
+        self.set_dark_mode(False)
+
+        self.font = QFont(GUI_FONT, max(GUI_FONT_SIZE - 8, 8))
+        self.row_height = QFontMetrics(self.font).height() + 4
+        self.setMinimumSize(360, self.row_height * (2 * self.levels + 1))
+        self.resize(420, self.row_height * (2 * self.levels + 1))
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.timeout.connect(self.refresh)
+        self.frame_timer.start(int(LADDER_FRAME_MS))
+
+    def set_book(self, book, instrument):
+        self.book = book
+        self.instrument = instrument
+        self.center_ticks = None
+        self.rows = []
+        self.order_marks = {}
+        self.scale_units = 1
+        self.last_version = -1
+        self.needs_full_repaint = True
+        self.update()
+
+    def set_dark_mode(self, is_dark_mode):
+        self.is_dark_mode = is_dark_mode
+        if is_dark_mode:
+            self.colors = {
+                'background': QColor('#1e1e1e'), 'text': QColor('#e0e0e0'), 'grid': QColor('#333333'),
+                'bid': QColor(0, 179, 0), 'ask': QColor(220, 40, 40), 'inside': QColor('#404040'),
+                'order': QColor(230, 190, 0)
+            }
+        else:
+            self.colors = {
+                'background': QColor('white'), 'text': QColor('black'), 'grid': QColor('#dddddd'),
+                'bid': QColor(0, 150, 0), 'ask': QColor(200, 0, 0), 'inside': QColor('#e6e6e6'),
+                'order': QColor(200, 150, 0)
+            }
+        self.needs_full_repaint = True
+        self.update()
+
+    def update_orders(self, orders):
+        if not self.instrument:
+            return
+        marks = {}
+        for order in orders:
+            ticks = self.instrument.price_to_ticks(order.limit_price)
+            remaining = self.instrument.size_to_units(order.qty - order.filled)
+            side_marks = marks.setdefault(ticks, {'buy': 0, 'sell': 0})
+            side_marks[order.side] += remaining
+        self.order_marks = {ticks: (m['buy'], m['sell']) for ticks, m in marks.items()}
+        self.last_version = -1
+
+    def row_count(self):
+        return 2 * self.levels + 1
+
+    def top_ticks(self):
+        return self.center_ticks + self.levels
+
+    def refresh(self):
+        if not self.book or not self.isVisible():
+            return
+        if self.book.version == self.last_version and not self.needs_full_repaint:
+            return
+        try:
+            best_bid = self.book.best_bid()
+            best_ask = self.book.best_ask()
+        except RuntimeError:
+            # Book resized mid-scan on the feed thread; try again next frame
+            return
+        if best_bid is None or best_ask is None:
+            return
+        self.last_version = self.book.version
+
+        inside = (best_bid + best_ask) // 2
+        if (self.center_ticks is None or
+                abs(inside - self.center_ticks) > self.levels - RECENTER_MARGIN):
+            self.center_ticks = inside
+            self.needs_full_repaint = True
+
+        bids = self.book.bids
+        asks = self.book.asks
+        top = self.top_ticks()
+        rows = []
+        visible_max = 0
+        for i in range(self.row_count()):
+            ticks = top - i
+            bid_units = bids.get(ticks, 0) if ticks <= best_bid else 0
+            ask_units = asks.get(ticks, 0) if ticks >= best_ask else 0
+            visible_max = max(visible_max, bid_units, ask_units)
+            rows.append((ticks, bid_units, ask_units, ticks == best_bid, ticks == best_ask,
+                         self.order_marks.get(ticks)))
+
+        if visible_max > self.scale_units or (self.needs_full_repaint and visible_max):
+            self.scale_units = int(visible_max * 1.25) or 1
+            self.needs_full_repaint = True
+
+        if self.needs_full_repaint or len(rows) != len(self.rows):
+            self.rows = rows
+            self.needs_full_repaint = False
+            self.update()
+            return
+
+        previous = self.rows
+        self.rows = rows
+        width = self.width()
+        for i, row in enumerate(rows):
+            if row != previous[i]:
+                self.update(QRect(0, i * self.row_height, width, self.row_height))
+
+    def column_rects(self, y):
+        rects = []
+        x = 0
+        width = self.width()
+        for fraction in COLUMNS:
+            column_width = int(width * fraction)
+            rects.append(QRect(x, y, column_width, self.row_height))
+            x += column_width
+        return rects
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setFont(self.font)
+        dirty = event.rect()
+        painter.fillRect(dirty, self.colors['background'])
+        if not self.rows or not self.instrument:
+            return
+
+        first = max(dirty.top() // self.row_height, 0)
+        last = min(dirty.bottom() // self.row_height, len(self.rows) - 1)
+        for i in range(first, last + 1):
+            self.paint_row(painter, i, self.rows[i])
+
+    def paint_row(self, painter, index, row):
+        ticks, bid_units, ask_units, is_best_bid, is_best_ask, marks = row
+        y = index * self.row_height
+        my_bids, bid_rect, price_rect, ask_rect, my_asks = self.column_rects(y)
+        colors = self.colors
+
+        if is_best_bid or is_best_ask:
+            painter.fillRect(price_rect, colors['inside'])
+
+        for units, rect, color, grow_left in ((bid_units, bid_rect, colors['bid'], True),
+                                               (ask_units, ask_rect, colors['ask'], False)):
+            if not units:
+                continue
+            ratio = min(units / self.scale_units, 1.0)
+            heat = QColor(color)
+            heat.setAlpha(int(40 + 180 * ratio))
+            bar_width = max(int(rect.width() * ratio), 1)
+            if grow_left:
+                bar = QRect(rect.right() - bar_width + 1, y + 1, bar_width, self.row_height - 2)
+            else:
+                bar = QRect(rect.left(), y + 1, bar_width, self.row_height - 2)
+            painter.fillRect(bar, heat)
+            painter.setPen(colors['text'])
+            painter.drawText(rect.adjusted(4, 0, -4, 0),
+                             (Qt.AlignRight if grow_left else Qt.AlignLeft) | Qt.AlignVCenter,
+                             self.instrument.format_units(units))
+
+        painter.setPen(colors['bid'] if ticks <= self.center_ticks else colors['ask'])
+        painter.drawText(price_rect, Qt.AlignCenter, self.instrument.format_ticks(ticks))
+
+        if marks:
+            for units, rect in ((marks[0], my_bids), (marks[1], my_asks)):
+                if units:
+                    painter.fillRect(rect.adjusted(1, 1, -1, -1), colors['order'])
+                    painter.setPen(QColor('black'))
+                    painter.drawText(rect, Qt.AlignCenter, self.instrument.format_units(units))
+
+        painter.setPen(colors['grid'])
+        painter.drawLine(0, y + self.row_height - 1, self.width(), y + self.row_height - 1)
+
+    def mousePressEvent(self, event):
+        if self.center_ticks is None:
+            return
+        index = event.y() // self.row_height
+        if not 0 <= index < self.row_count():
+            return
+        ticks = self.top_ticks() - index
+
+        if event.button() == Qt.RightButton:
+            if ticks in self.order_marks:
+                self.cancel_clicked.emit(ticks)
+        elif event.button() == Qt.MiddleButton:
+            self.center_ticks = None
+            self.last_version = -1
+        elif event.button() == Qt.LeftButton:
+            side = 'buy' if event.x() < self.width() // 2 else 'sell'
+            self.price_clicked.emit(ticks, side)
+
+    def resizeEvent(self, event):
+        self.needs_full_repaint = True
+        super().resizeEvent(event)
@@ -0,0 +1,145 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+ROOT_LOGGER = 'kraken'
+_listener = None
+
+
+def get_logger(subsystem):
+    """Logger for one subsystem (feed, orders, account, gui, rest, recorder, ...)."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
+
+
+def default_path():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'terminal.log')
+
+
+class RateLimitFilter(logging.Filter):
+    """Passes the first of a repeating warning or error, then at most one per interval.
+
+    Repeats are keyed on logger, message template and exception type, so callers must
+    pass values as arguments rather than pre-formatting them. The record that gets
+    through carries the number of repeats suppressed since the previous one.
+    """
+
+    def __init__(self, interval=10.0):
+        super().__init__()
+        self.interval = interval
+        self.seen = {}
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.msg, record.exc_info[0] if record.exc_info else None)
+        entry = self.seen.get(key)
+        if entry is None or record.created - entry[0] >= self.interval:
+            if entry and entry[1]:
+                record.suppressed = entry[1]
+            self.seen[key] = [record.created, 0]
+            return True
+        entry[1] += 1
+        return False
+
+
+class _EnqueueHandler(QueueHandler):
+    """Freezes the message on the calling thread and leaves all formatting to the writer thread."""
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s [%(subsystem)s] %(message)s')
+
+    def format(self, record):
+        record.subsystem = record.name.rpartition('.')[2]
+        return super().format(record)
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            line += f" (repeated {suppressed}x)"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra={'fields': {...}} adds structured fields."""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'subsystem': record.name.rpartition('.')[2],
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(level='INFO', levels=None, path=None, max_bytes=5000000, backups=5, error_interval=10.0,
+              console=True):
+    """Route every subsystem logger through a queue to a background writer thread.
+
+    Logging calls only append to an in-memory queue, so a slow terminal or disk never
+    stalls the feed thread. The file sink is rotating JSON lines; console output is text.
+    """
+    global _listener
+    if _listener:
+        return _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+    root.propagate = False
+    for subsystem, subsystem_level in (levels or {}).items():
+        get_logger(subsystem).setLevel(subsystem_level)
+
+    sinks = []
+    if console:
+        console_sink = logging.StreamHandler(sys.stderr)
+        console_sink.setFormatter(TextFormatter())
+        sinks.append(console_sink)
+    path = path or default_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_sink = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        file_sink.setFormatter(JsonFormatter())
+        sinks.append(file_sink)
+    except OSError as e:
+        print(f"Error opening log file {path}: {str(e)}")
+
+    records = queue.SimpleQueue()
+    handler = _EnqueueHandler(records)
+    handler.addFilter(RateLimitFilter(error_interval))
+    root.addHandler(handler)
+    _listener = QueueListener(records, *sinks, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+    return _listener
+
+
+def shutdown():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
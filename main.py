@@ -1,11 +1,153 @@
 import sys
-from PyQt5.QtWidgets import QApplication
-from gui import KrakenTerminal
+import argparse
+import threading
+from datetime import datetime
+
+
+def run_headless(pair, log_path=None, interval_ms=250, control=False, paper=False):
+    """Stream quotes, trades, orders and positions for pair to stdout or a log file without Qt."""
+    from core import (MarketDataEngine, OrderManager, OrderJournal, PaperExchange, TriggerEngine, ExecutionScheduler,
+                      AlertEngine, Microstructure, create_exchange, load_instrument)
+    from control_api import ControlServer
+    from helpers import get_full_symbol, format_price, format_signals
+    from shared_book import SharedBookWriter
+    from history import HistoryWriter
+    from book_journal import BookJournalWriter
+    from settings import (SHARED_BOOK_ENABLED, SHARED_BOOK_DEPTH, SHARED_BOOK_DIR, CONTROL_API_ADDRESS,
+                          HISTORY_ENABLED, HISTORY_DIR, HISTORY_FLUSH_MS, BOOK_JOURNAL_ENABLED, BOOK_JOURNAL_DIR,
+                          BOOK_JOURNAL_SNAPSHOT_EVERY, ORDER_JOURNAL_ENABLED, ORDER_JOURNAL_PATH, PAPER_BALANCE,
+                          BRACKET_BACKUP_OFFSET_TICKS, TRIGGER_EVAL_BUDGET_US, EXECUTION_SLICE_SECONDS,
+                          EXECUTION_PARTICIPATION, EXECUTION_DEPTH_FRACTION, EXECUTION_DEPTH_LEVELS,
+                          EXECUTION_REPRICE_TICKS, EXECUTION_RATE_RESERVE, ALERT_REPEAT_COOLDOWN_S,
+                          SIGNAL_DEPTH_LEVELS, SIGNAL_FLOW_WINDOW_S)
+
+    symbol = get_full_symbol(pair)
+    exchange = create_exchange()
+    instrument, margin_requirement = load_instrument(exchange, symbol)
+    engine = MarketDataEngine(symbol, instrument)
+    engine.book_throttle = interval_ms
+    if paper:
+        exchange = PaperExchange(exchange, float(PAPER_BALANCE))
+        exchange.attach(engine, margin_requirement)
+    shared_book = None
+    if SHARED_BOOK_ENABLED:
+        shared_book = SharedBookWriter(symbol, instrument, int(SHARED_BOOK_DEPTH), SHARED_BOOK_DIR or None)
+        shared_book.attach(engine)
+    history = None
+    if HISTORY_ENABLED:
+        history = HistoryWriter(symbol, instrument, HISTORY_DIR or None, int(HISTORY_FLUSH_MS))
+        history.attach(engine)
+    book_journal = None
+    if BOOK_JOURNAL_ENABLED:
+        book_journal = BookJournalWriter(symbol, instrument, BOOK_JOURNAL_DIR or None, int(BOOK_JOURNAL_SNAPSHOT_EVERY))
+        book_journal.attach(engine)
+    microstructure = Microstructure(int(SIGNAL_DEPTH_LEVELS), float(SIGNAL_FLOW_WINDOW_S))
+    microstructure.attach(engine)
+    control_server = None
+    order_journal = None
+    triggers = None
+    executions = None
+    alerts = None
+    if control:
+        if ORDER_JOURNAL_ENABLED:
+            order_journal = OrderJournal(ORDER_JOURNAL_PATH or None)
+        order_manager = OrderManager(exchange, order_journal)
+        triggers = TriggerEngine(order_manager, int(BRACKET_BACKUP_OFFSET_TICKS), int(TRIGGER_EVAL_BUDGET_US))
+        triggers.attach(engine)
+        executions = ExecutionScheduler(order_manager, float(EXECUTION_SLICE_SECONDS), float(EXECUTION_PARTICIPATION),
+                                        float(EXECUTION_DEPTH_FRACTION), int(EXECUTION_DEPTH_LEVELS),
+                                        int(EXECUTION_REPRICE_TICKS), float(EXECUTION_RATE_RESERVE), paper)
+        if paper:
+            executions.attach(engine)
+        alerts = AlertEngine(order_manager, repeat_cooldown_s=float(ALERT_REPEAT_COOLDOWN_S))
+        alerts.attach(engine)
+        control_server = ControlServer(order_manager, lambda: engine, address=CONTROL_API_ADDRESS or None,
+                                       triggers=triggers, executions=executions, alerts=alerts,
+                                       microstructure=microstructure)
+        control_server.start()
+    out = open(log_path, 'a') if log_path else sys.stdout
+
+    def write(line):
+        out.write(f"{datetime.now().strftime('%H:%M:%S.%f')[:-3]} {symbol} {line}\n")
+        out.flush()
+
+    def on_position(position):
+        portfolio = engine.portfolio
+        if triggers:
+            triggers.sync_position(symbol, position.get('contracts') if position else 0)
+        if position:
+            write(f"POSITION {position['info']['side']} {position['contracts']} @ {position['entryPrice']}")
+        else:
+            write("POSITION FLAT")
+        write(f"PORTFOLIO positions {len(portfolio.positions)} | UPNL ${portfolio.total_upnl:.2f} | "
+              f"notional ${portfolio.total_notional:.2f}")
+
+    def on_book(quote):
+        signals = microstructure.snapshot()
+        write(f"BOOK {format_price(quote.bid)} / {format_price(quote.ask)}"
+              + (f" | {format_signals(signals, instrument)}" if signals else ''))
+
+    engine.on_book = on_book
+    engine.on_trade = lambda trade: write(
+        f"TRADE {trade.side.upper()} {trade.amount} @ {format_price(trade.price)}")
+    engine.on_index = lambda mark_price: write(f"MARK {format_price(mark_price)}")
+    engine.on_orders = lambda orders: write(f"ORDERS {len(orders)} open")
+    engine.on_position = on_position
+    engine.on_error = lambda: write("CONNECTION ERROR")
+    engine.on_health = lambda health: write(f"FEED {health.state.upper()} ({health.failovers} failovers)")
+    if alerts:
+        alerts.on_fire = lambda alert: write(f"\aALERT {alert.text()}" + (f" -> {alert.action}" if alert.action else ''))
+
+    feed_thread = threading.Thread(target=engine.run, name='market-data', daemon=True)
+    feed_thread.start()
+    try:
+        while feed_thread.is_alive():
+            feed_thread.join(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if executions:
+            executions.stop()
+        engine.stop()
+        feed_thread.join(2)
+        if control_server:
+            control_server.stop()
+        if order_journal:
+            order_journal.close()
+        if shared_book:
+            shared_book.close()
+        if history:
+            history.close()
+        if book_journal:
+            book_journal.close()
+        if log_path:
+            out.close()
 
 
 def main():
+    parser = argparse.ArgumentParser(description='KrakenFutures Terminal')
+    parser.add_argument('--headless', action='store_true', help='run the trading core without the GUI')
+    parser.add_argument('--symbol', default='XBT', help='pair to stream in headless mode, e.g. XBT')
+    parser.add_argument('--log', help='append headless output to this file instead of stdout')
+    parser.add_argument('--interval', type=int, default=250, help='minimum ms between headless book lines')
+    parser.add_argument('--control', action='store_true', help='serve the local control API in headless mode')
+    parser.add_argument('--paper', action='store_true', help='simulate orders against the live book instead of sending them')
+    args = parser.parse_args()
+
+    import log
+    from settings import LOG_LEVEL, LOG_LEVELS, LOG_FILE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS, LOG_ERROR_INTERVAL
+    log.configure(LOG_LEVEL, LOG_LEVELS, LOG_FILE or None, int(LOG_FILE_MAX_BYTES), int(LOG_FILE_BACKUPS),
+                  float(LOG_ERROR_INTERVAL))
+
+    if args.headless:
+        run_headless(args.symbol, args.log, args.interval, args.control, args.paper)
+        return
+
+    from PyQt5.QtWidgets import QApplication
+    from gui import KrakenTerminal
+
     app = QApplication(sys.argv)
-    terminal = KrakenTerminal()
+    terminal = KrakenTerminal(paper=True) if args.paper else KrakenTerminal()
     terminal.show()
     sys.exit(app.exec_())
 
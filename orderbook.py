@@ -0,0 +1,158 @@
+import heapq
+from bisect import bisect_left
+
+
+def parse_level(level):
+    """Return (price, qty) from a feed level, which is either [price, qty] or {'price', 'qty'}."""
+    if isinstance(level, dict):
+        if 'price' in level and 'qty' in level:
+            return level['price'], level['qty']
+    elif isinstance(level, (list, tuple)) and len(level) >= 2:
+        return level[0], level[1]
+    return None
+
+
+class OrderBook:
+    """L2 book keyed by integer ticks with sizes in integer contract units.
+
+    Best bid/ask are cached and only rescanned when the best level is removed, and
+    version is bumped on every change so readers can cheaply tell the book moved.
+    The cache is only written by the methods that change the book (on the feed
+    thread, under the engine lock), so best_bid()/best_ask() are plain reads that
+    are safe from any thread.
+    """
+
+    def __init__(self, instrument):
+        self.instrument = instrument
+        self.bids = {}
+        self.asks = {}
+        self.version = 0
+        self._best_bid = None
+        self._best_ask = None
+
+    def side(self, name):
+        return self.bids if name in ('bids', 'buy') else self.asks
+
+    def clear(self):
+        self.bids = {}
+        self.asks = {}
+        self._best_bid = None
+        self._best_ask = None
+        self.version += 1
+
+    def load_snapshot(self, bids, asks):
+        price_to_ticks = self.instrument.price_to_ticks
+        size_to_units = self.instrument.size_to_units
+        self.clear()
+        for levels, book_side in ((bids, self.bids), (asks, self.asks)):
+            for level in levels:
+                parsed = parse_level(level)
+                if parsed:
+                    units = size_to_units(parsed[1])
+                    if units > 0:
+                        book_side[price_to_ticks(parsed[0])] = units
+        self.refresh_best()
+        self.version += 1
+
+    def load_ticks(self, bids, asks):
+        """Replace the book with dicts already keyed by ticks with sizes in units."""
+        self.clear()
+        self.bids = bids
+        self.asks = asks
+        self.refresh_best()
+
+    def refresh_best(self):
+        self._best_bid = max(self.bids) if self.bids else None
+        self._best_ask = min(self.asks) if self.asks else None
+
+    def apply_delta(self, side, price, qty):
+        ticks = self.instrument.price_to_ticks(price)
+        units = self.instrument.size_to_units(qty)
+        if side in ('bids', 'buy'):
+            if units <= 0:
+                if self.bids.pop(ticks, None) is not None and ticks == self._best_bid:
+                    self._best_bid = max(self.bids) if self.bids else None
+            else:
+                self.bids[ticks] = units
+                if self._best_bid is None or ticks > self._best_bid:
+                    self._best_bid = ticks
+        else:
+            if units <= 0:
+                if self.asks.pop(ticks, None) is not None and ticks == self._best_ask:
+                    self._best_ask = min(self.asks) if self.asks else None
+            else:
+                self.asks[ticks] = units
+                if self._best_ask is None or ticks < self._best_ask:
+                    self._best_ask = ticks
+        self.version += 1
+        return ticks
+
+    def best_bid(self):
+        return self._best_bid
+
+    def best_ask(self):
+        return self._best_ask
+
+    def depth(self, side, levels):
+        """Units resting in the best levels price levels of side ('bids'/'buy' or 'asks'/'sell')."""
+        book_side = self.side(side)
+        if len(book_side) <= levels:
+            return sum(book_side.values())
+        best = heapq.nlargest(levels, book_side) if book_side is self.bids else heapq.nsmallest(levels, book_side)
+        return sum(book_side[ticks] for ticks in best)
+
+    def impact_price(self, size, side):
+        """Average execution price for a market order of size (contracts) on side."""
+        book_side = self.bids if side == 'sell' else self.asks
+        remaining_units = self.instrument.size_to_units(size)
+        total_units = remaining_units
+        if total_units <= 0:
+            return 0
+        total_cost = 0
+        for ticks in sorted(book_side, reverse=(side == 'sell')):
+            executed = min(remaining_units, book_side[ticks])
+            total_cost += executed * ticks
+            remaining_units -= executed
+            if remaining_units <= 0:
+                break
+
+        return self.instrument.ticks_to_price(total_cost / total_units)
+
+
+class LevelIndex:
+    """One side's price levels kept sorted best first, for readers that need the top levels.
+
+    Fed from the engine's snapshot and delta listeners: a delta costs one bisection
+    (and a list insert or delete when a level appears or goes), so the top levels
+    never need a sort of the whole side. Bids are kept negated so both sides ascend
+    from the best.
+    """
+    __slots__ = ('sign', 'keys')
+
+    def __init__(self, bids):
+        self.sign = -1 if bids else 1
+        self.keys = []
+
+    def load(self, book_side):
+        sign = self.sign
+        self.keys = sorted(sign * ticks for ticks in book_side)
+
+    def update(self, book_side, ticks):
+        """Follow a change at ticks; returns the level's position from the best, or None if nothing changed."""
+        keys = self.keys
+        key = self.sign * ticks
+        index = bisect_left(keys, key)
+        listed = index < len(keys) and keys[index] == key
+        if ticks in book_side:
+            if not listed:
+                keys.insert(index, key)
+        elif listed:
+            del keys[index]
+        else:
+            return None
+        return index
+
+    def top(self, book_side, count):
+        """Up to count (ticks, units) from the best outwards."""
+        sign = self.sign
+        return [(key * sign, book_side[key * sign]) for key in self.keys[:count]]
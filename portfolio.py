@@ -0,0 +1,62 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFont
+from settings import GUI_FONT, GUI_FONT_SIZE, PORTFOLIO_REFRESH_MS
+from helpers import format_price
+
+
+class PortfolioWindow(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle('Portfolio')
+        self.portfolio = None
+        self.total_balance = None
+        self.painted_version = -1
+        layout = QVBoxLayout(self)
+        self.positions_label = QLabel()
+        self.positions_label.setFont(QFont(GUI_FONT, max(GUI_FONT_SIZE - 6, 8)))
+        self.positions_label.setTextFormat(Qt.RichText)
+        self.positions_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        layout.addWidget(self.positions_label)
+        self.resize(800, 300)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(int(PORTFOLIO_REFRESH_MS))
+
+    def set_portfolio(self, portfolio):
+        self.portfolio = portfolio
+        self.painted_version = -1
+
+    def set_balance(self, total_balance):
+        if total_balance != self.total_balance:
+            self.total_balance = total_balance
+            self.painted_version = -1
+
+    def refresh(self):
+        if not self.isVisible() or not self.portfolio or self.portfolio.version == self.painted_version:
+            return
+        self.painted_version = self.portfolio.version
+
+        rows = []
+        for position in sorted(self.portfolio.positions.values(), key=lambda p: -p.notional):
+            side_color = 'green' if position.balance > 0 else 'red'
+            pnl_color = 'green' if position.upnl >= 0 else 'red'
+            rows.append(
+                f"<tr><td>{position.symbol}</td>"
+                f"<td><font color='{side_color}'>{'LONG' if position.balance > 0 else 'SHORT'} "
+                f"{abs(position.balance)}</font></td>"
+                f"<td>{format_price(position.entry_price)}</td>"
+                f"<td>{format_price(position.mark_price)}</td>"
+                f"<td><font color='{pnl_color}'>${position.upnl:.2f}</font></td>"
+                f"<td>${position.notional:.2f}</td></tr>")
+
+        total_color = 'green' if self.portfolio.total_upnl >= 0 else 'red'
+        margin_text = f"${self.portfolio.total_margin:.2f}"
+        if self.total_balance:
+            margin_text += f" ({self.portfolio.total_margin / self.total_balance * 100:.1f}% of balance)"
+        self.positions_label.setText(
+            "<table cellspacing='8'><tr><th>Instrument</th><th>Position</th><th>Entry</th><th>Mark</th>"
+            "<th>UPNL</th><th>Notional</th></tr>" + ''.join(rows) + "</table>"
+            f"<b>UPNL <font color='{total_color}'>${self.portfolio.total_upnl:.2f}</font> | "
+            f"Notional ${self.portfolio.total_notional:.2f} | Margin {margin_text}</b>")
@@ -1,9 +1,16 @@
 KRAKEN_API_KEY = 'api-key'
 KRAKEN_API_SECRET = 'api-secret'
+KRAKEN_WS_URL = 'wss://futures.kraken.com/ws/v1'
+KRAKEN_REST_URL = 'https://futures.kraken.com'
 GUI_FONT_SIZE = 22
 GUI_FONT = 'Segoe UI'
 QUICK_SWAP_TICKERS = ['XBT', 'ETH', 'SOL', 'BONK', 'CRV']
 BOOK_UPDATE_THROTTLE = '0'
+FEED_STANDBY_ENABLED = False
+FEED_STALE_MS = {'ticker': 10000}
+FEED_WATCHDOG_MS = 1000
+BOOK_STALE_MS = 5000
+BOOK_RESYNC_TIMEOUT_MS = 5000
 PLACE_ORDER_HOTKEY = "Ctrl+1"
 CLOSE_ORDERS_HOTKEY = "Ctrl+2"
 CLOSE_LAST_ORDER_HOTKEY = 'Ctrl+3'
@@ -13,6 +20,57 @@ BEST_PRICE_HOTKEY = 'Shift+1'
 MID_PRICE_HOTKEY = 'Shift+2'
 MARKET_PRICE_HOTKEY = 'Shift+3'
 PRICE_INPUT_HOTKEY = 'Shift+4'
+MICRO_PRICE_HOTKEY = 'Shift+5'
+DEPTH_PRICE_HOTKEY = 'Shift+6'
+PROFILE_HOTKEY = 'Ctrl+Shift+P'
+MEMORY_TRACE_HOTKEY = 'Ctrl+Shift+M'
+LADDER_LEVELS = 20
+LADDER_FRAME_MS = 33
+WATCHLIST_REFRESH_MS = 250
+PORTFOLIO_REFRESH_MS = 250
+BALANCE_POLL_MS = 1000
+SHARED_BOOK_ENABLED = True
+SHARED_BOOK_DEPTH = 10
+SHARED_BOOK_DIR = ''
+CONTROL_API_ENABLED = False
+CONTROL_API_ADDRESS = ''
+HISTORY_ENABLED = False
+HISTORY_DIR = ''
+HISTORY_FLUSH_MS = 500
+BOOK_JOURNAL_ENABLED = False
+BOOK_JOURNAL_DIR = ''
+BOOK_JOURNAL_SNAPSHOT_EVERY = 10000
+DIAGNOSTICS_DIR = ''
+PROFILE_SAMPLE_MS = 5
+MEMORY_SNAPSHOT_SECONDS = 60
+LOG_LEVEL = 'INFO'
+LOG_LEVELS = {'feed': 'INFO', 'orders': 'INFO', 'gui': 'INFO'}
+LOG_FILE = ''
+LOG_FILE_MAX_BYTES = 5000000
+LOG_FILE_BACKUPS = 5
+LOG_ERROR_INTERVAL = 10
+ORDER_JOURNAL_ENABLED = True
+ORDER_JOURNAL_PATH = ''
+PAPER_TRADING = False
+PAPER_BALANCE = 10000
+BRACKET_TRIGGER_SOURCE = 'trade'
+BRACKET_BACKUP_OFFSET_TICKS = 10
+TRIGGER_EVAL_BUDGET_US = 50
+REST_RATE_BUDGET = 500
+REST_RATE_WINDOW_S = 10
+EXECUTION_RATE_RESERVE = 0.5
+EXECUTION_SLICE_SECONDS = 10
+EXECUTION_PARTICIPATION = 0.1
+EXECUTION_DEPTH_FRACTION = 0.25
+EXECUTION_DEPTH_LEVELS = 5
+EXECUTION_REPRICE_TICKS = 2
+EXECUTION_REFRESH_MS = 250
+ALERT_SOUND = True
+ALERT_DESKTOP_NOTIFY = True
+ALERT_REPEAT_COOLDOWN_S = 60
+ALERTS_REFRESH_MS = 250
+SIGNAL_DEPTH_LEVELS = 5
+SIGNAL_FLOW_WINDOW_S = 5
 
 
 def save_settings(setting_name, value):
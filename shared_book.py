@@ -0,0 +1,190 @@
+"""Seqlock-protected shared-memory snapshot of one instrument's book, last trade and mark.
+
+The terminal writes one memory-mapped file per instrument; any local process can map
+the same file with SharedBookReader and read consistent snapshots without a socket or
+a second exchange connection. Only the standard library is needed on the reader side.
+
+Layout (little endian):
+    header  magic 8s | layout version u32 | depth u32 | tick size f64 | size step f64 | seq u64
+    payload update ns | bid count | ask count | trade ticks | trade units | trade time ms |
+            trade side (1 buy, -1 sell) | mark price f64 | bids depth*(ticks, units) | asks ...
+
+The writer bumps seq to an odd value, writes the payload, then bumps it to even again.
+Readers retry until they see the same even seq before and after copying the payload.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import namedtuple
+from instrument import Instrument
+from orderbook import LevelIndex
+
+MAGIC = b'KFBOOK01'
+LAYOUT_VERSION = 1
+HEADER = struct.Struct('<8sIIddQ')
+SEQ = struct.Struct('<Q')
+SEQ_OFFSET = HEADER.size - SEQ.size
+PAYLOAD = struct.Struct('<qqqqqqqd')
+PAYLOAD_OFFSET = HEADER.size
+LEVELS_OFFSET = PAYLOAD_OFFSET + PAYLOAD.size
+
+SharedBookSnapshot = namedtuple('SharedBookSnapshot',
+                                'seq update_ns bids asks last_price last_size last_side last_time mark_price')
+
+
+def default_directory():
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm/krakenfutures'
+    return os.path.join(tempfile.gettempdir(), 'krakenfutures')
+
+
+def book_path(symbol, directory=None):
+    return os.path.join(directory or default_directory(), f"{symbol}.book")
+
+
+def segment_size(depth):
+    return LEVELS_OFFSET + 2 * depth * 16
+
+
+class SharedBookWriter:
+    def __init__(self, symbol, instrument, depth=10, directory=None):
+        self.symbol = symbol
+        self.instrument = instrument
+        self.depth = depth
+        self.path = book_path(symbol, directory)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        size = segment_size(depth)
+        with open(self.path, 'wb') as file:
+            file.truncate(size)
+        self.file = open(self.path, 'r+b')
+        self.mm = mmap.mmap(self.file.fileno(), size)
+        self.seq = 0
+        self.levels = struct.Struct(f'<{4 * depth}q')
+        self.bid_levels = LevelIndex(True)
+        self.ask_levels = LevelIndex(False)
+        self.bids = []
+        self.asks = []
+        self.trade = (0, 0, 0, 0)
+        self.mark_price = 0.0
+        HEADER.pack_into(self.mm, 0, MAGIC, LAYOUT_VERSION, depth, instrument.tick_size, instrument.size_step, 0)
+
+    def attach(self, engine):
+        with engine.lock:
+            self.load_levels(engine.orderbook, None)
+            engine.book_snapshot_listeners.append(self.load_levels)
+            engine.book_delta_listeners.append(self.update_levels)
+        engine.book_listeners.append(self.publish_book)
+        engine.trade_listeners.append(self.publish_trade)
+        engine.mark_listeners.append(self.publish_mark)
+
+    def detach(self, engine):
+        for listeners, listener in ((engine.book_snapshot_listeners, self.load_levels),
+                                    (engine.book_delta_listeners, self.update_levels),
+                                    (engine.book_listeners, self.publish_book),
+                                    (engine.trade_listeners, self.publish_trade),
+                                    (engine.mark_listeners, self.publish_mark)):
+            if listener in listeners:
+                listeners.remove(listener)
+
+    # The level indexes follow the book through its snapshot and delta listeners, which run
+    # before the book listeners, so publish_book only slices the top levels
+
+    def load_levels(self, orderbook, time_ms):
+        self.bid_levels.load(orderbook.bids)
+        self.ask_levels.load(orderbook.asks)
+
+    def update_levels(self, orderbook, side, ticks, time_ms):
+        if side in ('bids', 'buy'):
+            self.bid_levels.update(orderbook.bids, ticks)
+        else:
+            self.ask_levels.update(orderbook.asks, ticks)
+
+    def publish_book(self, orderbook):
+        self.bids = self.bid_levels.top(orderbook.bids, self.depth)
+        self.asks = self.ask_levels.top(orderbook.asks, self.depth)
+        self.write()
+
+    def publish_trade(self, trade):
+        self.trade = (self.instrument.price_to_ticks(trade.price), self.instrument.size_to_units(trade.amount),
+                      int(trade.time), 1 if trade.side == 'buy' else -1)
+        self.write()
+
+    def publish_mark(self, symbol, mark_price):
+        if symbol == self.symbol:
+            self.mark_price = mark_price
+            self.write()
+
+    def write(self):
+        mm = self.mm
+        self.seq += 1
+        SEQ.pack_into(mm, SEQ_OFFSET, self.seq)
+        levels = [0] * (4 * self.depth)
+        for i, (ticks, units) in enumerate(self.bids):
+            levels[2 * i] = ticks
+            levels[2 * i + 1] = units
+        offset = 2 * self.depth
+        for i, (ticks, units) in enumerate(self.asks):
+            levels[offset + 2 * i] = ticks
+            levels[offset + 2 * i + 1] = units
+        PAYLOAD.pack_into(mm, PAYLOAD_OFFSET, time.time_ns(), len(self.bids), len(self.asks),
+                          self.trade[0], self.trade[1], self.trade[2], self.trade[3], self.mark_price)
+        self.levels.pack_into(mm, LEVELS_OFFSET, *levels)
+        self.seq += 1
+        SEQ.pack_into(mm, SEQ_OFFSET, self.seq)
+
+    def close(self):
+        if self.mm:
+            self.mm.close()
+            self.file.close()
+            self.mm = None
+
+
+class SharedBookReader:
+    def __init__(self, symbol, directory=None):
+        if not symbol.startswith('PF_'):
+            symbol = f"PF_{symbol}USD"
+        self.path = book_path(symbol, directory)
+        self.file = open(self.path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.depth, self.tick_size, self.size_step, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            raise ValueError(f"{self.path} is not a shared book segment")
+        self.instrument = Instrument(symbol, self.tick_size, self.size_step)
+        self.levels = struct.Struct(f'<{4 * self.depth}q')
+
+    def read_raw(self, retries=10000):
+        """Consistent (seq, payload tuple, levels tuple) with prices in ticks and sizes in units."""
+        mm = self.mm
+        for _ in range(retries):
+            seq = SEQ.unpack_from(mm, SEQ_OFFSET)[0]
+            if seq & 1:
+                continue
+            payload = PAYLOAD.unpack_from(mm, PAYLOAD_OFFSET)
+            levels = self.levels.unpack_from(mm, LEVELS_OFFSET)
+            if SEQ.unpack_from(mm, SEQ_OFFSET)[0] == seq:
+                return seq, payload, levels
+        raise TimeoutError(f"No consistent snapshot of {self.path} after {retries} attempts")
+
+    def top(self):
+        """(bid, ask) prices from the latest snapshot, or None for an empty side."""
+        _, payload, levels = self.read_raw()
+        bid = self.instrument.ticks_to_price(levels[0]) if payload[1] else None
+        ask = self.instrument.ticks_to_price(levels[2 * self.depth]) if payload[2] else None
+        return bid, ask
+
+    def snapshot(self):
+        seq, payload, levels = self.read_raw()
+        update_ns, bid_count, ask_count, trade_ticks, trade_units, trade_time, trade_side, mark_price = payload
+        price, size = self.instrument.ticks_to_price, self.instrument.units_to_size
+        bids = [(price(levels[2 * i]), size(levels[2 * i + 1])) for i in range(bid_count)]
+        offset = 2 * self.depth
+        asks = [(price(levels[offset + 2 * i]), size(levels[offset + 2 * i + 1])) for i in range(ask_count)]
+        side = 'buy' if trade_side > 0 else 'sell' if trade_side < 0 else None
+        return SharedBookSnapshot(seq, update_ns, bids, asks, price(trade_ticks), size(trade_units),
+                                  side, trade_time, mark_price)
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
@@ -0,0 +1,247 @@
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import QThread, pyqtSignal, Qt, QTimer, QRect
+from PyQt5.QtGui import QPainter, QColor, QFont, QFontMetrics
+from collections import deque
+import websocket
+import json
+import time
+from settings import GUI_FONT, GUI_FONT_SIZE, WATCHLIST_REFRESH_MS, KRAKEN_WS_URL
+from helpers import format_price, format_volume_usd, get_full_symbol
+from log import get_logger
+
+log = get_logger('watchlist')
+WINDOW_SECONDS = 60
+COLUMNS = (('Ticker', 0.14), ('Last', 0.20), ('Bid / Ask', 0.34), ('1m', 0.14), ('1m Vol', 0.18))
+
+
+class WatchQuote:
+    """Rolling quote and 1-minute trade window for one instrument.
+
+    Only the feed thread mutates a quote; the GUI reads fields and compares version.
+    """
+    __slots__ = ('symbol', 'last', 'bid', 'ask', 'volume_usd', 'reference', 'trades', 'version')
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.last = None
+        self.bid = None
+        self.ask = None
+        self.volume_usd = 0.0
+        self.reference = None
+        self.trades = deque()
+        self.version = 0
+
+    def add_trade(self, now, price, qty):
+        self.trades.append((now, price, qty))
+        self.volume_usd += price * qty
+        self.last = price
+        self.expire(now)
+        self.version += 1
+
+    def set_quote(self, bid, ask, last):
+        if (bid, ask) != (self.bid, self.ask) or (last is not None and self.last is None):
+            self.bid = bid
+            self.ask = ask
+            if self.last is None:
+                self.last = last
+            self.version += 1
+
+    def expire(self, now):
+        cutoff = now - WINDOW_SECONDS
+        trades = self.trades
+        if not trades or trades[0][0] > cutoff:
+            return
+        while trades and trades[0][0] <= cutoff:
+            _, price, qty = trades.popleft()
+            self.volume_usd -= price * qty
+            self.reference = price
+        if not trades:
+            self.volume_usd = 0.0
+        self.version += 1
+
+    def change_1m(self):
+        reference = self.reference if self.reference is not None else (self.trades[0][1] if self.trades else None)
+        if not reference or self.last is None:
+            return None
+        return (self.last / reference - 1) * 100
+
+
+class WatchlistThread(QThread):
+    """Single public connection streaming ticker and trade for every watched instrument.
+
+    With an AlertEngine, every trade, quote and mark is also passed to it.
+    """
+    error_signal = pyqtSignal()
+
+    def __init__(self, pairs, alerts=None):
+        super().__init__()
+        self.symbols = [get_full_symbol(pair) for pair in pairs if pair]
+        self.quotes = {symbol: WatchQuote(symbol) for symbol in self.symbols}
+        self.alerts = alerts
+        self.ws = None
+        self.running = True
+
+    def run(self):
+        def on_message(ws, message):
+            try:
+                data = json.loads(message)
+                quote = self.quotes.get(data.get('product_id'))
+                if quote is None:
+                    return
+                feed = data.get('feed')
+                alerts = self.alerts
+                if feed == 'trade' and data.get('price') and data.get('qty'):
+                    now = time.time()
+                    quote.add_trade(now, float(data['price']), float(data['qty']))
+                    if alerts:
+                        alerts.on_trade(quote.symbol, quote.last, float(data['qty']), now)
+                elif feed == 'ticker':
+                    if 'bid' in data and 'ask' in data:
+                        quote.set_quote(float(data['bid']), float(data['ask']),
+                                        float(data['last']) if data.get('last') else None)
+                        if alerts:
+                            alerts.on_quote(quote.symbol, quote.bid, quote.ask)
+                    if alerts and data.get('markPrice'):
+                        alerts.on_mark(quote.symbol, float(data['markPrice']))
+                    quote.expire(time.time())
+            except Exception as e:
+                log.error("Error in watchlist message processing: %s", e)
+
+        def on_error(ws, error):
+            log.error("Watchlist WebSocket error: %s", error)
+            self.error_signal.emit()
+
+        def on_open(ws):
+            for feed in ('ticker', 'trade'):
+                ws.send(json.dumps({"event": "subscribe", "feed": feed, "product_ids": self.symbols}))
+
+        while self.running and self.symbols:
+            try:
+                self.ws = websocket.WebSocketApp(
+                    KRAKEN_WS_URL,
+                    on_message=on_message,
+                    on_error=on_error)
+                self.ws.on_open = on_open
+                self.ws.run_forever()
+                if not self.running:
+                    break
+                time.sleep(1)
+            except Exception as e:
+                log.error("Watchlist connection error: %s", e)
+                time.sleep(1)
+
+    def stop(self):
+        self.running = False
+        if self.ws:
+            self.ws.close()
+
+
+class WatchlistWindow(QWidget):
+    """Watchlist table painted in batches at WATCHLIST_REFRESH_MS.
+
+    Each refresh compares every quote's version against the version last painted and
+    invalidates only the changed rows, so idle instruments cost nothing to display.
+    """
+    symbol_clicked = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle('Watchlist')
+        self.feed_thread = None
+        self.quotes = []
+        self.painted_versions = []
+        self.font = QFont(GUI_FONT, max(GUI_FONT_SIZE - 8, 8))
+        self.row_height = QFontMetrics(self.font).height() + 6
+        self.set_dark_mode(False)
+        self.resize(640, self.row_height * 6)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(int(WATCHLIST_REFRESH_MS))
+
+    def set_dark_mode(self, is_dark_mode):
+        if is_dark_mode:
+            self.colors = {'background': QColor('#1e1e1e'), 'text': QColor('#e0e0e0'), 'grid': QColor('#333333'),
+                           'up': QColor(0, 179, 0), 'down': QColor(220, 40, 40)}
+        else:
+            self.colors = {'background': QColor('white'), 'text': QColor('black'), 'grid': QColor('#dddddd'),
+                           'up': QColor(0, 150, 0), 'down': QColor(200, 0, 0)}
+        self.update()
+
+    def start(self, pairs, alerts=None):
+        self.stop()
+        self.feed_thread = WatchlistThread(pairs, alerts)
+        if alerts:
+            alerts.watched = set(self.feed_thread.symbols)
+        self.quotes = [self.feed_thread.quotes[symbol] for symbol in self.feed_thread.symbols]
+        self.painted_versions = [-1] * len(self.quotes)
+        self.setMinimumHeight(self.row_height * (len(self.quotes) + 1))
+        self.feed_thread.start()
+        self.update()
+
+    def stop(self):
+        if self.feed_thread:
+            self.feed_thread.stop()
+            self.feed_thread.wait()
+            if self.feed_thread.alerts:
+                self.feed_thread.alerts.watched = set()
+            self.feed_thread = None
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        width = self.width()
+        for i, quote in enumerate(self.quotes):
+            if quote.version != self.painted_versions[i]:
+                self.update(QRect(0, (i + 1) * self.row_height, width, self.row_height))
+
+    def column_rects(self, y):
+        rects = []
+        x = 0
+        for _, fraction in COLUMNS:
+            column_width = int(self.width() * fraction)
+            rects.append(QRect(x + 4, y, column_width - 8, self.row_height))
+            x += column_width
+        return rects
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setFont(self.font)
+        dirty = event.rect()
+        painter.fillRect(dirty, self.colors['background'])
+
+        if dirty.top() < self.row_height:
+            painter.setPen(self.colors['text'])
+            for (title, _), rect in zip(COLUMNS, self.column_rects(0)):
+                painter.drawText(rect, Qt.AlignLeft | Qt.AlignVCenter, title)
+
+        first = max(dirty.top() // self.row_height - 1, 0)
+        last = min(dirty.bottom() // self.row_height - 1, len(self.quotes) - 1)
+        for i in range(first, last + 1):
+            self.paint_row(painter, i, self.quotes[i])
+
+    def paint_row(self, painter, index, quote):
+        self.painted_versions[index] = quote.version
+        y = (index + 1) * self.row_height
+        ticker, last, bid_ask, change, volume = self.column_rects(y)
+        align = Qt.AlignLeft | Qt.AlignVCenter
+        painter.setPen(self.colors['grid'])
+        painter.drawLine(0, y, self.width(), y)
+
+        painter.setPen(self.colors['text'])
+        painter.drawText(ticker, align, quote.symbol[3:-3])
+        if quote.last is not None:
+            painter.drawText(last, align, format_price(quote.last))
+        if quote.bid is not None and quote.ask is not None:
+            painter.drawText(bid_ask, align, f"{format_price(quote.bid)} / {format_price(quote.ask)}")
+        painter.drawText(volume, align, format_volume_usd(quote.volume_usd))
+
+        change_pct = quote.change_1m()
+        if change_pct is not None:
+            painter.setPen(self.colors['up'] if change_pct >= 0 else self.colors['down'])
+            painter.drawText(change, align, f"{change_pct:+.2f}%")
+
+    def mousePressEvent(self, event):
+        index = event.y() // self.row_height - 1
+        if 0 <= index < len(self.quotes):
+            self.symbol_clicked.emit(self.quotes[index].symbol[3:-3])